@@ -1,5 +1,12 @@
 __all__ = [
     "constants", "utils", "gauge", "com_guard", "audio",
     "persistence", "reporting", "charting", "ui_left",
-    "ui_right", "settings_dialog", "monitor", "app"
+    "ui_right", "settings_dialog", "monitor", "app",
+    "engine", "numpy_support", "vectorized",
+    "history", "excel_export", "stats", "ui_bus",
+    "chart", "volume_backend", "journal", "timeseries",
+    "policy", "bench", "diagnostics",
+    "fleet_protocol", "collector", "publisher", "measurement",
+    "calibration", "notifications", "worker", "report", "importer", "levels", "standards",
+    "forecast",
 ]
@@ -4,14 +4,11 @@ import tkinter as tk
 import customtkinter as ctk
 import time
 import threading
-import pythoncom
-import math
+import os
 import platform
 import json
 from pathlib import Path
-from ctypes import POINTER, cast
 from tkinter import messagebox, filedialog
-from datetime import datetime
 from queue import Queue, Empty
 
 from .colors import (
@@ -25,34 +22,46 @@ from .colors import (
     DISCORD_TEXT,
 )
 
-from .excel_support import (
-    _OPENPYXL_AVAILABLE,
-    Workbook,
-    get_column_letter,
-    Font,
-    Alignment,
-    numbers,
-)
-
-from .audio_support import (
-    _PYCAW_AVAILABLE,
-    AudioUtilities,
-    IAudioEndpointVolume,
-    CLSCTX_ALL,
+from . import excel_support
+from .excel_export import write_session_report, ExportCancelled
+
+from .audio_support import com_initialize, com_uninitialize
+from .volume_backend import NullBackend, create_backend
+from .diagnostics import Diagnostics, enabled_from_env
+from .publisher import DosePublisher, collector_from_env
+from .notifications import (
+    NotificationCenter,
+    OsNotifier,
+    ToastStack,
+    LEVEL_INFO,
+    LEVEL_WARN,
+    LEVEL_ERROR,
 )
 
 from .helpers import (
-    map_percent_to_db,
-    db_to_percent,
-    allowed_time_seconds_for_level,
-    dose_increment_per_second,
-    risk_zone_from_dose,
-    risk_zone_from_level,
     fmt_hms,
     round_pct_ui,
 )
 
 from .gauge import Gauge
+from .policy import ModePolicy, safe_zone_target_pct
+from .calibration import LINEAR_PROFILE, LevelModel, LevelTables
+from .chart import HistoryChart
+from .history import HistoryStore
+from .journal import ExposureJournal
+from .timeseries import TimeSeriesStore
+from .stats import ExposureStats
+from .standards import format_standards, index_for_cfg
+from .forecast import forecast, max_sustainable, parse_schedule, seconds_until_midnight
+from .ui_bus import UiState, StateChannel, WidgetCache
+from .engine import (
+    DoseEngine,
+    EVENT_DAY_ROLLOVER,
+    EVENT_ALERT_50,
+    EVENT_ALERT_100,
+    EVENT_DAILY_WARN,
+    EVENT_DAILY_BLOCK,
+)
 
 
 # ---------- App ----------
@@ -63,13 +72,8 @@ class SoundMonitorApp(ctk.CTk):
         self.geometry("980x740"); self.minsize(860, 770)
         self.configure(fg_color=DISCORD_BG)
 
-        # COM na thread da UI (PyCAW)
+        # COM na thread da UI (PyCAW) – feito em _init_audio_backend
         self._ui_com_inited = False
-        try:
-            pythoncom.CoInitialize()
-            self._ui_com_inited = True
-        except Exception:
-            pass
 
         # ===== Config DIÁRIA (8h) – perfis OMS/NIOSH =====
         # Estes valores são DIÁRIOS (8h). Troca 3 dB para ambos.
@@ -83,6 +87,8 @@ class SoundMonitorApp(ctk.CTk):
 
             "min_enforced_volume": 5.0,
             "default_volume": 30.0,
+            # curva volume% -> dB do dispositivo (calibration.json); "" = reta min/max dB
+            "calibration_profile": "",
         }
         self.cfg = dict(self._defaults_cfg)
 
@@ -97,78 +103,91 @@ class SoundMonitorApp(ctk.CTk):
 
         # Modos
         self.mode = "prefixado"
-        self.dynamic_strategy = "reserva"  # 'reserva' | 'zona_segura'
 
-        # Estado sessão / diária
-        mynow = time.time()
-        self.session_dose = 0.0   # dose relativa ao dia (base 8h de ref)
-        self.prev_session_dose = 0.0
-        self.time_at_current_level = 0.0
-
-        self.daily_dose = 0.0
-        now = datetime.now()
-        self._day_key = now.strftime("%Y-%m-%d")
+        # Quantização (combina com mixer do Windows)
+        self._volume_quantum = 1.0  # % (1.0 se quiser mais fino)
 
-        self.alert_50_fired = False
-        self.alert_100_fired = False
-        self.daily_warn_fired = False
-        self.daily_block_fired = False
+        # Tabelas % -> dB / tempo permitido / dose/s / zona (recompiladas quando o cfg muda)
+        self.levels = LevelModel(self.cfg, quantum=self._volume_quantum)
 
-        self._last_update = mynow
+        # Estado sessão / diária (dose, timer, EMA, zonas e alertas) – motor sem UI
+        self.engine = DoseEngine(self.cfg, levels=self.levels)
+        self._last_engine_state = None     # último EngineState (exportação / previsão nas configurações)
+        self.engine.max_gap_sec = 300.0   # o monitor acorda ao menos 1x/s; mais que isso = SO suspenso
+        self.engine.subscribe(self._on_engine_state)
         self._stop_event = threading.Event()
-
-        # Timer "neste volume"
-        self._last_L_for_timer = None
-        self.timer_epsilon_db = 1.0
-        self._last_vol_key = None
-
-        # Histórico / gráfico
-        self.history = []
-        self.session_start_ts = mynow
+        self._monitor_thread = None
+        # Acorda o monitor em mudanças de volume/estado (fora isso dorme até o próximo evento)
+        self._monitor_wake = threading.Event()
+        # mudanças no motor pedidas pela UI: aplicadas pelo monitor antes do próximo update()
+        self._engine_requests = Queue()
+        self.monitor_idle_tick_sec = 1.0   # resolução do histórico / rótulos
+
+        # Histórico / gráfico (colunar; excedente vai para disco)
+        self.history_capacity = 3600
+        self.history = HistoryStore(capacity=self.history_capacity,
+                                    spill_dir=Path.home() / ".tcc_sound_monitor" / "spill")
         self._last_hist_log = 0.0
         self._last_chart_draw = 0.0
         self.chart_window_sec = 120
-        self.chart_points = []
-        self._last_sys_sync = 0.0
-
-        # Áudio backend
-        self._audio_volume = None
+        self.chart_windows = (120, 30 * 60, 8 * 3600)   # clique no gráfico alterna
+        # Resumo incremental (atualizado junto com o histórico)
+        self.stats = ExposureStats()
+        # Diário de exposição em disco (sobrevive a queda/logoff; fsync em grupo)
+        self.journal = ExposureJournal()
+        # Série de longo prazo (SQLite: bruto 7 dias + agregados 1 min/1 h/1 dia)
+        try:
+            self.timeseries = TimeSeriesStore(cfg=self.cfg)
+        except Exception as e:
+            print("Série temporal indisponível:", e)
+            self.timeseries = None
+
+        # Exportação Excel (thread)
+        self._export_thread = None
+        self._export_cancel = None
+
+        # Instrumentação opcional (TCC_DIAGNOSTICS=1 / settings); None = desligada
+        self.diag = None
+        self._diag_setting = False
+        self._diag_last_pump = None
+
+        # Envio opcional ao coletor da frota (TCC_COLLECTOR=host:porta / settings)
+        self.publisher = None
+        self._collector_setting = None
+
+        # Nível medido no sinal (TCC_MEASUREMENT=loopback|wav:arquivo / settings);
+        # None = dB pelo mapeamento do slider
+        self.level_meter = None
+        self._measurement_setting = ""
+
+        # Motor + trava em processo próprio (TCC_WORKER=1 / settings);
+        # None = monitor numa thread deste processo
+        self.worker = None
+        self._worker_setting = False
+        self.worker_poll_sec = 0.1
+
+        # Avisos não modais (toasts + histórico); notificação do SO opcional
+        # (TCC_OS_NOTIFY=1 / settings)
+        self.notifications = NotificationCenter()
+        self.os_notifier = None
+        self._os_notify_setting = False
+
+        # Áudio backend (eventos de mudança de volume do SO). Até a janela
+        # aparecer fica um NullBackend; o real é criado depois do 1º desenho.
+        self.volume = NullBackend()
+        self._audio_ready = False
         self._audio_warned = False
-        self._init_audio_backend()
 
-        # threads auxiliares de bloqueio
-        self._lock_enforcer_thread = None
-        self._lock_enforcer_stop = threading.Event()
+        # Canal monitor -> UI (último valor vence) + cache de configure dos widgets
+        self._ui_state = StateChannel()
+        self._ui_cache = WidgetCache()
 
         # UI flags
         self._slider_updating = False
         self.paused = False
 
-        # Dinâmico (anti-oscilação)
-        self.dynamic_reserve_min_sec = 600.0     # 10 min
-        self.dynamic_reserve_max_sec = 1200.0    # 20 min
-        self.dynamic_reserve_fraction = 0.10
-        self.dynamic_step_small = 0.25
-        self.dynamic_step_medium = 0.5
-        self.dynamic_step_large = 1.0
-        self.dynamic_hysteresis_sec = 90.0
-        self.dynamic_adjust_interval = 0.6
-        self.dynamic_limiting_active = False
-        self.dynamic_decay_active = False
-        self.last_dynamic_adjust_ts = 0.0
-
-        # ----- Soft-lock dinâmico (teto móvel) -----
-        self.dynamic_softlock_enabled = True     # trava aumentos enquanto o Dinâmico reduz
-        self.dynamic_ceiling_pct = None          # teto atual (None = liberado)
-        self.dynamic_release_delay = 20.0        # seg acima do 'upper' para liberar teto
-        self._dynamic_upper_ok_since = None      # timestamp quando passou do upper
-
-        # Quantização (combina com mixer do Windows)
-        self._volume_quantum = 1.0  # % (1.0 se quiser mais fino)
-
-        # Suavização EMA do “tempo restante”
-        self._ema_remaining_sec = None
-        self._ema_alpha = 0.25
+        # Regras dos modos (Prefixado / Dinâmico, teto móvel) – sem UI
+        self.policy = ModePolicy(self.cfg, quantum=self._volume_quantum, levels=self.levels)
 
         # UI
         self.left_frame = ctk.CTkFrame(self, width=200, corner_radius=10, fg_color=DISCORD_SURFACE)
@@ -177,35 +196,55 @@ class SoundMonitorApp(ctk.CTk):
         self.right_frame.pack(side="right", fill="both", expand=True, padx=8, pady=8)
         self._build_left_panel()
         self._build_right_panel()
+        self.toasts = ToastStack(self, self.notifications, on_change=self._on_unread_change)
 
         # Cache do slider
         self._vol_cache = float(self.vol_slider.get())
 
-        # Fila de UI
+        # Fila de UI (só ações pontuais: alertas, bloqueios, passos do Dinâmico)
         self._ui_queue = Queue()
         self.after(20, self._ui_pump)
 
         # Carrega settings
         self._load_settings()
 
+        # Retoma a dose de hoje (reiniciar o app não zera o limite diário)
+        self._restore_from_journal()
+
+        if self._diag_setting or enabled_from_env():
+            self._enable_diagnostics()
+        # painel oculto de diagnóstico (Ctrl+Shift+D)
+        self.bind_all("<Control-D>", lambda e: self._open_diagnostics_panel())
+
+        self._start_publisher()
+        self._start_level_meter()
+        if self._os_notify_setting or os.environ.get("TCC_OS_NOTIFY", "") == "1":
+            self._set_os_notifications(True)
+
         # Thread de monitoramento
         self._start_monitor_thread()
 
-        # Sync inicial com SO
-        if self._audio_volume is not None:
-            try:
-                sv = self._get_system_volume_percent()
-                if abs(sv - float(self.vol_slider.get())) > 2.0:
-                    self._safe_set_slider(sv)
-                self.vol_label.configure(text=f"{round_pct_ui(self.vol_slider.get())}%")
-                self._vol_cache = float(self.vol_slider.get())
-            except Exception:
-                pass
+        # Backend de áudio só depois do primeiro desenho da janela
+        self.after(1, lambda: self.after_idle(self._init_audio_backend))
 
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     # ---------- Dispatcher de UI ----------
     def _ui_pump(self):
+        diag = self.diag
+        if diag is not None:
+            t_pump = time.perf_counter()
+            if self._diag_last_pump is not None:
+                # atraso do after(20): frame anterior preso (ex.: messagebox modal)
+                diag.record("ui.pump_gap", t_pump - self._diag_last_pump)
+        # 1) estado mais recente publicado pelo monitor (uma aplicação por frame)
+        pending = self._ui_state.drain()
+        if pending:
+            try:
+                self._apply_ui_state(pending)
+            except Exception as e:
+                print("Erro ao aplicar estado de UI:", e)
+        # 2) ações pontuais, na ordem em que foram pedidas
         try:
             while True:
                 func = self._ui_queue.get_nowait()
@@ -215,11 +254,52 @@ class SoundMonitorApp(ctk.CTk):
                     print("Erro ao executar função de UI:", e)
         except Empty:
             pass
+        # 3) toasts novos (post() de qualquer thread só enfileira)
+        try:
+            self.toasts.poll()
+        except Exception as e:
+            print("Erro ao exibir notificações:", e)
+        if diag is not None:
+            self._diag_last_pump = time.perf_counter()
+            diag.record("ui.pump", self._diag_last_pump - t_pump)
         self.after(20, self._ui_pump)
 
     def _on_ui(self, func):
+        diag = self.diag
+        if diag is not None:
+            diag.record("ui.queue_depth", self._ui_queue.qsize(), unit="")
+            func = diag.timed_call(func, "ui.queue")
         self._ui_queue.put(func)
 
+    def _apply_ui_state(self, pending):
+        cache = self._ui_cache
+        pct = pending.get("slider")
+        if pct is not None:
+            self._safe_set_slider(pct)
+        st = pending.get("engine")
+        if st is not None:
+            cache.call("gauge", (st.L, st.session_dose), self.gauge.set_value)
+            if st.zone is not None:
+                cache.call("zone_badge", (st.zone, st.zone_color), self.draw_zone_badge)
+                cache.configure(self.time_label, text=st.time_text)
+                cache.configure(self.remaining_label, text=st.remaining_text)
+                cache.configure(self.vol_slider, progress_color=st.zone_color)
+                cache.configure(self.period_label, text=st.period_text, fg=st.period_fg)
+                if st.standards_text is not None:
+                    cache.configure(self.standards_label, text=st.standards_text)
+            self._set_vol_label(self._vol_cache)
+        status = pending.get("status")
+        if status is not None:
+            self._set_status(*status)
+        if pending.get("chart"):
+            self._draw_history_chart()
+
+    def _set_status(self, text, fg):
+        self._ui_cache.configure(self.general_status, text=text, fg=fg)
+
+    def _set_vol_label(self, pct):
+        self._ui_cache.configure(self.vol_label, text=f"{round_pct_ui(pct)}%")
+
     # ---------- Persistência ----------
     def _settings_path(self):
         base = Path.home() / ".tcc_sound_monitor"
@@ -240,11 +320,17 @@ class SoundMonitorApp(ctk.CTk):
                 self.hard_lock_enabled = bool(data.get("hard_lock_enabled", True))
                 self.lock_on_autoadjust = bool(data.get("lock_on_autoadjust", True))
                 # soft-lock
-                self.dynamic_softlock_enabled = bool(data.get("dynamic_softlock_enabled", True))
+                self.policy.dynamic_softlock_enabled = bool(data.get("dynamic_softlock_enabled", True))
+                self._diag_setting = bool(data.get("diagnostics", False))
+                if isinstance(data.get("collector"), dict):
+                    self._collector_setting = data["collector"]
+                self._measurement_setting = str(data.get("measurement", "") or "")
+                self._os_notify_setting = bool(data.get("os_notifications", False))
+                self._worker_setting = bool(data.get("worker_process", False))
                 # estratégia dinâmico
-                self.dynamic_strategy = data.get("dynamic_strategy", "reserva")
-                if self.dynamic_strategy not in ("reserva", "zona_segura"):
-                    self.dynamic_strategy = "reserva"
+                self.policy.dynamic_strategy = data.get("dynamic_strategy", "reserva")
+                if self.policy.dynamic_strategy not in ("reserva", "zona_segura"):
+                    self.policy.dynamic_strategy = "reserva"
                 # modo
                 mode = data.get("mode")
                 if mode in ("prefixado", "dinamico"):
@@ -252,7 +338,7 @@ class SoundMonitorApp(ctk.CTk):
                 # volume
                 vol = float(data.get("volume", self.cfg["default_volume"]))
                 self._safe_set_slider(vol)
-                self.vol_label.configure(text=f"{round_pct_ui(vol)}%")
+                self._set_vol_label(vol)
                 self._vol_cache = vol
             else:
                 self.set_mode("prefixado", silent=True)
@@ -261,8 +347,10 @@ class SoundMonitorApp(ctk.CTk):
         except Exception as e:
             print("Falha ao carregar settings:", e)
         finally:
+            self.levels.invalidate()
             self._refresh_profile_label()
-            self.gauge.set_bounds(self.cfg["min_db"], self.cfg["max_db"])
+            self.gauge.set_bounds(self.levels.tables.min_db, self.levels.tables.max_db)
+            self.chart.set_bounds(self.levels.tables.min_db, self.levels.tables.max_db)
             self.gauge.set_profile_ref(self.cfg["ref_db"])   # <--- adicione
 
     def _save_settings(self):
@@ -273,36 +361,121 @@ class SoundMonitorApp(ctk.CTk):
                 "cfg": self.cfg,
                 "hard_lock_enabled": self.hard_lock_enabled,
                 "lock_on_autoadjust": self.lock_on_autoadjust,
-                "dynamic_strategy": self.dynamic_strategy,
-                "dynamic_softlock_enabled": self.dynamic_softlock_enabled,
+                "dynamic_strategy": self.policy.dynamic_strategy,
+                "dynamic_softlock_enabled": self.policy.dynamic_softlock_enabled,
+                "diagnostics": self._diag_setting,
+                "os_notifications": self._os_notify_setting,
             }
+            if self._worker_setting:
+                data["worker_process"] = True
+            if self._collector_setting:
+                data["collector"] = self._collector_setting
+            if self._measurement_setting:
+                data["measurement"] = self._measurement_setting
             with open(self._settings_path(), "w", encoding="utf-8") as fh:
                 json.dump(data, fh, ensure_ascii=False, indent=2)
         except Exception as e:
             print("Falha ao salvar settings:", e)
+        # cfg/preferências mudam sempre antes de um save: o motor separado acompanha
+        if self.worker is not None:
+            self.worker.configure(self.cfg, self._worker_prefs())
 
-    # ---------- Áudio (PyCAW) ----------
+    def _restore_from_journal(self):
+        try:
+            day_key = self.engine.day_key
+            rec = self.journal.last_record(day_key)
+            if rec is None:
+                return
+            if not self.engine.restore(day_key, rec.daily_dose, rec.session_dose, rec.session_start_ts):
+                return
+            # doses nas outras normas: reconstruídas do segmento de hoje
+            self.engine.standards.replay(
+                ((r.ts, r.session_start_ts, r.L, r.daily_dose) for r in self.journal.iter_records(day_key)),
+                rec.session_start_ts,
+            )
+            # histórico/resumo da sessão retomada (só o segmento de hoje)
+            for r in self.journal.iter_records(day_key, rec.session_start_ts):
+                self.history.append(r.ts, r.t_session, r.mode, r.vol_percent, r.L,
+                                    r.session_dose, r.zone, r.daily_dose)
+                self.stats.add(r.t_session, r.L, r.vol_percent, r.session_dose)
+            if self.hard_lock_enabled and (self.engine.daily_dose >= 1.0 or self.engine.session_dose >= 1.0):
+                self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário")
+        except Exception as e:
+            print("Falha ao recuperar diário de exposição:", e)
+        finally:
+            self.journal.prune()
+
+    # ---------- Áudio (backend de volume) ----------
     def _init_audio_backend(self):
-        if platform.system() != "Windows" or not _PYCAW_AVAILABLE:
+        """Cria o backend real (importa comtypes/pycaw só aqui) e faz o sync inicial."""
+        if self._audio_ready or self._stop_event.is_set():
             return
-        try:
-            devices = AudioUtilities.GetSpeakers()
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            self._audio_volume = cast(interface, POINTER(IAudioEndpointVolume))
-        except Exception:
-            self._audio_volume = None
+        if self.worker is not None:
+            # o processo do motor é dono do volume do SO (trava/teto/sync)
+            self._audio_ready = True
+            return
+        self._ui_com_inited = com_initialize()
+        backend = create_backend()
+        if self.diag is not None:
+            backend.instrument(self.diag)
+        self.volume = backend
+        self._audio_ready = True
+        # Sync inicial com SO; depois disso só por eventos do backend
+        if backend.available:
+            try:
+                if self.locked:
+                    backend.set_urgent(True)
+                    self._apply_system_volume_from_slider()
+                else:
+                    sv = self._get_system_volume_percent()
+                    if abs(sv - float(self.vol_slider.get())) > 2.0:
+                        self._safe_set_slider(sv)
+                    self._set_vol_label(self.vol_slider.get())
+                    self._vol_cache = float(self.vol_slider.get())
+            except Exception:
+                pass
+            backend.add_listener(self._on_system_volume_change)
+            backend.start()
+        elif self.locked:
+            self._apply_system_volume_from_slider(show_install_hint=True)
 
     def _get_system_volume_percent(self):
-        if self._audio_volume is None:
-            raise RuntimeError("Sem backend de áudio")
-        scalar = self._audio_volume.GetMasterVolumeLevelScalar()
-        return float(scalar) * 100.0
+        return self.volume.get_percent()
 
     def _set_system_volume_percent(self, pct):
-        if self._audio_volume is None:
-            raise RuntimeError("Sem backend de áudio")
         pct = max(0.0, min(100.0, float(pct)))
-        self._audio_volume.SetMasterVolumeLevelScalar(pct / 100.0, None)
+        self.volume.set_percent(pct)
+
+    def _on_system_volume_change(self, pct):
+        """
+        Volume do SO mudou (thread do backend). Trava, teto do Dinâmico e sync
+        do slider reagem aqui; as nossas próprias escritas caem nos ramos sem efeito.
+        """
+        sys_pct = self._quantize_pct(pct)
+        if self.locked and self.lock_target_pct is not None:
+            target = float(self.lock_target_pct)
+            if abs(pct - target) > 0.5:
+                try:
+                    self._set_system_volume_percent(target)
+                except Exception:
+                    pass
+            return
+
+        # Se há teto, rebaixa o volume do SO caso tenha subido acima dele
+        ceiling = self.policy.dynamic_ceiling_pct
+        if self.policy.dynamic_softlock_enabled and ceiling is not None and sys_pct > ceiling + 0.5:
+            try:
+                self._set_system_volume_percent(ceiling)
+            except Exception:
+                pass
+            self._ui_state.publish("slider", ceiling)
+            return
+
+        # Se estivermos em queda dinâmica, ignora subidas externas
+        if self.policy.dynamic_decay_active and sys_pct > float(self._vol_cache) + 0.01:
+            return
+        if abs(sys_pct - float(self._vol_cache)) > 1.0:
+            self._ui_state.publish("slider", sys_pct)
 
     # ---------- UI ----------
     def _build_left_panel(self):
@@ -322,6 +495,10 @@ class SoundMonitorApp(ctk.CTk):
                                       wraplength=180, justify="left")
         self.mode_info.pack(pady=(8, 4))
 
+        self.btn_notifications = ctk.CTkButton(self.left_frame, text="Notificações", width=200,
+                                               fg_color="#444", command=self._open_notifications_panel)
+        self.btn_notifications.pack(pady=(12, 6))
+
         ctk.CTkLabel(self.left_frame, text="Dev: Breno Landim", font=("Segoe UI", 12),
                      text_color="#aaa").pack(side="bottom", pady=10)
 
@@ -377,7 +554,12 @@ class SoundMonitorApp(ctk.CTk):
 
         self.period_label = tk.Label(self.right_frame, text="Dose diária: 0%",
                                      font=("Segoe UI", 12), bg=DISCORD_SURFACE, fg="#bbb")
-        self.period_label.pack(pady=(0, 10))
+        self.period_label.pack(pady=(0, 2))
+
+        # dose diária em todas as normas (standards.py), não só no perfil ativo
+        self.standards_label = tk.Label(self.right_frame, text="", font=("Segoe UI", 10),
+                                        bg=DISCORD_SURFACE, fg="#9aa0a6")
+        self.standards_label.pack(pady=(0, 10))
 
         vol_frame = ctk.CTkFrame(self.right_frame, fg_color=DISCORD_SURFACE)
         vol_frame.pack(pady=10)
@@ -397,6 +579,9 @@ class SoundMonitorApp(ctk.CTk):
         chart_frame.pack(fill="x", padx=20, pady=(8, 0))
         self.chart_canvas = tk.Canvas(chart_frame, width=760, height=120, bg=DISCORD_SURFACE_ALT, highlightthickness=0)
         self.chart_canvas.pack()
+        self.chart = HistoryChart(self.chart_canvas, self.history, self.cfg, window_sec=self.chart_window_sec,
+                                  store=self.timeseries)
+        self.chart_canvas.bind("<Button-1>", lambda e: self._cycle_chart_window())
 
         btn_frame = ctk.CTkFrame(self.right_frame, fg_color=DISCORD_SURFACE)
         btn_frame.pack(side="bottom", pady=18)
@@ -446,6 +631,7 @@ class SoundMonitorApp(ctk.CTk):
             self.vol_slider.set(pct)
         finally:
             self._slider_updating = False
+        self._wake_monitor()
 
     # ---------- Bloqueio ----------
     def _lock_volume(self, target_pct: float, reason: str = "", honor_min: bool = True):
@@ -461,36 +647,36 @@ class SoundMonitorApp(ctk.CTk):
         self.btn_prefixado.configure(state="disabled")
         self.pause_btn.configure(state="disabled")
         self._safe_set_slider(self.lock_target_pct)
-        self._apply_system_volume_from_slider(show_install_hint=True)
-        self.general_status.config(text=f"Status: bloqueado ({reason})", fg=DISCORD_ERROR)
-        self._start_lock_enforcer()
+        if self.worker is not None:
+            self.worker.lock(target, reason, honor_min=False)
+        else:
+            self._apply_system_volume_from_slider(show_install_hint=True)
+        self._set_status(f"Status: bloqueado ({reason})", DISCORD_ERROR)
+        self.volume.set_urgent(True)
 
     def _unlock_volume(self):
         self.locked = False
         self.lock_target_pct = None
         self.lock_reason = ""
-        self._stop_lock_enforcer()
+        self.volume.set_urgent(False)
+        if self.worker is not None:
+            self.worker.unlock()
         self.vol_slider.configure(state="normal")
         self.btn_dinamico.configure(state="normal")
         self.btn_prefixado.configure(state="normal")
         self.pause_btn.configure(state="normal")
-        self.general_status.config(text="Status: normal", fg="#bbb")
+        self._set_status("Status: normal", "#bbb")
 
     # ---------- Modo ----------
     def set_mode(self, mode, silent=False):
         if mode not in ("prefixado", "dinamico"):
             return
         self.mode = mode
-        self.time_at_current_level = 0.0
-        self._last_L_for_timer = None
-        self._last_vol_key = None
-        self.dynamic_limiting_active = False
-        self.dynamic_decay_active = False
-        self.last_dynamic_adjust_ts = 0.0
-
-        # reset do soft-lock dinâmico
-        self.dynamic_ceiling_pct = None
-        self._dynamic_upper_ok_since = None
+        self.engine.reset_level_timer()
+        # reset do Dinâmico e do soft-lock
+        self.policy.reset()
+        if self.worker is not None:
+            self.worker.set_mode(mode)
 
         def set_btn_colors(p="#444", d="#444"):
             self.btn_prefixado.configure(fg_color=p)
@@ -502,14 +688,15 @@ class SoundMonitorApp(ctk.CTk):
             self._unlock_volume()  # <- adicione esta linha
         else:
             set_btn_colors(d=DISCORD_ACCENT)
-            if self.dynamic_strategy == "reserva":
+            if self.policy.dynamic_strategy == "reserva":
                 self.mode_info.configure(text="Dinâmico (Reserva): mantém 10–20 min de folga e reduz suavemente quando precisa.")
             else:
                 self.mode_info.configure(text="Dinâmico (Zona Segura): reduz gradualmente até entrar no verde do gauge.")
 
         if not silent:
-            self.general_status.config(text="Status: normal", fg="#bbb")
+            self._set_status("Status: normal", "#bbb")
         self._refresh_profile_label()
+        self._wake_monitor()
 
     # ---------- Slider ----------
     def on_vol_slider_change(self, value):
@@ -523,58 +710,57 @@ class SoundMonitorApp(ctk.CTk):
         v = float(value)
 
         # Não permitir subir enquanto dinâmica está descendo
-        if self.dynamic_decay_active and v > self._vol_cache + 0.01:
+        if self.policy.dynamic_decay_active and v > self._vol_cache + 0.01:
             self._safe_set_slider(self._vol_cache)
             return
 
         # Soft-lock: impede subir acima do teto enquanto o Dinâmico estiver atuando
-        if self.dynamic_softlock_enabled and self.dynamic_ceiling_pct is not None and v > self.dynamic_ceiling_pct + 0.01:
-            self._safe_set_slider(self.dynamic_ceiling_pct)
+        if self.policy.dynamic_softlock_enabled and self.policy.dynamic_ceiling_pct is not None and v > self.policy.dynamic_ceiling_pct + 0.01:
+            self._safe_set_slider(self.policy.dynamic_ceiling_pct)
             self._apply_system_volume_from_slider(show_install_hint=False)
             return
 
         self._vol_cache = v
-        self.vol_label.configure(text=f"{round_pct_ui(v)}%")
+        self._set_vol_label(v)
         self._apply_system_volume_from_slider(show_install_hint=True)
+        self._wake_monitor()
 
     # ---------- Ações ----------
     def _toggle_pause(self):
         self.paused = not self.paused
+        if self.worker is not None:
+            self.worker.set_paused(self.paused)
         if self.paused:
-            self.general_status.config(text="Status: pausado", fg=DISCORD_WARN)
+            self._set_status("Status: pausado", DISCORD_WARN)
             self.pause_btn.configure(text="Retomar")
         else:
-            self.general_status.config(text="Status: normal", fg="#bbb")
+            self._set_status("Status: normal", "#bbb")
             self.pause_btn.configure(text="Pausar")
+        self._wake_monitor()
 
     def reset_session(self):
-        self.session_dose = 0.0
-        self.prev_session_dose = 0.0
-        self.alert_50_fired = False
-        self.alert_100_fired = False
-        self.time_at_current_level = 0.0
-        self.session_start_ts = time.time()
-        self.history = []
-        self.chart_points = []
+        self.engine.reset_session()
+        if self.worker is not None:
+            self.worker.reset_session()
+        self.history.clear()
+        self.stats.reset()
+        if self.timeseries is not None:
+            self.timeseries.break_series()
+        self.chart.reset()
         self._last_hist_log = 0.0
         self._last_chart_draw = 0.0
-        self._last_update = time.time()
-        self._last_L_for_timer = None
-        self._last_vol_key = None
-        self.dynamic_limiting_active = False
-        self.dynamic_decay_active = False
-        self.last_dynamic_adjust_ts = 0.0
-        self.dynamic_ceiling_pct = None
-        self._dynamic_upper_ok_since = None
-        self.general_status.config(text="Status: normal", fg="#bbb")
-        self._on_ui(lambda: self.remaining_label.config(text="Tempo restante (neste volume) até 100%: --:--:--"))
+        self.policy.reset()
+        self._set_status("Status: normal", "#bbb")
+        self._ui_cache.configure(self.remaining_label, text="Tempo restante (neste volume) até 100%: --:--:--")
         self._unlock_volume()
-        messagebox.showinfo("Sessão reiniciada", "Dose e histórico foram resetados.")
+        self.notifications.post("Sessão reiniciada", "Dose e histórico foram resetados.", key="session_reset")
 
     # ---------- Exportar Excel ----------
     def save_report(self):
-        if not _OPENPYXL_AVAILABLE:
-            messagebox.showerror("Dependência ausente", "Para exportar Excel (.xlsx): pip install openpyxl")
+        # lido na hora: load_openpyxl() desliga a flag se o import de verdade falhar
+        if not excel_support._OPENPYXL_AVAILABLE:
+            self.notifications.post("Dependência ausente", "Para exportar Excel (.xlsx): pip install openpyxl",
+                                    level=LEVEL_ERROR, key="dep_openpyxl")
             return
         if not self.history and not messagebox.askyesno("Sem dados", "Ainda não há histórico. Salvar mesmo assim?"):
             return
@@ -586,512 +772,591 @@ class SoundMonitorApp(ctk.CTk):
         )
         if not filename:
             return
-        try:
-            wb = Workbook()
-            ws = wb.active; ws.title = "Relatório"
-            headers = ["timestamp_iso","t_sessao_s","modo","volume_%","nivel_dB","dose_0a1","zona","dose_diaria"]
-            ws.append(headers)
-            for c in range(1, len(headers)+1):
-                cell = ws.cell(row=1, column=c); cell.font = Font(bold=True); cell.alignment = Alignment(horizontal="center")
-            for row in self.history:
-                ws.append([
-                    row["ts_iso"], float(row["t_session"]), row["mode"],
-                    int(round_pct_ui(float(row["vol_percent"]))),
-                    float(row["L"]), float(row["dose"]), row["zone"], float(row["daily"])
-                ])
-            for r in range(2, ws.max_row + 1):
-                ws.cell(r, 2).number_format = "0.0"
-                ws.cell(r, 5).number_format = "0.00"
-                ws.cell(r, 6).number_format = numbers.FORMAT_PERCENTAGE_00
-                ws.cell(r, 8).number_format = numbers.FORMAT_PERCENTAGE_00
-            widths = [20,14,12,12,12,12,16,16]
-            for idx, w in enumerate(widths, start=1):
-                ws.column_dimensions[get_column_letter(idx)].width = w
-            ws.auto_filter.ref = f"A1:H{ws.max_row}"; ws.freeze_panes = "A2"
-
-            ws2 = wb.create_sheet(title="Resumo")
-            if not self.history:
-                ws2["A1"] = "Sem dados na sessão."; ws2["A1"].font = Font(bold=True)
-            else:
-                summary = self._compute_summary_stats()
-                ws2["A1"] = "Resumo da Sessão"; ws2["A1"].font = Font(bold=True)
-                ws2["A2"] = f"Gerado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                ws2["A3"] = f"Perfil diário: {self.cfg['ref_db']:.0f} dB / 8h (3 dB)"
-                labels = [
-                    ("Tempo total",          summary["total_time_days"], "[h]:mm:ss"),
-                    ("Média de dB",          summary["avg_db"],          "0.00"),
-                    ("Pico de dB",           summary["peak_db"],         "0.00"),
-                    ("Pico de volume (%)",   summary["peak_vol"],        "0"),
-                    ("Maior dose (sessão)",  summary["max_dose"],        numbers.FORMAT_PERCENTAGE_00),
-                    ("Tempo até 50% dose",   summary["t_to_50_days"],    "[h]:mm:ss"),
-                    ("Tempo até 100% dose",  summary["t_to_100_days"],   "[h]:mm:ss"),
-                ]
-                ws2["A5"] = "Métricas gerais"; ws2["A5"].font = Font(bold=True)
-                row_i = 6
-                for label, value, fmt in labels:
-                    ws2.cell(row=row_i, column=1, value=label)
-                    cval = ws2.cell(row=row_i, column=2, value=value); cval.number_format = fmt
-                    row_i += 1
-                ws2.column_dimensions["A"].width = 26
-                ws2.column_dimensions["B"].width = 18
-            wb.save(filename)
-            messagebox.showinfo("Relatório salvo", f"Relatório Excel exportado em:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Erro ao salvar", f"Ocorreu um erro ao salvar o Excel:\n{e}")
+        self._start_export(filename)
+
+    def _start_export(self, filename):
+        """Exporta numa thread (write-only, em blocos); o botão vira 'Cancelar'."""
+        if self._export_thread is not None and self._export_thread.is_alive():
+            return
+        cancel = threading.Event()
+        self._export_cancel = cancel
+
+        def _progress(done, total):
+            pct = int(100 * done / total) if total else 100
+            self._on_ui(lambda: self.btn_excel.configure(text=f"Cancelar ({pct}%)"))
+
+        def _finish(title, msg, error=False):
+            self.btn_excel.configure(text="Salvar Relatório (Excel)", command=self.save_report)
+            self.notifications.post(title, msg, level=LEVEL_ERROR if error else LEVEL_INFO,
+                                    key=f"export:{filename}:{title}")
+
+        def _runner():
+            try:
+                daily_fn = (lambda: self.timeseries.daily_rows(30)) if self.timeseries is not None else None
+                write_session_report(filename, self.history, self._compute_summary_stats, dict(self.cfg),
+                                     progress=_progress, cancel_event=cancel, daily_fn=daily_fn,
+                                     levels=self.levels.tables, standards=self._last_standards())
+                self._on_ui(lambda: _finish("Relatório salvo", f"Relatório Excel exportado em:\n{filename}"))
+            except ExportCancelled:
+                self._on_ui(lambda: _finish("Exportação cancelada", "Nenhum arquivo foi gravado."))
+            except ImportError:
+                self._on_ui(lambda: _finish("Dependência ausente",
+                                            "Para exportar Excel (.xlsx): pip install openpyxl", error=True))
+            except Exception as e:
+                self._on_ui(lambda: _finish("Erro ao salvar", f"Ocorreu um erro ao salvar o Excel:\n{e}", error=True))
+
+        self.btn_excel.configure(text="Cancelar (0%)", command=cancel.set)
+        self._export_thread = threading.Thread(target=_runner, daemon=True)
+        self._export_thread.start()
 
     def _compute_summary_stats(self):
-        hist = self.history; n = len(hist)
-        total_time_s = 0.0; weighted_sum_L = 0.0
-        peak_db = float("-inf"); peak_vol = float("-inf")
-        max_dose = 0.0
-        t_to_50 = None; t_to_100 = None
-        if n >= 1:
-            for i in range(n - 1):
-                cur, nxt = hist[i], hist[i+1]
-                dt = max(0.0, float(nxt["t_session"]) - float(cur["t_session"]))
-
-                total_time_s += dt
-                L = float(cur["L"]); weighted_sum_L += L * dt
-                peak_db = max(peak_db, L)
-                peak_vol = max(peak_vol, float(cur["vol_percent"]))
-                max_dose = max(max_dose, float(cur["dose"]))
-
-                if t_to_50 is None and float(cur["dose"]) >= 0.5: t_to_50 = float(cur["t_session"])
-                if t_to_100 is None and float(cur["dose"]) >= 1.0: t_to_100 = float(cur["t_session"])
-
-            last = hist[-1]
-            peak_db = max(peak_db, float(last["L"]))
-            peak_vol = max(peak_vol, float(last["vol_percent"]))
-            max_dose = max(max_dose, float(last["dose"]))
-            if t_to_50 is None and float(last["dose"]) >= 0.5: t_to_50 = float(last["t_session"])
-            if t_to_100 is None and float(last["dose"]) >= 1.0: t_to_100 = float(last["t_session"])
-        avg_db = (weighted_sum_L / total_time_s) if total_time_s > 0 else 0.0
-        return {
-            "points": n,
-            "total_time_s": total_time_s,
-            "total_time_days": total_time_s / 86400.0,
-            "avg_db": avg_db,
-            "peak_db": peak_db if peak_db != float("-inf") else 0.0,
-            "peak_vol": peak_vol if peak_vol != float("-inf") else 0.0,
-            "max_dose": max_dose,
-            "t_to_50_days": (t_to_50 / 86400.0) if t_to_50 is not None else 0.0,
-            "t_to_100_days": (t_to_100 / 86400.0) if t_to_100 is not None else 0.0,
-        }
+        return self.stats.snapshot()
+
+    def _last_standards(self):
+        st = self._last_engine_state
+        return st.standards if st is not None else None
+
+    def _daily_dose_for(self, cfg):
+        """Dose de hoje avaliada no perfil `cfg` (norma conhecida = dose acumulada nela)."""
+        st = self._last_engine_state
+        if st is None:
+            return self.engine.daily_dose
+        i = index_for_cfg(cfg)
+        if i is not None and st.standards:
+            return st.standards[i][3]
+        return st.daily_dose
 
     # ---------- Teto (Prefixado) ----------
     def _calc_safe_zone_target_pct(self):
-        # Zona segura = início do verde = ref_db - 15 dB
-        Lmax = float(self.cfg["ref_db"]) - 15.0
-        return db_to_percent(Lmax, self.cfg)
+        return safe_zone_target_pct(self.cfg, self.levels)
 
     # ---------- Gráfico ----------
     def _draw_history_chart(self):
-        w = int(self.chart_canvas.winfo_width() or 760)
-        h = int(self.chart_canvas.winfo_height() or 120)
-        pad_l, pad_r, pad_t, pad_b = 40, 10, 10, 25
-        self.chart_canvas.delete("all")
-        self.chart_canvas.create_line(pad_l, h - pad_b, w - pad_r, h - pad_b, fill="#555")
-        self.chart_canvas.create_line(pad_l, pad_t, pad_l, h - pad_b, fill="#555")
-        if not self.chart_points:
-            self.chart_canvas.create_text(w//2, h//2, text="Sem dados ainda", fill="#888", font=("Segoe UI", 10))
-            return
-        t_now = self.chart_points[-1][0]
-        t_min = max(0.0, t_now - self.chart_window_sec)
-        t_max = t_now
-        span = max(1e-6, t_max - t_min)
-        min_db = self.cfg["min_db"]; max_db = self.cfg["max_db"]
-        def x_map(t): return pad_l + (w - pad_l - pad_r) * ((t - t_min) / span)
-        def y_map_db(L):
-            ratio = (L - min_db) / max(1e-9, (max_db - min_db))
-            ratio = max(0.0, min(1.0, ratio))
-            return (h - pad_b) - (h - pad_b - pad_t) * ratio
-        def y_map_dose(d):
-            ratio = max(0.0, min(1.0, float(d)))
-            return (h - pad_b) - (h - pad_b - pad_t) * ratio
-        last_x_db = last_y_db = last_x_ds = last_y_ds = None
-        for (t_rel, L, dose) in self.chart_points:
-            if t_rel < t_min: continue
-            x = x_map(t_rel); y_db = y_map_db(L); y_ds = y_map_dose(dose)
-            if last_x_db is not None:
-                self.chart_canvas.create_line(last_x_db, last_y_db, x, y_db, fill="#8FD14F", width=2)
-            last_x_db, last_y_db = x, y_db
-            if last_x_ds is not None:
-                self.chart_canvas.create_line(last_x_ds, last_y_ds, x, y_ds, fill="#4FC3F7", width=2)
-            last_x_ds, last_y_ds = x, y_ds
-        self.chart_canvas.create_text(w - 140, pad_t + 12, text="dB", fill="#8FD14F", font=("Segoe UI", 10, "bold"))
-        self.chart_canvas.create_text(w - 90, pad_t + 12, text="Dose%", fill="#4FC3F7", font=("Segoe UI", 10, "bold"))
-        for label, Lbl in [("min", min_db), ("ref", self.cfg["ref_db"]), ("max", max_db)]:
-            y = y_map_db(Lbl)
-            self.chart_canvas.create_line(pad_l - 5, y, w - pad_r, y, fill="#333")
-            self.chart_canvas.create_text(pad_l - 28, y, text=f"{Lbl:.0f}", fill="#aaa", font=("Segoe UI", 9))
-        for dt in range(0, int(self.chart_window_sec) + 1, 30):
-            x = x_map(t_max - dt)
-            self.chart_canvas.create_line(x, h - pad_b, x, pad_t, fill="#333")
-            self.chart_canvas.create_text(x, h - pad_b + 12, text=f"-{dt}s", fill="#aaa", font=("Segoe UI", 9))
+        self.chart.refresh()
+
+    def _cycle_chart_window(self):
+        wins = self.chart_windows
+        i = wins.index(self.chart_window_sec) if self.chart_window_sec in wins else -1
+        self.chart_window_sec = wins[(i + 1) % len(wins)]
+        self.chart.set_window(self.chart_window_sec)
 
     # ---------- Monitor ----------
     def _start_monitor_thread(self):
-        t = threading.Thread(target=self._monitor_loop, daemon=True)
-        t.start()
+        target = self._monitor_loop
+        if (self._worker_setting or os.environ.get("TCC_WORKER", "") == "1") and self._start_worker():
+            target = self._worker_loop
+        self._monitor_thread = threading.Thread(target=target, daemon=True)
+        self._monitor_thread.start()
 
     def _apply_system_volume_from_slider(self, show_install_hint=False):
-        if self._audio_volume is not None:
+        if self.worker is not None:
+            self.worker.set_volume(self._quantize_pct(self._vol_cache))
+            return
+        if self.volume.available:
             try:
                 target = self._quantize_pct(self._vol_cache)
                 self._set_system_volume_percent(target)
                 return
             except Exception:
                 pass
-        if (platform.system() == "Windows") and show_install_hint and not self._audio_warned:
+        if (platform.system() == "Windows") and show_install_hint and self._audio_ready and not self._audio_warned:
             self._audio_warned = True
-            messagebox.showinfo(
+            self.notifications.post(
                 "Controlar volume do Windows",
-                "Para o slider controlar (e travar) o volume do PC, instale: pip install pycaw comtypes"
+                "Para o slider controlar (e travar) o volume do PC, instale: pip install pycaw comtypes",
+                key="dep_pycaw",
             )
 
-    def _start_lock_enforcer(self):
-        if self._lock_enforcer_thread and self._lock_enforcer_thread.is_alive():
+    def _on_engine_state(self, st):
+        """Assinante do motor: alertas (central de avisos) + um snapshot de widgets (canal)."""
+        self._last_engine_state = st
+        if st.paused:
+            self._ui_state.publish("engine", UiState(st.L, st.session_dose, None, None, None, None, None, None))
+            self._ui_state.publish("status", ("Status: pausado", DISCORD_WARN))
             return
-        self._lock_enforcer_stop.clear()
-        def _runner():
-            try:
-                pythoncom.CoInitialize()
-            except Exception:
-                pass
-            try:
-                while self.locked and not self._lock_enforcer_stop.is_set():
-                    try:
-                        if self._audio_volume is not None and self.lock_target_pct is not None:
-                            current = self._get_system_volume_percent()
-                            target = float(self.lock_target_pct)
-                            if abs(current - target) > 0.5:
-                                self._set_system_volume_percent(target)
-                    except Exception:
-                        pass
-                    time.sleep(0.03)
-            finally:
+
+        # chaves por dia/sessão: o mesmo alerta numa sessão nova (reset) não cai no dedupe
+        session_tag = f"{st.day_key}:{round(st.ts - st.t_session)}"
+        for ev in st.events:
+            # post() só enfileira: nenhum alerta segura o monitor ou o _ui_pump
+            if ev == EVENT_DAY_ROLLOVER:
+                self.notifications.post("Novo dia", "Dose diária reiniciada.", key=f"{ev}:{st.day_key}")
+            elif ev == EVENT_DAILY_WARN:
+                self.notifications.post("Atenção diária", "Dose diária ≥ 80%.", level=LEVEL_WARN,
+                                        key=f"{ev}:{st.day_key}", urgent=True)
+            elif ev == EVENT_DAILY_BLOCK:
+                self.notifications.post("Bloqueio diário", "Dose diária atingiu 100%. Volume mínimo imposto.",
+                                        level=LEVEL_ERROR, key=f"{ev}:{st.day_key}")
+                if self.hard_lock_enabled:
+                    self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
+            elif ev == EVENT_ALERT_50:
+                self.notifications.post("Atenção", "Você atingiu 50% da dose diária.", level=LEVEL_WARN,
+                                        key=f"{ev}:{session_tag}", urgent=True)
+            elif ev == EVENT_ALERT_100:
+                self.notifications.post("Risco crítico", "Limite de dose diária ultrapassado!",
+                                        level=LEVEL_ERROR, key=f"{ev}:{session_tag}")
+                if self.hard_lock_enabled:
+                    self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
+
+        daily_pct = st.daily_dose * 100.0
+        if 80.0 <= daily_pct < 100.0:
+            period_fg = DISCORD_WARN
+        elif daily_pct >= 100.0:
+            period_fg = DISCORD_ERROR
+        else:
+            period_fg = "#bbb"
+
+        # maior volume que, mantido até a meia-noite, não passa de 100% (forecast.py)
+        _L_max, vol_max = max_sustainable(self.levels.tables, st.daily_dose, seconds_until_midnight(st.ts))
+
+        zone = st.zone
+        zone_color = DISCORD_SUCCESS if zone == "SEGURA" else DISCORD_WARN if zone == "ATENÇÃO" else DISCORD_ERROR
+        self._ui_state.publish("engine", UiState(
+            L=st.L,
+            session_dose=st.session_dose,
+            zone=zone,
+            zone_color=zone_color,
+            time_text=f"Tempo permitido: {fmt_hms(st.allowed_sec)} | Tempo neste volume: {fmt_hms(st.time_at_current_level)}",
+            remaining_text=f"Tempo restante (neste volume) até 100%: {fmt_hms(st.ema_remaining_sec)}",
+            period_text=f"Dose diária: {daily_pct:.0f}% | Volume sustentável até 0h: {vol_max:.0f}%",
+            period_fg=period_fg,
+            standards_text=f"Por norma (dia): {format_standards(st.standards)}" if st.standards else None,
+        ))
+
+    def _apply_policy(self, d):
+        """Aplica a decisão das regras dos modos (thread do monitor)."""
+        if d.volume is not None:
+            pct = self._quantize_pct(d.volume)
+            self._ui_state.publish("slider", pct)
+            if self.volume.available:
                 try:
-                    pythoncom.CoUninitialize()
+                    self._set_system_volume_percent(pct)
                 except Exception:
                     pass
-        self._lock_enforcer_thread = threading.Thread(target=_runner, daemon=True)
-        self._lock_enforcer_thread.start()
-
-    def _stop_lock_enforcer(self):
-        self._lock_enforcer_stop.set()
-
-    def _roll_day_if_needed(self, now_dt):
-        day_key = now_dt.strftime("%Y-%m-%d")
-        if day_key != self._day_key:
-            self._day_key = day_key
-            self.daily_dose = 0.0
-            self.daily_warn_fired = False
-            self.daily_block_fired = False
-            self.alert_50_fired = False
-            self.alert_100_fired = False
-            self.session_dose = 0.0
-            self._on_ui(lambda: messagebox.showinfo("Novo dia", "Dose diária reiniciada."))
+        if d.status is not None:
+            self._ui_state.publish("status", d.status)
+        if d.lock is not None and self.lock_on_autoadjust:
+            target, reason, honor_min = d.lock
+            # trava no seguro pós-corte
+            self._on_ui(lambda: self._lock_volume(target, reason=reason, honor_min=honor_min))
+
+    def _wake_monitor(self):
+        self._monitor_wake.set()
+
+    def _monitor_wait(self, timeout):
+        timeout = max(0.0, timeout)
+        diag = self.diag
+        if diag is None:
+            self._monitor_wake.wait(timeout)
+        else:
+            t0 = time.perf_counter()
+            if not self._monitor_wake.wait(timeout):
+                diag.record("monitor.sleep_overshoot", time.perf_counter() - t0 - timeout)
+        self._monitor_wake.clear()
+
+    def _next_monitor_timeout(self):
+        """
+        Próximo despertar do monitor: histórico (1 s), limiar de dose previsto
+        analiticamente ou passo do Dinâmico – o que vier antes. Volume do SO
+        (trava/teto/sync) chega por evento do backend, não por aqui.
+        """
+        now = time.time()
+        timeout = self._last_hist_log + self.monitor_idle_tick_sec - now
+        crossing = self.engine.next_crossing_in(now)
+        if crossing is not None:
+            timeout = min(timeout, crossing + 0.001)
+        step_in = self.policy.next_step_in(now)
+        if step_in is not None:
+            timeout = min(timeout, step_in)
+        return max(0.01, timeout)
 
     def _monitor_loop(self):
-        pythoncom.CoInitialize()
+        com_inited = com_initialize()
         try:
             while not self._stop_event.is_set():
+                diag = self.diag
+                if diag is not None:
+                    t_tick = time.perf_counter()
                 try:
                     if self.locked:
                         if abs(float(self._vol_cache) - float(self.lock_target_pct or 0)) > 0.1:
-                            self._on_ui(lambda: self._safe_set_slider(self.lock_target_pct))
-                        self._apply_system_volume_from_slider(show_install_hint=False)
-
-                    vol_percent = float(self._vol_cache)
-                    now = time.time()
-                    dt = now - self._last_update
-                    dt = max(0.0, min(dt, 1.0))
-                    self._last_update = now
-
-                    now_dt = datetime.now()
-                    self._roll_day_if_needed(now_dt)
-
-                    # dB corrente
-                    L_eff = map_percent_to_db(vol_percent, self.cfg)
-
-                    if self.paused:
-                        self._on_ui(lambda: self.gauge.set_value(L_eff, self.session_dose))
-                        self._on_ui(lambda: self.general_status.config(text="Status: pausado", fg=DISCORD_WARN))
-                        self._apply_system_volume_from_slider(show_install_hint=False)
-                        time.sleep(0.1 if self.locked else 0.2)
-                        continue
+                            self._ui_state.publish("slider", self.lock_target_pct)
 
-                    # "tempo neste volume"
-                    vol_key = int(round_pct_ui(self._vol_cache))
-                    if self._last_L_for_timer is None:
-                        self._last_L_for_timer = L_eff
-                        self._last_vol_key = vol_key
-                    else:
-                        changed_db = abs(L_eff - self._last_L_for_timer) >= self.timer_epsilon_db
-                        changed_pct = (self._last_vol_key is None) or (self._last_vol_key != vol_key)
-                        if changed_db or changed_pct:
-                            self._last_L_for_timer = L_eff
-                            self._last_vol_key = vol_key
-                            self.time_at_current_level = 0.0
-
-                    # Dose diária (base 8h)
-                    self.prev_session_dose = self.session_dose
-                    inc = dose_increment_per_second(L_eff, self.cfg) * dt
-                    self.session_dose = min(1.0, self.session_dose + inc)
-                    self.daily_dose = min(10.0, self.daily_dose + inc)
-
-                    # Cronômetro do nível atual
-                    if self.session_dose < 1.0:
-                        self.time_at_current_level += dt
-                    else:
-                        if not self.locked and self.hard_lock_enabled:
-                            self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
-                        self.time_at_current_level = 0.0
-
-                    # Tempos (permitido + restante até 100%)
-                    allowed_sec = allowed_time_seconds_for_level(L_eff, self.cfg)
-                    time_str = fmt_hms(allowed_sec)
-                    time_cur_str = fmt_hms(self.time_at_current_level)
-                    remaining_sec = (1.0 - self.session_dose) * allowed_sec if self.session_dose < 1.0 else 0.0
-
-                    # EMA para suavizar “tempo restante”
-                    if self._ema_remaining_sec is None:
-                        self._ema_remaining_sec = remaining_sec
-                    else:
-                        a = self._ema_alpha
-                        self._ema_remaining_sec = a * remaining_sec + (1 - a) * self._ema_remaining_sec
-                    ema_remaining = self._ema_remaining_sec
-                    remaining_str = fmt_hms(ema_remaining)
-
-                    # Zonas
-                    zone = risk_zone_from_dose(self.session_dose)
-                    zone_color = DISCORD_SUCCESS if zone == "SEGURA" else DISCORD_WARN if zone == "ATENÇÃO" else DISCORD_ERROR
-                    level_zone = risk_zone_from_level(L_eff, self.cfg)
-
-                    # ----- Regras dos modos -----
-                    if self.mode == "prefixado" and not self.locked:
-                        # Quando o tempo permitido no nível atual zera, corta p/ zona segura
-                        if self.session_dose < 1.0:
-                            if ema_remaining <= 0.0:
-                                target = self._calc_safe_zone_target_pct()
-                                self._on_ui(lambda: self._safe_set_slider(min(self._vol_cache, target)))
-                                self._apply_system_volume_from_slider(show_install_hint=False)
-                                self._on_ui(lambda: self.general_status.config(
-                                    text="Status: corte p/ zona segura (perfil)", fg=DISCORD_WARN))
-                                if self.lock_on_autoadjust:
-                                    # trava no seguro pós-corte
-                                    self._on_ui(lambda: self._lock_volume(target, reason="corte automático (perfil)", honor_min=False))
-                        else:
-                            self._on_ui(lambda: self.general_status.config(text="Status: normal", fg="#bbb"))
-
-                    elif self.mode == "dinamico" and self.session_dose < 1.0 and not self.locked:
-                        if self.dynamic_strategy == "reserva":
-                            # ===== Estratégia RESERVA =====
-                            reserve_target = max(
-                                self.dynamic_reserve_min_sec,
-                                min(self.dynamic_reserve_max_sec, self.dynamic_reserve_fraction * allowed_sec)
-                            )
-                            lower = reserve_target - self.dynamic_hysteresis_sec
-                            upper = reserve_target + self.dynamic_hysteresis_sec
-
-                            if not self.dynamic_limiting_active and ema_remaining < lower:
-                                self.dynamic_limiting_active = True
-                                # ao entrar no limitando, captura teto inicial
-                                if self.dynamic_softlock_enabled:
-                                    cur = self._quantize_pct(self._vol_cache)
-                                    self.dynamic_ceiling_pct = cur if self.dynamic_ceiling_pct is None else min(self.dynamic_ceiling_pct, cur)
-                                    self._dynamic_upper_ok_since = None
-
-                            elif self.dynamic_limiting_active and ema_remaining > upper:
-                                self.dynamic_limiting_active = False
-
-                            if self.dynamic_limiting_active:
-                                if (now - self.last_dynamic_adjust_ts) >= self.dynamic_adjust_interval:
-                                    deficit = reserve_target - ema_remaining
-                                    if deficit < 60: step = self.dynamic_step_small
-                                    elif deficit < 300: step = self.dynamic_step_medium
-                                    else: step = self.dynamic_step_large
-
-                                    def _decay():
-                                        current = self._vol_cache
-                                        target = self._quantize_pct(current - step)
-                                        if target < current - 0.099:
-                                            self.dynamic_decay_active = True
-                                            self._safe_set_slider(target)
-                                            # atualiza teto (monótono)
-                                            if self.dynamic_softlock_enabled:
-                                                self.dynamic_ceiling_pct = target if self.dynamic_ceiling_pct is None else min(self.dynamic_ceiling_pct, target)
-                                    self._on_ui(_decay)
-                                    self.last_dynamic_adjust_ts = now
-
-                                self._on_ui(lambda: self.general_status.config(text="Status: auto-limitando", fg=DISCORD_WARN))
-                            else:
-                                self.dynamic_decay_active = False
-                                # Liberação do teto só após estabilidade acima de 'upper'
-                                if self.dynamic_softlock_enabled:
-                                    if ema_remaining > upper:
-                                        if self._dynamic_upper_ok_since is None:
-                                            self._dynamic_upper_ok_since = now
-                                        elif (now - self._dynamic_upper_ok_since) >= self.dynamic_release_delay:
-                                            self.dynamic_ceiling_pct = None
-                                    else:
-                                        self._dynamic_upper_ok_since = None
-
-                                self._on_ui(lambda: self.general_status.config(text="Status: normal", fg="#bbb"))
-
-                        else:
-                            # ===== Estratégia ZONA SEGURA =====
-                            if level_zone != "SEGURA":
-                                if not self.dynamic_limiting_active:
-                                    self.dynamic_limiting_active = True
-                                    # pegamos um teto inicial
-                                    if self.dynamic_softlock_enabled:
-                                        cur = self._quantize_pct(self._vol_cache)
-                                        self.dynamic_ceiling_pct = cur if self.dynamic_ceiling_pct is None else min(self.dynamic_ceiling_pct, cur)
-                                        self._dynamic_upper_ok_since = None
-
-                                if (now - self.last_dynamic_adjust_ts) >= self.dynamic_adjust_interval:
-                                    if L_eff < 90: step = self.dynamic_step_small
-                                    else: step = self.dynamic_step_medium if L_eff < 95 else self.dynamic_step_large
-                                    def _decay2():
-                                        new_v = max(self.cfg["min_enforced_volume"], self._vol_cache - step)
-                                        if abs(new_v - self._vol_cache) >= 0.1:
-                                            self._safe_set_slider(new_v)
-                                            if self.dynamic_softlock_enabled:
-                                                self.dynamic_ceiling_pct = new_v if self.dynamic_ceiling_pct is None else min(self.dynamic_ceiling_pct, new_v)
-                                    self._on_ui(_decay2)
-                                    self.last_dynamic_adjust_ts = now
-                                self._on_ui(lambda: self.general_status.config(
-                                    text="Status: auto-limitando (até zona segura)", fg=DISCORD_WARN))
-                            else:
-                                # estamos na zona segura
-                                self.dynamic_limiting_active = False
-                                self.dynamic_decay_active = False
-                                # Libera teto após estabilidade em verde por X s
-                                if self.dynamic_softlock_enabled:
-                                    if level_zone == "SEGURA":
-                                        if self._dynamic_upper_ok_since is None:
-                                            self._dynamic_upper_ok_since = now
-                                        elif (now - self._dynamic_upper_ok_since) >= self.dynamic_release_delay:
-                                            self.dynamic_ceiling_pct = None
-                                    else:
-                                        self._dynamic_upper_ok_since = None
-                                self._on_ui(lambda: self.general_status.config(text="Status: normal", fg="#bbb"))
-
-                    # ----- Alertas DIÁRIOS -----
-                    daily_pct = self.daily_dose * 100.0
-                    if daily_pct >= 80.0 and not self.daily_warn_fired and daily_pct < 100.0:
-                        self.daily_warn_fired = True
-                        self._on_ui(lambda: messagebox.showwarning("Atenção diária", "Dose diária ≥ 80%."))
-                    if 80.0 <= daily_pct < 100.0:
-                        self._on_ui(lambda: self.period_label.config(fg=DISCORD_WARN))
-                    elif daily_pct >= 100.0:
-                        self._on_ui(lambda: self.period_label.config(fg=DISCORD_ERROR))
-                    else:
-                        self._on_ui(lambda: self.period_label.config(fg="#bbb"))
-
-                    if daily_pct >= 100.0 and not self.daily_block_fired:
-                        self.daily_block_fired = True
-                        self._on_ui(lambda: messagebox.showerror("Bloqueio diário", "Dose diária atingiu 100%. Volume mínimo imposto."))
-                        if self.hard_lock_enabled:
-                            self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
-
-                    # Alertas de dose (sessão = diária)
-                    if not self.alert_50_fired and self.session_dose >= 0.5:
-                        self.alert_50_fired = True
-                        self._on_ui(lambda: messagebox.showwarning("Atenção", "Você atingiu 50% da dose diária."))
-                    if not self.alert_100_fired and self.session_dose >= 1.0:
-                        self.alert_100_fired = True
-                        self._on_ui(lambda: messagebox.showerror("Risco crítico", "Limite de dose diária ultrapassado!"))
-                        if self.hard_lock_enabled:
-                            self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
-
-                    # ----- Atualiza UI -----
-                    self._on_ui(lambda: self.gauge.set_value(L_eff, self.session_dose))
-                    self._on_ui(lambda: self.draw_zone_badge(zone, zone_color))
-                    self._on_ui(lambda: self.time_label.config(
-                        text=f"Tempo permitido: {time_str} | Tempo neste volume: {time_cur_str}"
-                    ))
-                    self._on_ui(lambda: self.remaining_label.config(
-                        text=f"Tempo restante (neste volume) até 100%: {remaining_str}"
-                    ))
-                    self._on_ui(lambda: self.vol_slider.configure(progress_color=zone_color))
-                    self._on_ui(lambda: self.vol_label.configure(text=f"{round_pct_ui(self._vol_cache)}%"))
-                    self._on_ui(lambda: self.period_label.config(text=f"Dose diária: {daily_pct:.0f}%"))
-
-                    # Sync com sistema periodicamente
-                    if self._audio_volume is not None and (now - self._last_sys_sync) >= 0.5:
-                        self._last_sys_sync = now
+                    # pedidos da UI (troca de norma) entre dois updates, nunca no meio de um
+                    while True:
                         try:
-                            sys_pct = self._quantize_pct(self._get_system_volume_percent())
-
-                            # Se há teto, rebaixa o volume do Windows caso tenha subido acima dele
-                            if self.dynamic_softlock_enabled and self.dynamic_ceiling_pct is not None:
-                                if sys_pct > self.dynamic_ceiling_pct + 0.5:
-                                    self._on_ui(lambda: self._safe_set_slider(self.dynamic_ceiling_pct))
-                                    self._apply_system_volume_from_slider(show_install_hint=False)
-                                    sys_pct = self.dynamic_ceiling_pct
-
-                            if self.locked:
-                                if abs(sys_pct - float(self.lock_target_pct or 0)) > 0.5:
-                                    self._on_ui(lambda: self._safe_set_slider(self.lock_target_pct))
-                                    self._apply_system_volume_from_slider(show_install_hint=False)
-                            else:
-                                # Se estivermos em queda dinâmica, ignora subidas externas
-                                if self.dynamic_decay_active and sys_pct > float(self._vol_cache) + 0.01:
-                                    sys_pct = self._vol_cache
-                                if abs(sys_pct - float(self._vol_cache)) > 1.0:
-                                    self._on_ui(lambda v=sys_pct: self._safe_set_slider(v))
-                        except Exception:
-                            pass
-
-                    # Histórico (~1s)
-                    if (now - self._last_hist_log) >= 1.0:
-                        self._last_hist_log = now
-                        t_rel = now - self.session_start_ts
-                        self.history.append({
-                            "ts_iso": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
-                            "t_session": t_rel,
-                            "mode": self.mode,
-                            "vol_percent": float(self._vol_cache),
-                            "L": L_eff,
-                            "dose": self.session_dose,
-                            "zone": zone,
-                            "daily": self.daily_dose,
-                        })
-                        self.chart_points.append((t_rel, L_eff, self.session_dose))
-                        cutoff = t_rel - self.chart_window_sec - 2
-                        self.chart_points = [p for p in self.chart_points if p[0] >= cutoff]
-
-                    # Redesenha gráfico (~0.8s)
-                    if (now - self._last_chart_draw) >= 0.8:
-                        self._last_chart_draw = now
-                        self._on_ui(self._draw_history_chart)
+                            self._engine_requests.get_nowait()()
+                        except Empty:
+                            break
+
+                    # Dose, timer, EMA, zonas e alertas ficam no motor
+                    level = None
+                    if self.level_meter is not None:
+                        level = self.level_meter.level_db(float(self._vol_cache), self.cfg, self.levels)
+                    st = self.engine.update(float(self._vol_cache), paused=self.paused, level_db=level)
+
+                    if st.paused:
+                        self._monitor_wait(self.monitor_idle_tick_sec)
+                        continue
+
+                    if st.session_dose >= 1.0 and not self.locked and self.hard_lock_enabled:
+                        self._on_ui(lambda: self._lock_volume(self.cfg["min_enforced_volume"], reason="limite diário"))
+
+                    # ----- Regras dos modos (policy.py) -----
+                    if not self.locked:
+                        self._apply_policy(self.policy.step(st, float(self._vol_cache), self.mode))
+
+                    self._record_sample(st, self.engine.session_start_ts)
 
                 except Exception as ex:
                     print("Erro no monitor:", ex)
 
-                time.sleep(0.2)
+                if diag is not None:
+                    diag.record("monitor.tick", time.perf_counter() - t_tick)
+                self._monitor_wait(self._next_monitor_timeout())
         finally:
-            pythoncom.CoUninitialize()
+            if com_inited:
+                com_uninitialize()
+
+    def _record_sample(self, st, session_start_ts):
+        """Histórico (~1s); diário em disco junto (fsync imediato em alertas); gráfico (~0.8s)."""
+        now = st.ts
+        vol = float(st.vol_percent)
+        hist_due = (now - self._last_hist_log) >= self.monitor_idle_tick_sec - 0.01
+        if hist_due or st.events:
+            try:
+                self.journal.append(st.day_key, now, st.t_session, session_start_ts,
+                                    self.mode, vol, st.L, st.session_dose,
+                                    st.zone, st.daily_dose, sync=bool(st.events))
+            except Exception as e:
+                print("Erro ao gravar diário:", e)
+        if hist_due:
+            self._last_hist_log = now
+            self.history.append(now, st.t_session, self.mode, vol,
+                                st.L, st.session_dose, st.zone, st.daily_dose)
+            self.stats.add(st.t_session, st.L, vol, st.session_dose)
+            if self.timeseries is not None:
+                try:
+                    self.timeseries.add(now, st.t_session, self.mode, vol,
+                                        st.L, st.session_dose, st.zone, st.daily_dose)
+                except Exception as e:
+                    print("Erro ao gravar série temporal:", e)
+            if self.publisher is not None:
+                self.publisher.publish(now, st.L, vol, st.session_dose, st.daily_dose, st.day_key)
+
+        if (now - self._last_chart_draw) >= 0.8:
+            self._last_chart_draw = now
+            self._ui_state.publish("chart", True)
+
+    # ---------- Motor em processo próprio ----------
+    def _worker_prefs(self):
+        return {
+            "mode": self.mode,
+            "volume": float(self._vol_cache),
+            "paused": self.paused,
+            "hard_lock_enabled": self.hard_lock_enabled,
+            "lock_on_autoadjust": self.lock_on_autoadjust,
+            "dynamic_strategy": self.policy.dynamic_strategy,
+            "dynamic_softlock_enabled": self.policy.dynamic_softlock_enabled,
+            "quantum": self._volume_quantum,
+            "idle_tick_sec": self.monitor_idle_tick_sec,
+        }
+
+    def _start_worker(self):
+        """Sobe o processo do motor com o estado atual (dose retomada do diário, trava)."""
+        try:
+            from .worker import WorkerProcess
+            prefs = self._worker_prefs()
+            if self.locked and self.lock_target_pct is not None:
+                prefs["lock"] = (self.lock_target_pct, self.lock_reason)
+            e = self.engine
+            initial = {"day_key": e.day_key, "daily_dose": e.daily_dose,
+                       "session_dose": e.session_dose, "session_start_ts": e.session_start_ts,
+                       "standards": (list(e.standards.session), list(e.standards.daily))}
+            worker = WorkerProcess(self.cfg, prefs, initial)
+            worker.start()
+        except Exception as e:
+            print("Falha ao iniciar o processo do motor; usando thread:", e)
+            return False
+        self.worker = worker
+        return True
+
+    def _worker_loop(self):
+        """
+        Lado da UI do modo processo: lê o bloco compartilhado (sem trava),
+        avisa, espelha slider/trava/status e grava histórico e diário.
+        """
+        from .worker import engine_state_of, events_between   # multiprocessing: só neste modo
+        worker = self.worker
+        prev = None
+        while not self._stop_event.is_set():
+            try:
+                if self.level_meter is not None:
+                    level = self.level_meter.level_db(float(self._vol_cache), self.cfg, self.levels)
+                    if level is not None:
+                        worker.set_level(level)
+                s = worker.read()
+                if s is None:
+                    if not worker.alive and prev is not None:
+                        print("Processo do motor encerrou.")
+                        return
+                elif prev is None or s.ticks != prev.ticks or s.cmd_seq != prev.cmd_seq:
+                    st = engine_state_of(s, events_between(prev, s))
+                    self._mirror_worker(s, prev)
+                    self._on_engine_state(st)
+                    if not st.paused:
+                        self._record_sample(st, s.session_start_ts)
+                    prev = s
+            except Exception as ex:
+                print("Erro no monitor:", ex)
+            self._monitor_wait(self.worker_poll_sec)
+
+    def _mirror_worker(self, s, prev):
+        """Slider, trava e status seguem o motor (só depois de ele tratar os nossos comandos)."""
+        if prev is None or s.status_seq != prev.status_seq:
+            self._ui_state.publish("status", (s.status_text, s.status_color))
+        if s.cmd_seq < self.worker.sent:
+            return
+        if abs(s.vol_percent - float(self._vol_cache)) > 0.1:
+            self._ui_state.publish("slider", s.vol_percent)
+        if s.locked and not self.locked:
+            target, reason = s.lock_target_pct, s.lock_reason
+            self._on_ui(lambda: self._lock_volume(target, reason=reason, honor_min=False))
+
+    # ---------- Coletor da frota ----------
+    def _start_publisher(self):
+        target = collector_from_env()
+        cs = self._collector_setting
+        if target is None and cs and cs.get("host"):
+            target = (str(cs["host"]), int(cs.get("port", 8765)))
+        if target is None:
+            return
+        try:
+            self.publisher = DosePublisher(target[0], target[1], user=(cs or {}).get("user"))
+            self.publisher.start()
+        except Exception as e:
+            print("Falha ao iniciar envio ao coletor:", e)
+            self.publisher = None
+
+    # ---------- Medição do sinal ----------
+    def _start_level_meter(self):
+        spec = os.environ.get("TCC_MEASUREMENT", "").strip() or self._measurement_setting
+        if not spec or spec.lower() == "off":
+            return
+        try:
+            from .measurement import create_level_meter   # NumPy só se a medição for usada
+            self.level_meter = create_level_meter(spec)
+            self.level_meter.start()
+        except Exception as e:
+            print("Medição do sinal indisponível, usando o slider:", e)
+            self.level_meter = None
+
+    # ---------- Diagnóstico ----------
+    def _enable_diagnostics(self):
+        if self.diag is not None:
+            return
+        diag = Diagnostics()
+        self.volume.instrument(diag)
+        diag.instrument(self.gauge, "set_value", "redraw.gauge")
+        diag.instrument(self.chart, "refresh", "redraw.chart")
+        diag.instrument(self, "draw_zone_badge", "redraw.zone_badge")
+        diag.instrument(self, "_apply_ui_state", "ui.apply_state")
+        self.diag = diag
+
+    def _open_diagnostics_panel(self):
+        top = ctk.CTkToplevel(self)
+        top.title("Diagnóstico")
+        top.geometry("640x420")
+        top.attributes("-topmost", True)
+        text = tk.Text(top, bg=DISCORD_SURFACE, fg=DISCORD_TEXT, font=("Consolas", 10),
+                       relief="flat", highlightthickness=0)
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 4))
+        bar = ctk.CTkFrame(top, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=(0, 10))
+        lbl = ctk.CTkLabel(bar, text="", anchor="w")
+
+        def refresh():
+            if not top.winfo_exists():
+                return
+            if self.diag is None:
+                body = "Instrumentação desligada (TCC_DIAGNOSTICS=1 ou botão Ativar)."
+            else:
+                body = self.diag.format_table()
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", body)
+            text.configure(state="disabled")
+            top.after(1000, refresh)
+
+        def toggle():
+            if self.diag is None:
+                self._diag_setting = True
+                self._enable_diagnostics()
+                lbl.configure(text="Ativado (vale também nas próximas execuções).")
+            else:
+                self.diag.reset()
+                lbl.configure(text="Histogramas zerados.")
+
+        def disable_next():
+            # a instrumentação já ligada fica até fechar o app (os métodos estão embrulhados)
+            self._diag_setting = False
+            lbl.configure(text="Não será ativado nas próximas execuções.")
+
+        def dump():
+            if self.diag is None:
+                return
+            try:
+                path = self.diag.dump()
+                lbl.configure(text=f"Salvo em {path}")
+            except Exception as e:
+                lbl.configure(text=f"Falha ao salvar: {e}")
+
+        ctk.CTkButton(bar, text="Ativar / Zerar", width=120, command=toggle).pack(side="left")
+        ctk.CTkButton(bar, text="Salvar JSON", width=120, fg_color=DISCORD_ACCENT, command=dump).pack(side="left", padx=8)
+        ctk.CTkButton(bar, text="Desativar", width=100, fg_color="#444", command=disable_next).pack(side="left")
+        lbl.pack(side="left", fill="x", expand=True, padx=8)
+        refresh()
+
+    # ---------- Notificações ----------
+    def _on_unread_change(self, unread):
+        text = f"Notificações ({unread})" if unread else "Notificações"
+        self._ui_cache.configure(self.btn_notifications, text=text,
+                                 fg_color=DISCORD_ACCENT if unread else "#444")
+
+    def _set_os_notifications(self, enabled):
+        self._os_notify_setting = bool(enabled)
+        if enabled and self.os_notifier is None:
+            notifier = OsNotifier()
+            if not notifier.available:
+                return False
+            notifier.start()
+            self.notifications.add_sink(notifier)
+            self.os_notifier = notifier
+        elif not enabled and self.os_notifier is not None:
+            self.os_notifier.stop()     # sink continua registrado, mas sem thread ignora
+            self.os_notifier = None
+        return True
+
+    def _open_notifications_panel(self):
+        top = ctk.CTkToplevel(self)
+        top.title("Notificações")
+        top.geometry("640x360")
+        top.attributes("-topmost", True)
+        text = tk.Text(top, bg=DISCORD_SURFACE, fg=DISCORD_TEXT, font=("Consolas", 10),
+                       relief="flat", highlightthickness=0, wrap="word")
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 4))
+        bar = ctk.CTkFrame(top, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=(0, 10))
+        lbl = ctk.CTkLabel(bar, text="", anchor="w")
+        var_os = tk.BooleanVar(value=self.os_notifier is not None)
+
+        def refresh():
+            items = self.notifications.history()
+            body = "\n".join(n.format_line() for n in items) or "Nenhuma notificação nesta execução."
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", body)
+            text.configure(state="disabled")
+            self.notifications.mark_read()
+            if self.notifications.suppressed:
+                lbl.configure(text=f"{self.notifications.suppressed} aviso(s) só no histórico (limite de toasts).")
+
+        def toggle_os():
+            if not self._set_os_notifications(var_os.get()):
+                var_os.set(False)
+                lbl.configure(text="Sem notificador do sistema (pip install plyer ou notify-send).")
+            self._save_settings()
+
+        def clear():
+            self.notifications.clear()
+            self.toasts.clear()
+            refresh()
+
+        ctk.CTkCheckBox(bar, text="Também no sistema", variable=var_os, command=toggle_os).pack(side="left")
+        ctk.CTkButton(bar, text="Limpar", width=100, fg_color="#444", command=clear).pack(side="left", padx=8)
+        lbl.pack(side="left", fill="x", expand=True, padx=8)
+        refresh()
 
     # ---------- Configurações ----------
     def _open_settings_modal(self):
+        calib_profiles = self.levels.profiles()
+        CALIB_LINEAR = "Reta (mín./máx. dB)"
+        current_calib = self.cfg.get("calibration_profile") or LINEAR_PROFILE
+        var_calib = tk.StringVar(value=current_calib if current_calib in calib_profiles else CALIB_LINEAR)
+
+        def calib_key():
+            name = var_calib.get()
+            return LINEAR_PROFILE if name == CALIB_LINEAR else name
+
+        def _tables_for(tmp_cfg):
+            # mesmas tabelas do motor (curva do dispositivo escolhida)
+            return LevelTables(tmp_cfg, self._volume_quantum,
+                               calib_profiles.get(tmp_cfg.get("calibration_profile") or LINEAR_PROFILE))
+
+        def pretty(sec):
+            s = int(max(0, sec)); h = s // 3600; m = (s % 3600) // 60
+            if h > 0: return f"{h}h {m}min"
+            return f"{m}min"
+
         def _cfg_preview_text(tmp_cfg):
             # exemplos práticos a partir do perfil diário
-            t85 = allowed_time_seconds_for_level(85, tmp_cfg)
-            t90 = allowed_time_seconds_for_level(90, tmp_cfg)
-            def pretty(sec):
-                s = int(max(0, sec)); h = s // 3600; m = (s % 3600) // 60
-                if h > 0: return f"{h}h {m}min"
-                return f"{m}min"
+            tables = _tables_for(tmp_cfg)
+            t85 = tables.allowed_for_level(85)
+            t90 = tables.allowed_for_level(90)
+            vol = self._quantize_pct(self._vol_cache)
+            L_vol, t_vol, _, _ = tables.at_percent(vol)
+            # hoje: parte da dose já foi usada (previsão a partir do estado do motor)
+            daily = self._daily_dose_for(tmp_cfg)
+            _L_max, vol_max = max_sustainable(tables, daily, seconds_until_midnight(time.time()))
             return (f"Exemplo prático (base diária 8h):\n"
                     f"• A 85 dB: ~{pretty(t85)} até atingir 100% da dose diária.\n"
                     f"• A 90 dB: ~{pretty(t90)} até atingir 100% da dose diária.\n"
+                    f"• No volume atual ({vol:.0f}% ≈ {L_vol:.1f} dB): ~{pretty(t_vol)}.\n"
+                    f"• Hoje (dose já em {daily * 100:.0f}%): ~{pretty(max(0.0, 1.0 - daily) * t_vol)} neste volume; "
+                    f"até 0h dá para manter até {vol_max:.0f}%.\n"
                     f"O modo Prefixado mantém uma folga mínima antes de ajustar o volume.")
 
+        def _plan_text(tmp_cfg, text):
+            """Agenda digitada na aba "Planejar" -> trajetória, cruzamentos e volume sustentável."""
+            try:
+                schedule = parse_schedule(text)
+            except ValueError as ex:
+                return str(ex)
+            if not schedule:
+                return "Digite trechos como 2h@60%, 30min@80% (ou 1h@85dB)."
+            now = time.time()
+            daily = self._daily_dose_for(tmp_cfg)
+            fc = forecast(_tables_for(tmp_cfg), schedule, daily, rest_of_day_sec=seconds_until_midnight(now))
+            # (início, fim, trecho) para rotular os pontos; a meia-noite pode partir um trecho em dois
+            spans, t = [], 0.0
+            for seg in schedule:
+                if seg.duration_sec > 0:
+                    spans.append((t, t + seg.duration_sec, seg))
+                    t += seg.duration_sec
+            lines = []
+            for (t0, d0, _s0), (t1, d1, _s1) in zip(fc.points, fc.points[1:]):
+                if t1 <= t0:
+                    lines.append("• 0h: novo dia, a dose volta a 0%.")
+                    continue
+                seg = next((sg for a, b, sg in spans if a <= t0 < b), spans[-1][2])
+                what = f"{seg.vol_percent:.0f}%" if seg.level_db is None else f"{seg.level_db:.0f} dB"
+                lines.append(f"• {time.strftime('%H:%M', time.localtime(now + t0))}–"
+                             f"{time.strftime('%H:%M', time.localtime(now + t1))} a {what}: "
+                             f"{d0 * 100:.0f}% → {d1 * 100:.0f}%")
+            for thr, t in sorted(fc.crossings.items()):
+                if t is not None and t > 0.0:
+                    lines.append(f"• Atinge {thr * 100:.0f}% às {time.strftime('%H:%M', time.localtime(now + t))}.")
+            if fc.rest_sec is not None and fc.rest_sec <= 0.0:
+                lines.append("Depois da agenda: sem tempo restante hoje.")
+            elif fc.max_level_db is None:
+                lines.append("Depois da agenda não sobra dose para hoje.")
+            else:
+                lines.append(f"Depois da agenda, até 0h: volume máximo sustentável {fc.max_vol_percent:.0f}%.")
+            return "\n".join(lines)
+
         def _make_tmp_cfg(ref_db=None, er=None, min_vol=None, def_vol=None):
             tmp = dict(self.cfg)
+            tmp["calibration_profile"] = calib_key()
             if ref_db is not None: tmp["ref_db"] = float(ref_db)
             if er is not None:     tmp["exchange_rate_db"] = float(er)
             # base diária é sempre 8h
@@ -1109,6 +1374,10 @@ class SoundMonitorApp(ctk.CTk):
                 "ref_db": 80.0, "er": 3.0,
                 "desc": "Mais protetivo: 80 dB por 8h, troca 3 dB."
             },
+            "OSHA (90 dB / 8h, 5 dB)": {
+                "ref_db": 90.0, "er": 5.0,
+                "desc": "Limite legal dos EUA: 90 dB por 8h, troca 5 dB (menos protetivo)."
+            },
             "Personalizado (manter atual)": {
                 "ref_db": None, "er": None,
                 "desc": "Mantém valores atuais de referência e troca. Base diária é sempre 8h."
@@ -1124,6 +1393,7 @@ class SoundMonitorApp(ctk.CTk):
         tab.pack(fill="both", expand=True, padx=16, pady=16)
         basic = tab.add("Básico")
         adv = tab.add("Avançado")
+        plan = tab.add("Planejar")
 
         # ===== Básico =====
         basic_wrap = ctk.CTkFrame(basic, fg_color=DISCORD_SURFACE)
@@ -1140,6 +1410,8 @@ class SoundMonitorApp(ctk.CTk):
             current_profile = "NIOSH (85 dB / 8h, 3 dB)"
         elif abs(cur_ref - 80.0) < 0.6 and abs(cur_er - 3.0) < 0.6:
             current_profile = "OMS (80 dB / 8h, 3 dB)"
+        elif abs(cur_ref - 90.0) < 0.6 and abs(cur_er - 5.0) < 0.6:
+            current_profile = "OSHA (90 dB / 8h, 5 dB)"
 
         var_profile = tk.StringVar(value=current_profile)
         opt_profile = ctk.CTkOptionMenu(basic_wrap, values=profile_names, variable=var_profile)
@@ -1157,7 +1429,7 @@ class SoundMonitorApp(ctk.CTk):
             "Reduzir até Zona Segura": "zona_segura",
         }
         dyn_map_key_to_name = {v: k for k, v in dyn_map_name_to_key.items()}
-        var_dyn = tk.StringVar(value=dyn_map_key_to_name.get(self.dynamic_strategy, dyn_names[0]))
+        var_dyn = tk.StringVar(value=dyn_map_key_to_name.get(self.policy.dynamic_strategy, dyn_names[0]))
         ctk.CTkOptionMenu(basic_wrap, values=dyn_names, variable=var_dyn).pack(fill="x", pady=(0,6))
         ctk.CTkLabel(basic_wrap,
             text=("• Reserva: mantém uma folga alvo e reduz suave quando precisa.\n"
@@ -1188,7 +1460,7 @@ class SoundMonitorApp(ctk.CTk):
                                    lambda v: tmp_min.__setitem__(0, v), max_to=60)
 
         # Soft-lock
-        var_dyn_softlock = tk.BooleanVar(value=self.dynamic_softlock_enabled)
+        var_dyn_softlock = tk.BooleanVar(value=self.policy.dynamic_softlock_enabled)
         ctk.CTkCheckBox(
             basic_wrap,
             text="Travar aumentos enquanto o Dinâmico reduz (soft-lock)",
@@ -1200,16 +1472,39 @@ class SoundMonitorApp(ctk.CTk):
         lbl_preview = ctk.CTkLabel(preview_box, text=_cfg_preview_text(self.cfg), justify="left", wraplength=600)
         lbl_preview.pack(padx=12, pady=10)
 
-        def _refresh_preview_for_profile(name):
+        def _tmp_for_profile(name):
             p = PROFILES.get(name, PROFILES["Personalizado (manter atual)"])
             if p["ref_db"] is None:
-                tmp = _make_tmp_cfg(min_vol=tmp_min[0], def_vol=tmp_def[0])
-            else:
-                tmp = _make_tmp_cfg(ref_db=p["ref_db"], er=p["er"], min_vol=tmp_min[0], def_vol=tmp_def[0])
-            lbl_profile_desc.configure(text=p["desc"])
+                return _make_tmp_cfg(min_vol=tmp_min[0], def_vol=tmp_def[0])
+            return _make_tmp_cfg(ref_db=p["ref_db"], er=p["er"], min_vol=tmp_min[0], def_vol=tmp_def[0])
+
+        def _refresh_preview_for_profile(name):
+            tmp = _tmp_for_profile(name)
+            lbl_profile_desc.configure(text=PROFILES.get(name, PROFILES["Personalizado (manter atual)"])["desc"])
             lbl_preview.configure(text=_cfg_preview_text(tmp))
+            _refresh_plan()
         opt_profile.configure(command=_refresh_preview_for_profile)
 
+        # ===== Planejar =====
+        # previsão analítica (forecast.py): recalculada a cada tecla, no perfil escolhido no Básico
+        plan_wrap = ctk.CTkFrame(plan, fg_color=DISCORD_SURFACE)
+        plan_wrap.pack(fill="both", expand=True, padx=6, pady=6)
+        ctk.CTkLabel(plan_wrap,
+            text=("Agenda a partir de agora (trechos separados por vírgula):\n"
+                  "duração@volume, ex.: 2h@60%, 30min@80% ou 1h@85dB"),
+            anchor="w", justify="left").pack(fill="x", pady=(8,4))
+        ent_plan = ctk.CTkEntry(plan_wrap, placeholder_text="2h@60%, 30min@80%")
+        ent_plan.pack(fill="x", pady=(0,8))
+        plan_box = ctk.CTkFrame(plan_wrap, fg_color=DISCORD_SURFACE_ALT, corner_radius=8)
+        plan_box.pack(fill="x", pady=(4,4))
+        lbl_plan = ctk.CTkLabel(plan_box, text="", justify="left", anchor="w", wraplength=600)
+        lbl_plan.pack(fill="x", padx=12, pady=10)
+
+        def _refresh_plan(_event=None):
+            lbl_plan.configure(text=_plan_text(_tmp_for_profile(var_profile.get()), ent_plan.get()))
+        ent_plan.bind("<KeyRelease>", _refresh_plan)
+        _refresh_plan()
+
         # ===== Avançado =====
         adv_wrap = ctk.CTkFrame(adv, fg_color=DISCORD_SURFACE)
         adv_wrap.pack(fill="both", expand=True, padx=6, pady=6)
@@ -1230,6 +1525,20 @@ class SoundMonitorApp(ctk.CTk):
         e_ref_db = add_row(adv_wrap, "Nível de referência (dB):", self.cfg["ref_db"])
         e_er     = add_row(adv_wrap, "Taxa de troca (dB) [3]:", self.cfg["exchange_rate_db"])
 
+        # Curva do dispositivo (python -m sound_monitor.calibration add ...)
+        calib_row = ctk.CTkFrame(adv_wrap, fg_color=DISCORD_SURFACE)
+        calib_row.pack(fill="x", pady=6)
+        ctk.CTkLabel(calib_row, text="Calibração do dispositivo:", width=320, anchor="w").pack(side="left")
+        calib_names = [CALIB_LINEAR] + sorted(calib_profiles)
+        ctk.CTkOptionMenu(calib_row, values=calib_names, variable=var_calib,
+                          command=lambda _v: _refresh_preview_for_profile(var_profile.get()))\
+            .pack(side="right")
+
+        # Motor/trava fora do processo da UI (worker.py)
+        var_worker = tk.BooleanVar(value=self._worker_setting)
+        ctk.CTkCheckBox(adv_wrap, text="Motor e trava em processo separado (vale ao reiniciar o app)",
+                        variable=var_worker).pack(anchor="w", pady=6)
+
         btns = ctk.CTkFrame(top, fg_color=DISCORD_SURFACE); btns.pack(fill="x", pady=(0,12), padx=16)
 
         def apply_all():
@@ -1255,7 +1564,9 @@ class SoundMonitorApp(ctk.CTk):
                 dyn_key = {"Reserva de tempo (10–20 min)": "reserva", "Reduzir até Zona Segura": "zona_segura"}[var_dyn.get()]
 
                 # Atualiza cfg diária (base fixa 8h)
+                profile_changed = (ref_db, er) != (float(self.cfg["ref_db"]), float(self.cfg["exchange_rate_db"]))
                 self.cfg.update({
+                    "calibration_profile": calib_key(),
                     "min_db": min_db,
                     "max_db": max_db,
                     "ref_db": ref_db,
@@ -1264,16 +1575,30 @@ class SoundMonitorApp(ctk.CTk):
                     "min_enforced_volume": min_vol,
                     "default_volume": def_vol,
                 })
-                self.dynamic_softlock_enabled = bool(var_dyn_softlock.get())
-                self.dynamic_strategy = dyn_key
+                self.policy.dynamic_softlock_enabled = bool(var_dyn_softlock.get())
+                self.policy.dynamic_strategy = dyn_key
+                self._worker_setting = bool(var_worker.get())
+                # cfg mudou: tabelas recompiladas no próximo acesso
+                self.levels.invalidate()
+                tables = self.levels.tables
+                if profile_changed:
+                    # dose acumulada na nova norma desde o início do dia (no modo processo o motor
+                    # separado faz o mesmo ao receber o cfg em _save_settings)
+                    if self.worker is None:
+                        # o update() do monitor lê e regrava as mesmas doses: a troca vai pela thread dele
+                        self._engine_requests.put(self.engine.switch_profile)
+                        self._wake_monitor()
+                    else:
+                        self.engine.switch_profile()
 
                 # Aplica UI
                 self._refresh_profile_label()
-                self.gauge.set_bounds(self.cfg["min_db"], self.cfg["max_db"])
+                self.gauge.set_bounds(tables.min_db, tables.max_db)
                 self.gauge.set_profile_ref(self.cfg["ref_db"])
-                L_eff = map_percent_to_db(self._vol_cache, self.cfg)
-                self.gauge.set_value(L_eff, self.session_dose)
-                self.vol_label.configure(text=f"{round_pct_ui(self._vol_cache)}%")
+                self.chart.set_bounds(tables.min_db, tables.max_db)
+                L_eff = tables.db_for_percent(self._vol_cache)
+                self.gauge.set_value(L_eff, self.engine.session_dose)
+                self._set_vol_label(self._vol_cache)
                 self.set_mode(self.mode, silent=True)
                 self._save_settings()
 
@@ -1292,6 +1617,8 @@ class SoundMonitorApp(ctk.CTk):
             e_max_db.delete(0, tk.END); e_max_db.insert(0, str(self._defaults_cfg["max_db"]))
             e_ref_db.delete(0, tk.END); e_ref_db.insert(0, "85")
             e_er.delete(0, tk.END); e_er.insert(0, "3")
+            var_calib.set(CALIB_LINEAR)
+            var_worker.set(False)
             _refresh_preview_for_profile("NIOSH (85 dB / 8h, 3 dB)")
             messagebox.showinfo("Configurações", "Padrões restaurados (não esqueça de clicar em Aplicar).")
 
@@ -1307,12 +1634,36 @@ class SoundMonitorApp(ctk.CTk):
     # ----------
     def _on_close(self):
         self._stop_event.set()
+        self._wake_monitor()
+        # o tick em andamento termina antes de fechar diário/histórico/série
+        if self._monitor_thread is not None:
+            self._monitor_thread.join(timeout=2.0)
         try: self._save_settings()
         except Exception: pass
-        try: self._stop_lock_enforcer()
+        try: self.volume.stop()
+        except Exception: pass
+        if self.publisher is not None:
+            self.publisher.stop()
+        if self.level_meter is not None:
+            self.level_meter.stop()
+        if self.os_notifier is not None:
+            self.os_notifier.stop()
+        if self.worker is not None:
+            self.worker.stop()
+        if self.diag is not None:
+            try: self.diag.dump()
+            except Exception: pass
+        if self._export_cancel is not None:
+            self._export_cancel.set()
+        try: self.history.close()
+        except Exception: pass
+        try: self.journal.close()
+        except Exception: pass
+        try:
+            if self.timeseries is not None: self.timeseries.close()
         except Exception: pass
         try:
-            if self._ui_com_inited: pythoncom.CoUninitialize()
+            if self._ui_com_inited: com_uninitialize()
         except Exception: pass
         self.destroy()
 
@@ -1,19 +1,43 @@
 # audio_support.py
+#
+# Nada de comtypes/pycaw/pythoncom no import: só se verifica se existem.
+# O backend escolhido (volume_backend.create_backend) importa o que usar.
 
+import importlib.util
 import platform
 
-_PYCAW_AVAILABLE = False
-try:
-    if platform.system() == "Windows":
-        from comtypes import CLSCTX_ALL  # type: ignore
-        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume  # type: ignore
-        _PYCAW_AVAILABLE = True
-    else:
-        CLSCTX_ALL = None
-        AudioUtilities = None
-        IAudioEndpointVolume = None
-except Exception:
-    _PYCAW_AVAILABLE = False
-    CLSCTX_ALL = None
-    AudioUtilities = None
-    IAudioEndpointVolume = None
+_IS_WINDOWS = platform.system() == "Windows"
+_PYCAW_AVAILABLE = (
+    _IS_WINDOWS
+    and importlib.util.find_spec("pycaw") is not None
+    and importlib.util.find_spec("comtypes") is not None
+)
+
+
+def load_pycaw():
+    """Importa PyCAW sob demanda -> (AudioUtilities, IAudioEndpointVolume, CLSCTX_ALL)."""
+    from comtypes import CLSCTX_ALL  # type: ignore
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume  # type: ignore
+    return AudioUtilities, IAudioEndpointVolume, CLSCTX_ALL
+
+
+def com_initialize():
+    """CoInitialize na thread atual (no-op fora do Windows / sem pywin32)."""
+    if not _IS_WINDOWS:
+        return False
+    try:
+        import pythoncom  # type: ignore
+        pythoncom.CoInitialize()
+        return True
+    except Exception:
+        return False
+
+
+def com_uninitialize():
+    if not _IS_WINDOWS:
+        return
+    try:
+        import pythoncom  # type: ignore
+        pythoncom.CoUninitialize()
+    except Exception:
+        pass
@@ -0,0 +1,526 @@
+# bench.py
+#
+# Simulação determinística + benchmark do monitor, sem Tk nem COM:
+#   python -m sound_monitor.bench                 # roda e compara com a baseline
+#   python -m sound_monitor.bench --save-baseline # grava a baseline atual
+#   python -m sound_monitor.bench --quick         # cenários curtos (CI / fumaça)
+# Usa o mesmo DoseEngine / ModePolicy / HistoryStore do app, com relógio
+# falso e MemoryBackend no lugar do volume do SO. O grupo "startup" mede o
+# import do app com `python -X importtime` num processo novo; o "worker"
+# compara o atraso do loop do motor em thread e em processo próprio com a
+# UI ocupando o GIL.
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .engine import DoseEngine
+from .history import HistoryStore
+from .policy import ModePolicy
+from .stats import ExposureStats
+from .volume_backend import MemoryBackend
+
+DEFAULT_BASELINE = Path(__file__).with_name("bench_baselines.json")
+
+BENCH_CFG = {
+    "min_db": 40.0,
+    "max_db": 95.0,
+    "ref_db": 85.0,
+    "base_time_sec": 8 * 3600.0,
+    "exchange_rate_db": 3.0,
+    "min_enforced_volume": 5.0,
+    "default_volume": 30.0,
+}
+
+# Métricas em que "maior é melhor"; as demais (latência, memória, tempo) são "menor é melhor"
+_HIGHER_IS_BETTER = ("sim_hours_per_sec",)
+# Resultados da simulação: têm de bater (mudou = mudança de comportamento)
+_EXACT = ("final_session_dose", "final_daily_dose", "locks", "ticks", "deferred_imported")
+
+# Orçamento de import do app até a janela (VDI lenta ~3x esta máquina)
+STARTUP_IMPORT_BUDGET_SEC = 0.35
+# Só podem ser importados depois da 1ª janela (exportação / backend de áudio)
+_DEFERRED_MODULES = ("openpyxl", "numpy", "pycaw", "comtypes", "pythoncom")
+
+# Medição do sinal (48 kHz estéreo): fração de um núcleo que pode gastar
+MEASUREMENT_CPU_BUDGET = 0.03
+
+# Motor em processo próprio: pior atraso de despertar com a UI ocupando o GIL
+WORKER_TICK_LAG_BUDGET_SEC = 0.02
+# Nível constante: L10/L50/L90 têm de dar o próprio nível (nunca acima do pico)
+LEVELS_MAX_ERR_DB = 1e-9
+# Dependem do agendador do SO: só valem contra o orçamento, não contra a baseline
+_BUDGET_ONLY = ("tick_lag_max_sec", "inproc_tick_lag_max_sec", "read_us")
+# Tempos em µs/s dependem da máquina e da carga: contra a baseline só avisam
+# ("lento"); reprovam com --strict. O padrão falha só em _EXACT e orçamentos.
+_TIMING = ("tick_p50_us", "tick_p95_us", "tick_p99_us", "sim_hours_per_sec",
+           "import_app_sec", "cpu_fraction_48k_stereo")
+_TIMING_PREFIX = "export_"
+
+
+class FakeClock:
+    def __init__(self, start):
+        self.now = float(start)
+
+    def __call__(self):
+        return self.now
+
+
+class SimMonitor:
+    """Réplica sem UI do _monitor_loop do app: motor, regras dos modos, trava e histórico."""
+
+    def __init__(self, cfg, clock, backend, mode="prefixado", strategy="reserva",
+                 history_capacity=3600, hard_lock=True, lock_on_autoadjust=True):
+        self.cfg = cfg
+        self.clock = clock
+        self.engine = DoseEngine(cfg, clock=clock)
+        self.policy = ModePolicy(cfg)
+        self.policy.dynamic_strategy = strategy
+        self.history = HistoryStore(capacity=history_capacity)
+        self.stats = ExposureStats()
+        self.mode = mode
+        self.hard_lock = hard_lock
+        self.lock_on_autoadjust = lock_on_autoadjust
+        self.idle_tick_sec = 1.0
+        self.locked = False
+        self.lock_target_pct = None
+        self.locks = 0
+        self.events = 0
+        self._last_hist_log = 0.0
+        self.backend = backend
+        self.vol = backend.get_percent()
+        backend.add_listener(self._on_system_volume_change)
+
+    def _quantize(self, pct):
+        return max(0.0, min(100.0, round(float(pct))))
+
+    def _on_system_volume_change(self, pct):
+        # mesma lógica do app: trava > teto > sync
+        if self.locked:
+            if abs(pct - self.lock_target_pct) > 0.5:
+                self.backend.set_percent(self.lock_target_pct)
+            return
+        sys_pct = self._quantize(pct)
+        ceiling = self.policy.dynamic_ceiling_pct
+        if self.policy.dynamic_softlock_enabled and ceiling is not None and sys_pct > ceiling + 0.5:
+            self.backend.set_percent(ceiling)
+            self.vol = ceiling
+            return
+        if self.policy.dynamic_decay_active and sys_pct > self.vol + 0.01:
+            return
+        self.vol = sys_pct
+
+    def _lock(self, target, honor_min=True):
+        if honor_min:
+            target = max(self.cfg["min_enforced_volume"], target)
+        self.locked = True
+        self.lock_target_pct = float(target)
+        self.locks += 1
+        self.vol = self._quantize(target)
+        self.backend.set_percent(self.vol)
+
+    def tick(self):
+        st = self.engine.update(self.vol)
+        self.events += len(st.events)
+        if st.session_dose >= 1.0 and not self.locked and self.hard_lock:
+            self._lock(self.cfg["min_enforced_volume"])
+        if not self.locked:
+            d = self.policy.step(st, self.vol, self.mode)
+            if d.volume is not None:
+                self.vol = self._quantize(d.volume)
+                self.backend.set_percent(self.vol)
+            if d.lock is not None and self.lock_on_autoadjust and not self.locked:
+                target, _reason, honor_min = d.lock
+                self._lock(target, honor_min)
+        now = st.ts
+        if (now - self._last_hist_log) >= self.idle_tick_sec - 0.01:
+            self._last_hist_log = now
+            self.history.append(now, st.t_session, self.mode, self.vol, st.L,
+                                st.session_dose, st.zone, st.daily_dose)
+            self.stats.add(st.t_session, st.L, self.vol, st.session_dose)
+        return st
+
+    def next_timeout(self):
+        now = self.clock()
+        timeout = self._last_hist_log + self.idle_tick_sec - now
+        crossing = self.engine.next_crossing_in(now)
+        if crossing is not None:
+            timeout = min(timeout, crossing + 0.001)
+        step_in = self.policy.next_step_in(now)
+        if step_in is not None:
+            timeout = min(timeout, step_in)
+        return max(0.01, timeout)
+
+
+# ---------- Traços sintéticos: lista de (segundos desde o início, volume %) ----------
+def trace_steady(hours, pct=30.0):
+    return [(0.0, pct)]
+
+
+def trace_rapid(hours, seed=42):
+    rnd = random.Random(seed)
+    t, out = 0.0, []
+    while t < hours * 3600.0:
+        out.append((t, float(rnd.randint(20, 70))))
+        t += rnd.uniform(0.2, 2.0)
+    return out
+
+
+def _local_at(hour, days_from_now=1):
+    d = datetime.now().replace(hour=hour, minute=0, second=0, microsecond=0) + timedelta(days=days_from_now)
+    return d.timestamp()
+
+
+def run_simulation(trace, hours, start_ts=None, mode="prefixado", strategy="reserva", initial_pct=30.0):
+    """Roda o traço no relógio falso; devolve (SimMonitor, latências em s, tempo de parede)."""
+    start = _local_at(9) if start_ts is None else float(start_ts)
+    clock = FakeClock(start)
+    backend = MemoryBackend(initial_pct)
+    sim = SimMonitor(BENCH_CFG, clock, backend, mode=mode, strategy=strategy)
+    t_end = start + hours * 3600.0
+    latencies = []
+    perf = time.perf_counter
+    i, n = 0, len(trace)
+    next_wake = start
+    wall0 = perf()
+    while True:
+        t_ev = start + trace[i][0] if i < n else math.inf
+        if t_ev <= next_wake:
+            if t_ev >= t_end:
+                break
+            clock.now = t_ev
+            backend.external_change(trace[i][1])
+            i += 1
+        else:
+            if next_wake >= t_end:
+                break
+            clock.now = next_wake
+        t0 = perf()
+        sim.tick()
+        latencies.append(perf() - t0)
+        next_wake = clock.now + sim.next_timeout()
+    return sim, latencies, perf() - wall0
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def scenarios(quick=False):
+    h = 0.25 if quick else 1.0
+    return {
+        "steady": dict(trace=trace_steady(8 * h, 80.0), hours=8 * h),
+        "rapid": dict(trace=trace_rapid(h), hours=h),
+        # meia-noite no meio do traço
+        "midnight": dict(trace=trace_steady(3 * h, 90.0), hours=3 * h, start_ts=_local_at(0, 2) - 1.5 * 3600 * h),
+        "dyn_reserva": dict(trace=trace_steady(4 * h, 95.0), hours=4 * h, mode="dinamico", strategy="reserva"),
+        "dyn_zona_segura": dict(trace=trace_steady(2 * h, 85.0), hours=2 * h, mode="dinamico", strategy="zona_segura"),
+    }
+
+
+def bench_scenarios(quick=False):
+    out = {}
+    for name, sc in scenarios(quick).items():
+        sim, lat, wall = run_simulation(**sc)
+        lat.sort()
+        out[name] = {
+            "sim_hours_per_sec": sc["hours"] / wall if wall > 0 else float("inf"),
+            "tick_p50_us": _percentile(lat, 0.50) * 1e6,
+            "tick_p95_us": _percentile(lat, 0.95) * 1e6,
+            "tick_p99_us": _percentile(lat, 0.99) * 1e6,
+            "ticks": len(lat),
+            "locks": sim.locks,
+            "final_session_dose": sim.engine.session_dose,
+            "final_daily_dose": sim.engine.daily_dose,
+        }
+    return out
+
+
+def _fill_history(history, stats, hours):
+    rnd = random.Random(7)
+    ts0 = _local_at(9)
+    L, dose = 70.0, 0.0
+    for i in range(int(hours * 3600)):
+        if rnd.random() < 0.01:
+            L = rnd.uniform(55.0, 90.0)
+        dose = min(1.0, dose + 1e-5)
+        history.append(ts0 + i, float(i), 0, 30.0, L, dose, 0, dose)
+        stats.add(float(i), L, 30.0, dose)
+
+
+def bench_memory_per_hour():
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        history = HistoryStore(capacity=10 ** 7)
+        _fill_history(history, ExposureStats(), 1.0)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    grown = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    return {"history_bytes_per_hour": float(grown)}
+
+
+def bench_export(hours_list=(1, 8, 24)):
+    from .excel_support import _OPENPYXL_AVAILABLE, load_openpyxl
+    from .excel_export import write_session_report
+    if not _OPENPYXL_AVAILABLE:
+        print("openpyxl ausente: exportação não medida (pip install openpyxl)")
+        return {}
+    load_openpyxl()     # o import adiado fica fora da medida (startup mede o app)
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for hours in hours_list:
+            history = HistoryStore(capacity=3600, spill_dir=tmp)
+            stats = ExposureStats()
+            _fill_history(history, stats, hours)
+            fname = os.path.join(tmp, f"bench_{hours}h.xlsx")
+            t0 = time.perf_counter()
+            write_session_report(fname, history, stats.snapshot, BENCH_CFG)
+            out[f"export_{hours}h_sec"] = time.perf_counter() - t0
+            history.close()
+    return out
+
+
+def _parse_importtime(stderr):
+    """Saída de -X importtime -> {módulo: cumulativo em segundos}."""
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            out[name.strip()] = int(cumulative) / 1e6
+        except ValueError:
+            continue      # cabeçalho
+    return out
+
+
+def bench_startup(runs=3, module="sound_monitor.app"):
+    """Melhor de `runs` imports do app em processo novo + módulos adiados que vazaram."""
+    root = Path(__file__).resolve().parent.parent
+    best = None
+    imported = {}
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=str(root), capture_output=True, text=True)
+        if proc.returncode != 0:
+            print("Import do app falhou; startup não medido:", proc.stderr.strip().splitlines()[-1:])
+            return {}
+        imported = _parse_importtime(proc.stderr)
+        t = imported.get(module)
+        if t is not None and (best is None or t < best):
+            best = t
+    leaked = sorted({name.split(".")[0] for name in imported} & set(_DEFERRED_MODULES))
+    if leaked:
+        print("Importados antes da janela:", ", ".join(leaked))
+    return {"import_app_sec": best or 0.0, "deferred_imported": float(len(leaked))}
+
+
+def bench_measurement(seconds=60.0, samplerate=48000):
+    """CPU da ponderação A + Leq (replay de WAV) por segundo de áudio estéreo."""
+    from .numpy_support import _NUMPY_AVAILABLE, np
+    if not _NUMPY_AVAILABLE:
+        print("numpy ausente: medição do sinal não medida (pip install numpy)")
+        return {}
+    import wave
+    from .measurement import AWeightedMeter, WavFileSource
+    rng = np.random.default_rng(1234)
+    frames = int(seconds * samplerate)
+    t = np.arange(frames) / samplerate
+    mono = 0.2 * np.sin(2 * np.pi * 440.0 * t) + 0.05 * rng.standard_normal(frames)
+    pcm = (np.stack((mono, mono), axis=1) * 32767).astype("<i2")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.wav")
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(2); wf.setsampwidth(2); wf.setframerate(samplerate)
+            wf.writeframes(pcm.tobytes())
+        source = WavFileSource(path)
+        cpu = math.inf
+        for _ in range(3):      # melhor de 3 (a medida é curta e ruidosa)
+            meter = AWeightedMeter(samplerate, 2, block_sec=source.block_sec)
+            c0 = time.process_time()
+            for block in source.blocks():
+                meter.process(block)
+            cpu = min(cpu, time.process_time() - c0)
+    return {"cpu_fraction_48k_stereo": cpu / seconds}
+
+
+def _gil_load(stop, threads=3):
+    """Threads Python puras: simulam a UI ocupada (modal, exportação, gráfico)."""
+    def burn():
+        while not stop.is_set():
+            sum(range(2000))
+    ts = [threading.Thread(target=burn, daemon=True) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    return ts
+
+
+def bench_worker(seconds=2.0, period=0.01):
+    """Atraso máximo de um loop de `period` s: thread do processo da UI x processo do motor."""
+    from .worker import WorkerProcess
+    cfg = dict(BENCH_CFG, calibration_profile="")
+    stop = threading.Event()
+    lag = [0.0]
+
+    def inproc_loop():
+        deadline = time.monotonic() + period
+        while not stop.is_set():
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            lag[0] = max(lag[0], time.monotonic() - deadline)
+            deadline = time.monotonic() + period
+
+    old_backend = os.environ.get("TCC_VOLUME_BACKEND")
+    os.environ["TCC_VOLUME_BACKEND"] = "memory"
+    worker = WorkerProcess(cfg, {"volume": 30.0, "idle_tick_sec": period})
+    try:
+        worker.start()
+        if not worker.wait_ready():
+            print("Processo do motor não subiu; worker não medido.")
+            return {}
+        t0 = time.perf_counter()
+        for _ in range(10000):
+            worker.read()
+        read_us = (time.perf_counter() - t0) / 10000 * 1e6
+        base = worker.read().tick_lag_max_sec
+        probe = threading.Thread(target=inproc_loop, daemon=True)
+        probe.start()
+        load = _gil_load(stop)
+        time.sleep(seconds)
+        state = worker.read()
+        stop.set()
+        for t in load + [probe]:
+            t.join()
+    finally:
+        worker.stop()
+        if old_backend is None:
+            os.environ.pop("TCC_VOLUME_BACKEND", None)
+        else:
+            os.environ["TCC_VOLUME_BACKEND"] = old_backend
+    return {
+        "tick_lag_max_sec": max(base, state.tick_lag_max_sec),
+        "inproc_tick_lag_max_sec": lag[0],
+        "read_us": read_us,
+    }
+
+
+def bench_levels(levels_db=(40.0, 62.3, 85.0, 95.0), hours=1.0):
+    """Pior |LN - nível| e pior LN - pico com um nível constante (valores da tabela)."""
+    err = over_peak = 0.0
+    for L in levels_db:
+        stats = ExposureStats()
+        for i in range(int(hours * 3600) + 1):
+            stats.add(float(i), L, 30.0, 0.0)
+        snap = stats.snapshot()
+        for n in (10, 50, 90):
+            err = max(err, abs(snap[f"l{n}_db"] - L))
+            over_peak = max(over_peak, snap[f"l{n}_db"] - snap["peak_db"])
+    return {"constant_max_err_db": err, "constant_over_peak_db": over_peak}
+
+
+def run_all(quick=False):
+    results = bench_scenarios(quick)
+    results["memory"] = bench_memory_per_hour()
+    results["export"] = bench_export((1,) if quick else (1, 8, 24))
+    results["startup"] = bench_startup(3)
+    results["measurement"] = bench_measurement(15.0 if quick else 60.0)
+    results["worker"] = bench_worker(1.0 if quick else 3.0)
+    results["levels"] = bench_levels()
+    return results
+
+
+def compare(results, baseline, tolerance, strict=False):
+    """Lista de (chave, atual, baseline, veredito) – veredito: ok / lento / REGRESSÃO / MUDOU."""
+    rows = []
+    for group, metrics in results.items():
+        base_group = baseline.get(group, {})
+        for key, value in metrics.items():
+            base = base_group.get(key)
+            if base is None:
+                rows.append((f"{group}.{key}", value, None, "novo"))
+                continue
+            if key in _BUDGET_ONLY:
+                rows.append((f"{group}.{key}", value, base, "info"))
+            elif key in _EXACT:
+                same = math.isclose(value, base, rel_tol=1e-9, abs_tol=1e-12)
+                rows.append((f"{group}.{key}", value, base, "ok" if same else "MUDOU"))
+            else:
+                if key in _HIGHER_IS_BETTER:
+                    bad = value < base * (1.0 - tolerance)
+                else:
+                    bad = value > base * (1.0 + tolerance)
+                timing = key in _TIMING or key.startswith(_TIMING_PREFIX)
+                verdict = ("lento" if timing and not strict else "REGRESSÃO") if bad else "ok"
+                rows.append((f"{group}.{key}", value, base, verdict))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m sound_monitor.bench",
+                                 description="Benchmark determinístico do monitor de exposição.")
+    ap.add_argument("--quick", action="store_true", help="cenários curtos (1/4 do tempo, export só 1h)")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="arquivo JSON de baseline")
+    ap.add_argument("--save-baseline", action="store_true", help="grava os resultados como nova baseline")
+    ap.add_argument("--tolerance", type=float, default=0.30, help="piora relativa tolerada (0.30 = 30%%)")
+    ap.add_argument("--strict", action="store_true",
+                    help="tempos acima da baseline também reprovam (mesma máquina, sem carga)")
+    args = ap.parse_args(argv)
+
+    results = run_all(args.quick)
+    key = "quick" if args.quick else "full"
+    path = Path(args.baseline)
+    stored = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as fh:
+            stored = json.load(fh)
+
+    if args.save_baseline:
+        stored[key] = results
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(stored, fh, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Baseline '{key}' gravada em {path}")
+
+    rows = compare(results, stored.get(key, {}), args.tolerance, args.strict)
+    startup = results.get("startup", {}).get("import_app_sec")
+    if startup is not None:
+        verdict = "REGRESSÃO" if startup > STARTUP_IMPORT_BUDGET_SEC else "ok"
+        rows.append(("startup.budget", startup, STARTUP_IMPORT_BUDGET_SEC, verdict))
+    cpu = results.get("measurement", {}).get("cpu_fraction_48k_stereo")
+    if cpu is not None:
+        verdict = "REGRESSÃO" if cpu > MEASUREMENT_CPU_BUDGET else "ok"
+        rows.append(("measurement.budget", cpu, MEASUREMENT_CPU_BUDGET, verdict))
+    lag = results.get("worker", {}).get("tick_lag_max_sec")
+    if lag is not None:
+        verdict = "REGRESSÃO" if lag > WORKER_TICK_LAG_BUDGET_SEC else "ok"
+        rows.append(("worker.budget", lag, WORKER_TICK_LAG_BUDGET_SEC, verdict))
+    err = results.get("levels", {}).get("constant_max_err_db")
+    if err is not None:
+        verdict = "REGRESSÃO" if err > LEVELS_MAX_ERR_DB else "ok"
+        rows.append(("levels.budget", err, LEVELS_MAX_ERR_DB, verdict))
+    width = max(len(r[0]) for r in rows) if rows else 10
+    for name, value, base, verdict in rows:
+        base_txt = "-" if base is None else f"{base:.6g}"
+        print(f"{name:<{width}}  {value:>14.6g}  {base_txt:>14}  {verdict}")
+    failed = [r for r in rows if r[3] in ("REGRESSÃO", "MUDOU")]
+    if failed:
+        print(f"{len(failed)} métrica(s) fora da baseline.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# calibration.py
+#
+# Curvas de calibração por dispositivo de saída (pontos medidos volume% -> dB,
+# ex.: fone num acoplador com decibelímetro) e tabelas pré-calculadas.
+# LevelModel compila, uma vez por configuração, tabelas densas na resolução
+# do quantum de volume: % -> dB, tempo permitido, dose/s e zona pelo nível.
+# Motor, gauge, prévia das configurações, regras dos modos e relatório leem
+# das mesmas tabelas; invalidate() é chamado quando o cfg muda.
+#   python -m sound_monitor.calibration list
+#   python -m sound_monitor.calibration add "Fone X" 0:20 25:55 50:71 75:83 100:96
+#   python -m sound_monitor.calibration remove "Fone X"
+
+import argparse
+import bisect
+import json
+import sys
+import threading
+from pathlib import Path
+
+from .helpers import (
+    map_percent_to_db,
+    allowed_time_seconds_for_level,
+    risk_zone_from_level,
+)
+
+LINEAR_PROFILE = ""      # cfg["calibration_profile"] vazio = reta min_db..max_db
+
+
+def default_profiles_path():
+    return Path.home() / ".tcc_sound_monitor" / "calibration.json"
+
+
+class CalibrationProfile:
+    """Curva medida: pontos (volume %, dB) com dB não decrescente; interpolação linear."""
+
+    def __init__(self, name, points):
+        pts = sorted((float(p), float(db)) for p, db in points)
+        if len(pts) < 2:
+            raise ValueError("A curva precisa de pelo menos 2 pontos.")
+        for (p0, d0), (p1, d1) in zip(pts, pts[1:]):
+            if p1 <= p0:
+                raise ValueError(f"Volume repetido na curva: {p1:g}%")
+            if d1 < d0:
+                raise ValueError(f"dB precisa crescer com o volume ({p0:g}% -> {p1:g}%)")
+        if pts[0][0] < 0.0 or pts[-1][0] > 100.0:
+            raise ValueError("Volumes da curva devem estar entre 0 e 100%.")
+        self.name = str(name)
+        self.points = pts
+        self._xs = [p for p, _ in pts]
+
+    def db_at(self, pct):
+        """dB no volume `pct` (fora dos pontos medidos: valor da ponta)."""
+        pts = self.points
+        pct = max(0.0, min(100.0, float(pct)))
+        if pct <= pts[0][0]:
+            return pts[0][1]
+        if pct >= pts[-1][0]:
+            return pts[-1][1]
+        i = bisect.bisect_right(self._xs, pct)
+        (p0, d0), (p1, d1) = pts[i - 1], pts[i]
+        return d0 + (d1 - d0) * (pct - p0) / (p1 - p0)
+
+    def to_json(self):
+        return {"points": [[p, db] for p, db in self.points]}
+
+
+def load_profiles(path=None):
+    """{nome: CalibrationProfile} do calibration.json (perfis inválidos são ignorados)."""
+    path = Path(path) if path is not None else default_profiles_path()
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except Exception as e:
+        print("Falha ao ler calibração:", e)
+        return {}
+    out = {}
+    for name, spec in (data.get("profiles") or {}).items():
+        try:
+            out[name] = CalibrationProfile(name, spec["points"])
+        except Exception as e:
+            print(f"Perfil de calibração '{name}' ignorado:", e)
+    return out
+
+
+def save_profiles(profiles, path=None):
+    path = Path(path) if path is not None else default_profiles_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"profiles": {name: p.to_json() for name, p in sorted(profiles.items())}}
+    tmp = path.with_suffix(".json.part")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
+    tmp.replace(path)
+
+
+class LevelTables:
+    """
+    Tabelas imutáveis para um cfg + perfil: índice i <-> volume i*quantum.
+    Volumes fora da grade (slider livre) e níveis medidos caem nas fórmulas.
+    """
+
+    def __init__(self, cfg, quantum=1.0, profile=None):
+        self.cfg = dict(cfg)
+        self.quantum = float(quantum)
+        self.profile = profile
+        self.profile_name = profile.name if profile is not None else LINEAR_PROFILE
+        n = int(round(100.0 / self.quantum))
+        pcts = [min(100.0, i * self.quantum) for i in range(n + 1)]
+        if profile is None:
+            db = [map_percent_to_db(p, cfg) for p in pcts]
+        else:
+            db = [profile.db_at(p) for p in pcts]
+        allowed = [allowed_time_seconds_for_level(L, cfg) for L in db]
+        self.db = tuple(db)
+        self.allowed = tuple(allowed)
+        self.dose_rate = tuple(1.0 / a for a in allowed)
+        self.level_zone = tuple(risk_zone_from_level(L, cfg) for L in db)
+        self.min_db = db[0]
+        self.max_db = db[-1]
+
+    def _index(self, pct):
+        """Índice exato na grade ou None (volume fora do quantum)."""
+        x = max(0.0, min(100.0, float(pct))) / self.quantum
+        i = int(round(x))
+        return i if abs(x - i) < 1e-9 else None
+
+    def at_percent(self, pct):
+        """(dB, tempo permitido s, dose/s, zona) num só acesso – caminho do tick."""
+        i = self._index(pct)
+        if i is not None:
+            return self.db[i], self.allowed[i], self.dose_rate[i], self.level_zone[i]
+        L = self.db_for_percent(pct)
+        allowed = allowed_time_seconds_for_level(L, self.cfg)
+        return L, allowed, 1.0 / allowed, risk_zone_from_level(L, self.cfg)
+
+    def db_for_percent(self, pct):
+        i = self._index(pct)
+        if i is not None:
+            return self.db[i]
+        if self.profile is None:
+            return map_percent_to_db(pct, self.cfg)
+        return self.profile.db_at(pct)
+
+    def allowed_for_percent(self, pct):
+        i = self._index(pct)
+        if i is not None:
+            return self.allowed[i]
+        return allowed_time_seconds_for_level(self.db_for_percent(pct), self.cfg)
+
+    def dose_rate_for_percent(self, pct):
+        i = self._index(pct)
+        if i is not None:
+            return self.dose_rate[i]
+        return 1.0 / self.allowed_for_percent(pct)
+
+    def zone_for_percent(self, pct):
+        i = self._index(pct)
+        if i is not None:
+            return self.level_zone[i]
+        return risk_zone_from_level(self.db_for_percent(pct), self.cfg)
+
+    def allowed_for_level(self, L):
+        return allowed_time_seconds_for_level(L, self.cfg)
+
+    def percent_for_db(self, L):
+        """Maior volume da grade cujo dB não passa de L (0 se nem o mínimo couber)."""
+        i = bisect.bisect_right(self.db, float(L)) - 1
+        return max(0, i) * self.quantum if i >= 0 else 0.0
+
+    def rows(self, step_pct=5.0):
+        """Linhas (volume %, dB, tempo permitido s, dose/h, zona) para relatório/prévia."""
+        step = max(1, int(round(step_pct / self.quantum)))
+        out = []
+        for i in range(0, len(self.db), step):
+            out.append((i * self.quantum, self.db[i], self.allowed[i], self.dose_rate[i] * 3600.0,
+                        self.level_zone[i]))
+        return out
+
+
+class LevelModel:
+    """
+    Dono das tabelas: compila sob demanda e recompila após invalidate().
+    Leitores pegam `model.tables` uma vez por uso (troca atômica da referência).
+    """
+
+    def __init__(self, cfg, quantum=1.0, profiles_path=None):
+        self.cfg = cfg                   # referência compartilhada com o app
+        self.quantum = float(quantum)
+        self.profiles_path = profiles_path
+        self._tables = None
+        self._lock = threading.Lock()
+
+    @property
+    def tables(self):
+        t = self._tables
+        if t is None:
+            with self._lock:
+                t = self._tables
+                if t is None:
+                    t = self._tables = self._compile()
+        return t
+
+    def invalidate(self):
+        self._tables = None
+
+    def profiles(self):
+        return load_profiles(self.profiles_path)
+
+    def _compile(self):
+        name = self.cfg.get("calibration_profile") or LINEAR_PROFILE
+        profile = None
+        if name:
+            profile = self.profiles().get(name)
+            if profile is None:
+                print(f"Perfil de calibração '{name}' não encontrado; usando reta min/max dB.")
+        return LevelTables(self.cfg, self.quantum, profile)
+
+
+def _parse_point(text):
+    pct, _, db = text.partition(":")
+    return float(pct), float(db)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m sound_monitor.calibration",
+                                 description="Perfis de calibração (volume % -> dB) por dispositivo.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="lista os perfis")
+    p_add = sub.add_parser("add", help="cria/substitui um perfil")
+    p_add.add_argument("name")
+    p_add.add_argument("points", nargs="+", help="pontos volume:dB (ex.: 50:71.5)")
+    p_rm = sub.add_parser("remove", help="remove um perfil")
+    p_rm.add_argument("name")
+    ap.add_argument("--file", default=None, help="padrão: ~/.tcc_sound_monitor/calibration.json")
+    args = ap.parse_args(argv)
+
+    profiles = load_profiles(args.file)
+    if args.cmd == "list":
+        for name, p in sorted(profiles.items()):
+            pts = "  ".join(f"{pct:g}%:{db:g}dB" for pct, db in p.points)
+            print(f"{name}: {pts}")
+        if not profiles:
+            print("Nenhum perfil (o app usa a reta min/max dB).")
+        return 0
+    if args.cmd == "add":
+        profiles[args.name] = CalibrationProfile(args.name, [_parse_point(t) for t in args.points])
+    elif args.name in profiles:
+        del profiles[args.name]
+    else:
+        print(f"Perfil '{args.name}' não existe.")
+        return 1
+    save_profiles(profiles, args.file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
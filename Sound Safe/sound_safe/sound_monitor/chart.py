@@ -0,0 +1,249 @@
+# chart.py
+
+import math
+from collections import deque
+
+from .history import COL_TS, COL_T_SESSION, COL_L, COL_DOSE
+
+DB_COLOR = "#8FD14F"
+DOSE_COLOR = "#4FC3F7"
+
+# Passos "redondos" para as marcas do eixo de tempo (s)
+_TICK_STEPS = (10, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200)
+
+
+def _fmt_age(sec):
+    if sec == 0:
+        return "0s"
+    if sec < 60:
+        return f"-{sec}s"
+    if sec < 3600:
+        return f"-{sec // 60}min"
+    h, m = divmod(sec // 60, 60)
+    return f"-{h}h{m:02d}" if m else f"-{h}h"
+
+
+class _Bucket:
+    """Mín/máx de dB e dose numa coluna de pixels (ordem preservada)."""
+    __slots__ = ("idx", "L_first", "L_min", "L_max", "L_min_first", "d_min", "d_max")
+
+    def __init__(self, idx, L, dose):
+        self.idx = idx
+        self.L_first = L
+        self.L_min = self.L_max = L
+        self.L_min_first = True
+        self.d_min = self.d_max = dose
+
+    def add(self, L, dose):
+        if L < self.L_min:
+            self.L_min = L; self.L_min_first = False
+        elif L > self.L_max:
+            self.L_max = L; self.L_min_first = True
+        if dose < self.d_min: self.d_min = dose
+        if dose > self.d_max: self.d_max = dose
+
+
+class HistoryChart:
+    """
+    Gráfico dB/dose com itens persistentes: uma polilinha por série (coords),
+    dados decimados por min/máx em baldes do tamanho de 1 pixel e grade/rótulos
+    redesenhados só em resize ou troca de config/janela. O custo por quadro
+    depende da largura em pixels, não do número de amostras.
+    Janelas longas que o histórico em memória não cobre são lidas do
+    TimeSeriesStore (`store`, busca por índice de ts) em vez do spill.
+    """
+
+    pad_l, pad_r, pad_t, pad_b = 40, 10, 10, 25
+
+    def __init__(self, canvas, history, cfg, window_sec=120, store=None):
+        self.canvas = canvas
+        self.history = history
+        self.store = store
+        self.cfg = cfg
+        # escala em dB: a da curva do dispositivo (LevelTables), como no gauge – set_bounds()
+        self.min_db = float(cfg["min_db"])
+        self.max_db = float(cfg["max_db"])
+        self.window_sec = float(window_sec)
+        self._buckets = deque()
+        self._last_t = None
+        self._w = self._h = None
+        self._bucket_sec = 1.0
+
+        c = self.canvas
+        self._line_db = c.create_line(0, 0, 0, 0, fill=DB_COLOR, width=2, state="hidden")
+        self._line_dose = c.create_line(0, 0, 0, 0, fill=DOSE_COLOR, width=2, state="hidden")
+        self._empty_text = c.create_text(0, 0, text="Sem dados ainda", fill="#888", font=("Segoe UI", 10))
+        c.bind("<Configure>", lambda e: self._on_resize(), add="+")
+        self._on_resize()
+
+    # ---------- Geometria ----------
+    def _size(self):
+        w = int(self.canvas.winfo_width() or 0)
+        h = int(self.canvas.winfo_height() or 0)
+        if w <= 1: w = int(float(self.canvas.cget("width")) or 760)
+        if h <= 1: h = int(float(self.canvas.cget("height")) or 120)
+        return w, h
+
+    def _plot_width(self):
+        return max(1, self._w - self.pad_l - self.pad_r)
+
+    def _y_db(self, L):
+        min_db = self.min_db; max_db = self.max_db
+        ratio = (L - min_db) / max(1e-9, (max_db - min_db))
+        ratio = max(0.0, min(1.0, ratio))
+        return (self._h - self.pad_b) - (self._h - self.pad_b - self.pad_t) * ratio
+
+    def _y_dose(self, d):
+        ratio = max(0.0, min(1.0, float(d)))
+        return (self._h - self.pad_b) - (self._h - self.pad_b - self.pad_t) * ratio
+
+    def _on_resize(self):
+        size = self._size()
+        if size == (self._w, self._h):
+            return
+        self._w, self._h = size
+        self._rebuild()
+
+    # ---------- Config ----------
+    def set_window(self, window_sec):
+        self.window_sec = float(window_sec)
+        self._rebuild()
+
+    def set_config(self, cfg=None):
+        """Chamar quando o ref mudar (redesenha grade e linhas); a escala dB vem de set_bounds()."""
+        if cfg is not None:
+            self.cfg = cfg
+        self._rebuild()
+
+    def set_bounds(self, min_db, max_db):
+        """Escala dB das tabelas (levels.tables.min_db/max_db); redesenha."""
+        self.min_db = float(min_db)
+        self.max_db = float(max_db)
+        self._rebuild()
+
+    def reset(self):
+        self._buckets.clear()
+        self._last_t = None
+        self.refresh()
+
+    def _rebuild(self):
+        """Recalcula baldes a partir do histórico e redesenha a parte estática."""
+        self._bucket_sec = self.window_sec / self._plot_width()
+        self._buckets.clear()
+        self._last_t = None
+        last = self.history.last()
+        if last is not None:
+            self._ingest(self._window_rows(last))
+        self._draw_static()
+        self._update_lines()
+
+    # ---------- Dados ----------
+    def _window_rows(self, last):
+        t_min = last[COL_T_SESSION] - self.window_sec
+        if self.store is None or self.history.covers(t_min):
+            return self.history.iter_since(t_min)
+        # só a sessão atual (t_session é relativo ao início dela)
+        session_start = last[COL_TS] - last[COL_T_SESSION]
+        try:
+            rows = self.store.iter_raw(session_start + max(0.0, t_min), last[COL_TS])
+        except Exception as e:
+            print("Erro ao ler série temporal:", e)
+            return self.history.iter_since(t_min)
+        return (r for r in rows if r[COL_T_SESSION] >= t_min)
+
+    def _ingest(self, rows):
+        bsec = self._bucket_sec
+        buckets = self._buckets
+        for row in rows:
+            t = row[COL_T_SESSION]; L = row[COL_L]; dose = row[COL_DOSE]
+            idx = int(math.floor(t / bsec))
+            if buckets and buckets[-1].idx == idx:
+                buckets[-1].add(L, dose)
+            else:
+                buckets.append(_Bucket(idx, L, dose))
+            self._last_t = t
+        if self._last_t is not None:
+            first_idx = int(math.floor((self._last_t - self.window_sec) / bsec))
+            while buckets and buckets[0].idx < first_idx:
+                buckets.popleft()
+
+    def refresh(self):
+        """Puxa do histórico só as amostras novas e atualiza as polilinhas."""
+        last = self.history.last()
+        if last is None or (self._last_t is not None and last[COL_T_SESSION] < self._last_t):
+            # histórico limpo (reset de sessão)
+            self._buckets.clear()
+            self._last_t = None
+        if last is not None:
+            if self._last_t is None:
+                rows = self._window_rows(last)
+            else:
+                rows = (r for r in self.history.iter_since(self._last_t) if r[COL_T_SESSION] > self._last_t)
+            self._ingest(rows)
+        self._update_lines()
+
+    # ---------- Desenho ----------
+    def _draw_static(self):
+        c = self.canvas; w, h = self._w, self._h
+        pad_l, pad_r, pad_t, pad_b = self.pad_l, self.pad_r, self.pad_t, self.pad_b
+        c.delete("static")
+        c.create_line(pad_l, h - pad_b, w - pad_r, h - pad_b, fill="#555", tags="static")
+        c.create_line(pad_l, pad_t, pad_l, h - pad_b, fill="#555", tags="static")
+        for Lbl in (self.min_db, self.cfg["ref_db"], self.max_db):
+            y = self._y_db(Lbl)
+            c.create_line(pad_l - 5, y, w - pad_r, y, fill="#333", tags="static")
+            c.create_text(pad_l - 28, y, text=f"{Lbl:.0f}", fill="#aaa", font=("Segoe UI", 9), tags="static")
+        win = int(self.window_sec)
+        step = next((s for s in _TICK_STEPS if win / s <= 6), _TICK_STEPS[-1])
+        plot_w = self._plot_width()
+        for age in range(0, win + 1, step):
+            x = pad_l + plot_w * (1.0 - age / self.window_sec)
+            c.create_line(x, h - pad_b, x, pad_t, fill="#333", tags="static")
+            c.create_text(x, h - pad_b + 12, text=_fmt_age(age), fill="#aaa", font=("Segoe UI", 9), tags="static")
+        c.create_text(w - 140, pad_t + 12, text="dB", fill=DB_COLOR, font=("Segoe UI", 10, "bold"), tags="static")
+        c.create_text(w - 90, pad_t + 12, text="Dose%", fill=DOSE_COLOR, font=("Segoe UI", 10, "bold"), tags="static")
+        c.create_text(pad_l + 8, pad_t + 4, anchor="nw", text=f"Janela: {_fmt_age(win).lstrip('-')}",
+                      fill="#777", font=("Segoe UI", 9), tags="static")
+        c.coords(self._empty_text, w // 2, h // 2)
+        # linhas por cima da grade
+        c.tag_raise(self._line_db)
+        c.tag_raise(self._line_dose)
+
+    def _update_lines(self):
+        c = self.canvas
+        if not self._buckets:
+            c.itemconfigure(self._line_db, state="hidden")
+            c.itemconfigure(self._line_dose, state="hidden")
+            c.itemconfigure(self._empty_text, state="normal")
+            return
+        c.itemconfigure(self._empty_text, state="hidden")
+        plot_w = self._plot_width()
+        # eixo fixo (agora à direita, -janela à esquerda), alinhado com a grade estática
+        t_now = self._last_t
+        t_min = t_now - self.window_sec
+        span = self.window_sec
+        bsec = self._bucket_sec
+        pad_l = self.pad_l
+        db_pts = []; dose_pts = []
+        y_db = self._y_db; y_dose = self._y_dose
+        for b in self._buckets:
+            t = max(t_min, min(t_now, b.idx * bsec))
+            x = pad_l + plot_w * ((t - t_min) / span)
+            if b.L_min == b.L_max:
+                db_pts += (x, y_db(b.L_first))
+            elif b.L_min_first:
+                db_pts += (x, y_db(b.L_min), x, y_db(b.L_max))
+            else:
+                db_pts += (x, y_db(b.L_max), x, y_db(b.L_min))
+            if b.d_min == b.d_max:
+                dose_pts += (x, y_dose(b.d_min))
+            else:
+                dose_pts += (x, y_dose(b.d_min), x, y_dose(b.d_max))
+        if len(db_pts) < 4:
+            db_pts += db_pts
+        if len(dose_pts) < 4:
+            dose_pts += dose_pts
+        c.coords(self._line_db, *db_pts)
+        c.coords(self._line_dose, *dose_pts)
+        c.itemconfigure(self._line_db, state="normal")
+        c.itemconfigure(self._line_dose, state="normal")
@@ -0,0 +1,305 @@
+# collector.py
+#
+# Coletor da "frota" de monitores (asyncio, um processo):
+#   python -m sound_monitor.collector [--host 0.0.0.0] [--port 8765] [--db arquivo]
+#   python -m sound_monitor.collector --query over --threshold 0.8
+# Cada monitor envia lotes de amostras (fleet_protocol); o coletor grava em
+# SQLite em lotes (uma thread só para o banco: gravações e consultas
+# passam por ela, nunca pelo loop de eventos) e mantém a dose diária por usuário em
+# memória para responder consultas na hora. A fila entre conexões e gravação
+# é limitada: se o disco não acompanha, as conexões param de ser lidas e o
+# TCP segura os clientes (backpressure) em vez de a memória crescer.
+
+import argparse
+import asyncio
+import json
+import socket
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .fleet_protocol import (
+    DEFAULT_PORT,
+    HEADER_SIZE,
+    ProtocolError,
+    decode_body,
+    decode_length,
+    encode_frame,
+    read_frame_blocking,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    user TEXT NOT NULL, ts REAL NOT NULL,
+    L REAL, vol REAL, session_dose REAL, daily_dose REAL
+);
+CREATE INDEX IF NOT EXISTS samples_user_ts ON samples (user, ts);
+CREATE TABLE IF NOT EXISTS daily (
+    user TEXT NOT NULL, day TEXT NOT NULL,
+    dose REAL NOT NULL, max_L REAL, last_ts REAL,
+    PRIMARY KEY (user, day)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_DAILY = (
+    "INSERT INTO daily (user, day, dose, max_L, last_ts) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(user, day) DO UPDATE SET dose = max(dose, excluded.dose), "
+    "max_L = max(coalesce(max_L, excluded.max_L), excluded.max_L), "
+    "last_ts = max(coalesce(last_ts, excluded.last_ts), excluded.last_ts)"
+)
+
+
+def default_db_path():
+    return Path.home() / ".tcc_sound_monitor" / "collector.sqlite3"
+
+
+class _DailyEntry:
+    __slots__ = ("dose", "max_L", "last_ts")
+
+    def __init__(self):
+        self.dose = 0.0
+        self.max_L = None
+        self.last_ts = 0.0
+
+
+class Collector:
+    def __init__(self, db_path=None, queue_rows=50_000, batch_rows=5_000, batch_interval=0.5,
+                 idle_timeout=300.0):
+        self.db_path = Path(db_path) if db_path is not None else default_db_path()
+        self.batch_rows = int(batch_rows)
+        self.batch_interval = float(batch_interval)
+        self.idle_timeout = float(idle_timeout)
+        # fila limitada em lotes; cada item = (user, rows)
+        self._queue = asyncio.Queue(maxsize=max(1, queue_rows // 100))
+        self._daily = {}            # (user, day) -> _DailyEntry
+        self._hosts = {}            # user -> host
+        self._conns = set()
+        self.clients = 0
+        self.rows_received = 0
+        self.rows_written = 0
+        self._db = None
+        self._db_executor = None
+        self._server = None
+        self._writer_task = None
+
+    # ---------- Banco ----------
+    def _open_db(self):
+        if str(self.db_path) != ":memory:":
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        # dose de hoje volta para a memória (reinício do coletor)
+        today = time.strftime("%Y-%m-%d")
+        for user, day, dose, max_L, last_ts in db.execute(
+                "SELECT user, day, dose, max_L, last_ts FROM daily WHERE day = ?", (today,)):
+            e = self._daily.setdefault((user, day), _DailyEntry())
+            e.dose, e.max_L, e.last_ts = dose, max_L, last_ts or 0.0
+        return db
+
+    def _write_batch(self, samples, daily):
+        with self._db:
+            self._db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)", samples)
+            self._db.executemany(_UPSERT_DAILY, daily)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            user, rows = await self._queue.get()
+            batch = [(user, rows)]
+            n = len(rows)
+            deadline = loop.time() + self.batch_interval
+            while n < self.batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n += len(item[1])
+            samples = []
+            touched = {}
+            for user, rows in batch:
+                for ts, L, vol, sdose, ddose, day in rows:
+                    samples.append((user, ts, L, vol, sdose, ddose))
+                    touched[(user, day)] = self._daily[(user, day)]
+            daily = [(u, d, e.dose, e.max_L, e.last_ts) for (u, d), e in touched.items()]
+            try:
+                await loop.run_in_executor(self._db_executor, self._write_batch, samples, daily)
+                self.rows_written += len(samples)
+            except Exception as e:
+                print("Erro ao gravar lote no coletor:", e)
+            for _ in batch:
+                self._queue.task_done()
+
+    # ---------- Conexões ----------
+    def _ingest(self, user, rows):
+        if not isinstance(rows, list):
+            raise ProtocolError("'rows' precisa ser uma lista")
+        clean = []
+        for row in rows:
+            try:
+                ts, L, vol, sdose, ddose, day = row
+                ts = float(ts); L = float(L); vol = float(vol)
+                sdose = float(sdose); ddose = float(ddose); day = str(day)
+            except (TypeError, ValueError):
+                continue
+            e = self._daily.get((user, day))
+            if e is None:
+                e = self._daily[(user, day)] = _DailyEntry()
+            # dose diária do monitor é cumulativa: vale a maior vista no dia
+            if ddose > e.dose: e.dose = ddose
+            if e.max_L is None or L > e.max_L: e.max_L = L
+            if ts > e.last_ts: e.last_ts = ts
+            clean.append((ts, L, vol, sdose, ddose, day))
+        self.rows_received += len(clean)
+        return clean
+
+    async def _handle(self, reader, writer):
+        self.clients += 1
+        self._conns.add(writer)
+        user = None
+        try:
+            while True:
+                header = await asyncio.wait_for(reader.readexactly(HEADER_SIZE), self.idle_timeout)
+                body = await reader.readexactly(decode_length(header))
+                msg = decode_body(body)
+                kind = msg["type"]
+                if kind == "hello":
+                    user = str(msg.get("user") or "desconhecido")
+                    self._hosts[user] = str(msg.get("host") or "")
+                elif kind == "samples":
+                    if user is None:
+                        raise ProtocolError("samples antes de hello")
+                    rows = self._ingest(user, msg.get("rows") or ())
+                    if rows:
+                        # fila cheia -> este await segura a leitura desta conexão
+                        await self._queue.put((user, rows))
+                elif kind == "query":
+                    writer.write(encode_frame(await self._answer(msg)))
+                    await writer.drain()
+                else:
+                    raise ProtocolError(f"tipo desconhecido: {kind}")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except ProtocolError as e:
+            print("Cliente descartado:", e)
+        finally:
+            self.clients -= 1
+            self._conns.discard(writer)
+            writer.close()
+
+    # ---------- Consultas ----------
+    async def _answer(self, msg):
+        q = msg.get("q")
+        day = msg.get("day") or time.strftime("%Y-%m-%d")
+        try:
+            threshold = float(msg.get("threshold", 0.8))
+        except (TypeError, ValueError):
+            return {"type": "result", "ok": False, "error": f"threshold inválido: {msg.get('threshold')!r}"}
+        if not isinstance(day, str):
+            return {"type": "result", "ok": False, "error": f"day inválido: {day!r}"}
+        if q == "over":
+            data = sorted(
+                ({"user": u, "host": self._hosts.get(u, ""), "dose": e.dose, "max_L": e.max_L, "last_ts": e.last_ts}
+                 for (u, d), e in self._daily.items() if d == day and e.dose >= threshold),
+                key=lambda r: -r["dose"])
+        elif q == "user":
+            user = str(msg.get("user", ""))
+            data = await asyncio.get_running_loop().run_in_executor(self._db_executor, self._user_days, user)
+        elif q == "summary":
+            doses = [e.dose for (u, d), e in self._daily.items() if d == day]
+            data = {
+                "day": day,
+                "users": len(doses),
+                "mean_dose": sum(doses) / len(doses) if doses else 0.0,
+                "over_80": sum(1 for x in doses if x >= 0.8),
+                "over_100": sum(1 for x in doses if x >= 1.0),
+                "clients": self.clients,
+                "rows_received": self.rows_received,
+                "rows_written": self.rows_written,
+            }
+        else:
+            return {"type": "result", "ok": False, "error": f"consulta desconhecida: {q}"}
+        return {"type": "result", "ok": True, "data": data}
+
+    def _user_days(self, user, days=30):
+        rows = self._db.execute(
+            "SELECT day, dose, max_L FROM daily WHERE user = ? ORDER BY day DESC LIMIT ?",
+            (user, days)).fetchall()
+        return [{"day": d, "dose": dose, "max_L": max_L} for d, dose, max_L in rows]
+
+    # ---------- Ciclo de vida ----------
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collector-db")
+        self._db = self._open_db()
+        self._writer_task = asyncio.create_task(self._writer())
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for w in list(self._conns):
+                w.close()
+            await self._server.wait_closed()
+        await self._queue.join()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+        if self._db_executor is not None:
+            self._db_executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+
+    async def serve_forever(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+        print(f"Coletor ouvindo em {addrs} (banco: {self.db_path})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def query(host, port, q, timeout=5.0, **params):
+    """Cliente bloqueante simples para consultas (CLI / scripts)."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        msg = {"type": "query", "q": q}
+        msg.update(params)
+        sock.sendall(encode_frame(msg))
+        return read_frame_blocking(sock)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m sound_monitor.collector",
+                                 description="Coletor de dose da frota de monitores.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--db", default=None, help="arquivo SQLite (padrão: ~/.tcc_sound_monitor/collector.sqlite3)")
+    ap.add_argument("--query", choices=("over", "user", "summary"), help="consulta um coletor em execução")
+    ap.add_argument("--threshold", type=float, default=0.8)
+    ap.add_argument("--user", default=None)
+    ap.add_argument("--day", default=None, help="AAAA-MM-DD (padrão: hoje)")
+    args = ap.parse_args(argv)
+
+    if args.query:
+        params = {"threshold": args.threshold}
+        if args.user: params["user"] = args.user
+        if args.day: params["day"] = args.day
+        print(json.dumps(query(args.host, args.port, args.query, **params), ensure_ascii=False, indent=2))
+        return 0
+    try:
+        asyncio.run(Collector(args.db).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
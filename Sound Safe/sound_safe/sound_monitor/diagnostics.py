@@ -0,0 +1,168 @@
+# diagnostics.py
+#
+# Instrumentação opcional dos caminhos quentes (tick do monitor, fila de UI,
+# redesenho de widgets, chamadas ao backend de volume). Ligada por
+# TCC_DIAGNOSTICS=1 ou pela chave "diagnostics" do settings.json; desligada,
+# o app guarda None e cada ponto de medida custa só um `is not None`.
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+_SUB_BUCKETS = 8          # baldes por oitava (~9% de resolução)
+_MIN_VALUE = 1e-7         # abaixo disso cai no balde 0
+
+
+def enabled_from_env():
+    return os.environ.get("TCC_DIAGNOSTICS", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class Histogram:
+    """Histograma log (HDR simplificado): O(1) por amostra, memória fixa."""
+
+    __slots__ = ("unit", "count", "total", "min", "max", "_buckets")
+
+    def __init__(self, unit="s"):
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buckets = {}
+
+    @staticmethod
+    def _index(value):
+        if value <= _MIN_VALUE:
+            return 0
+        return int(math.log2(value / _MIN_VALUE) * _SUB_BUCKETS) + 1
+
+    @staticmethod
+    def _upper(index):
+        if index == 0:
+            return _MIN_VALUE
+        return _MIN_VALUE * 2.0 ** (index / _SUB_BUCKETS)
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min: self.min = value
+        if value > self.max: self.max = value
+        i = self._index(value)
+        self._buckets[i] = self._buckets.get(i, 0) + 1
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i in sorted(self._buckets):
+            seen += self._buckets[i]
+            if seen >= rank:
+                return min(self.max, self._upper(i))
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"unit": self.unit, "count": 0}
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Diagnostics:
+    """Registro de histogramas por nome (ex.: "monitor.tick", "ui.queue_latency")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists = {}
+        self.started_at = time.time()
+
+    def histogram(self, name, unit="s"):
+        h = self._hists.get(name)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(name, Histogram(unit))
+        return h
+
+    def record(self, name, value, unit="s"):
+        h = self._hists.get(name) or self.histogram(name, unit)
+        with self._lock:
+            h.record(value)
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._hists.items())}
+
+    # ---------- Envoltórios (só aplicados quando ligado) ----------
+    def timed_call(self, func, name):
+        """Envolve um callable da fila de UI: mede espera na fila e execução."""
+        enqueued = time.perf_counter()
+
+        def _call():
+            start = time.perf_counter()
+            self.record(name + "_latency", start - enqueued)
+            try:
+                return func()
+            finally:
+                self.record(name + "_exec", time.perf_counter() - start)
+        return _call
+
+    def instrument(self, obj, method_name, name):
+        """Substitui obj.method_name por uma versão cronometrada (só na instância)."""
+        original = getattr(obj, method_name)
+        perf = time.perf_counter
+        record = self.record
+
+        def _timed(*args, **kwargs):
+            t0 = perf()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(name, perf() - t0)
+        setattr(obj, method_name, _timed)
+        return original
+
+    # ---------- Saída ----------
+    def format_table(self):
+        lines = [f"{'métrica':<26}{'n':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'máx':>10}"]
+        for name, s in self.snapshot().items():
+            if not s["count"]:
+                continue
+            if s["unit"] != "s":
+                scale, suffix = 1.0, ""
+            elif s["p99"] < 1e-3:
+                scale, suffix = 1e6, "µs"
+            else:
+                scale, suffix = 1e3, "ms"
+            cols = "".join(f"{s[k] * scale:>8.2f}{suffix:<2}" for k in ("p50", "p95", "p99", "max"))
+            lines.append(f"{name:<26}{s['count']:>8}{cols}")
+        return "\n".join(lines)
+
+    def dump(self, directory=None):
+        """Grava o snapshot em JSON (~/.tcc_sound_monitor/diagnostics-*.json) e devolve o caminho."""
+        base = Path(directory) if directory is not None else Path.home() / ".tcc_sound_monitor"
+        base.mkdir(parents=True, exist_ok=True)
+        path = base / time.strftime("diagnostics-%Y%m%d-%H%M%S.json")
+        data = {
+            "started_at": self.started_at,
+            "dumped_at": time.time(),
+            "histograms": self.snapshot(),
+        }
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, indent=2)
+        return path
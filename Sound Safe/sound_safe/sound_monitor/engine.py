@@ -0,0 +1,337 @@
+# engine.py
+
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from .calibration import LevelModel
+from .helpers import (
+    allowed_time_seconds_for_level,
+    risk_zone_from_dose,
+    risk_zone_from_level,
+    round_pct_ui,
+)
+from .standards import StandardDoses, index_for_cfg
+
+# Eventos emitidos pelo motor (consumidos pela UI / serviço)
+EVENT_DAY_ROLLOVER = "day_rollover"
+EVENT_ALERT_50 = "alert_50"
+EVENT_ALERT_100 = "alert_100"
+EVENT_DAILY_WARN = "daily_warn"
+EVENT_DAILY_BLOCK = "daily_block"
+
+# Snapshot imutável publicado a cada amostra
+EngineState = namedtuple("EngineState", [
+    "ts",                     # epoch (relógio injetado)
+    "t_session",              # segundos desde o início da sessão
+    "day_key",
+    "paused",
+    "vol_percent",
+    "L",                      # dB efetivo
+    "session_dose",
+    "daily_dose",
+    "time_at_current_level",
+    "allowed_sec",
+    "remaining_sec",
+    "ema_remaining_sec",
+    "zone",                   # zona pela dose
+    "level_zone",             # zona pelo nível
+    "events",                 # tupla de EVENT_*
+    "standards",              # ((chave, nome, dose sessão, dose diária), ...) – standards.STANDARDS
+], defaults=((),))
+
+
+class DoseEngine:
+    """
+    Motor de dose sem UI: recebe amostras de volume e publica EngineState.
+    O relógio é injetável (clock() -> epoch), o que permite reproduzir horas
+    de exposição em milissegundos. % -> dB / tempo permitido / dose/s vêm das
+    tabelas de `levels` (calibration.LevelModel). Em paralelo, `standards`
+    acumula a dose em cada norma de standards.STANDARDS (troca de perfil sem perda).
+    """
+
+    def __init__(self, cfg, clock=time.time, levels=None):
+        self.cfg = cfg          # referência compartilhada (settings alteram em tempo real)
+        self.clock = clock
+        self.levels = levels if levels is not None else LevelModel(cfg)
+        self._subscribers = []
+        self.standards = StandardDoses()
+
+        # Timer "neste volume"
+        self.timer_epsilon_db = 1.0
+
+        # Suavização EMA do “tempo restante” (alpha referente a um passo de 0.2 s)
+        self.ema_alpha = 0.25
+        self.ema_step_sec = 0.2
+
+        # Intervalos maiores que isto (suspensão/hibernação do SO) não contam dose.
+        # None = integra qualquer intervalo (uso headless, despertando só nos limiares).
+        self.max_gap_sec = None
+
+        now = self.clock()
+        self.daily_dose = 0.0
+        self.day_key = self._day_key_for(now)
+        self.daily_warn_fired = False
+        self.daily_block_fired = False
+        self.reset_session(now)
+
+    # ---------- Assinantes ----------
+    def subscribe(self, callback):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self._subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    def _publish(self, state):
+        for cb in list(self._subscribers):
+            try:
+                cb(state)
+            except Exception as e:
+                print("Erro em assinante do motor:", e)
+
+    # ---------- Estado ----------
+    @staticmethod
+    def _day_key_for(ts):
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _next_midnight(ts):
+        d = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (d + timedelta(days=1)).timestamp()
+
+    def reset_session(self, now=None):
+        now = self.clock() if now is None else float(now)
+        self.session_dose = 0.0
+        self.prev_session_dose = 0.0
+        self.alert_50_fired = False
+        self.alert_100_fired = False
+        self.time_at_current_level = 0.0
+        self.standards.reset_session()
+        self.session_start_ts = now
+        self._last_update = now
+        self._held_L = None       # nível vigente desde _last_update (volume constante por trechos)
+        self._held_allowed = None # tempo permitido nesse nível (s)
+        self._held_rate = None    # dose/s nesse nível
+        self._last_L_for_timer = None
+        self._last_vol_key = None
+        self._ema_remaining_sec = None
+
+    def restore(self, day_key, daily_dose, session_dose=None, session_start_ts=None, now=None):
+        """
+        Retoma o estado gravado (diário de exposição) após reinício/queda.
+        Só vale para o mesmo dia; alertas já cruzados não disparam de novo.
+        Devolve True se restaurou.
+        """
+        now = self.clock() if now is None else float(now)
+        if day_key != self._day_key_for(now):
+            return False
+        self.day_key = day_key
+        self.daily_dose = min(10.0, max(self.daily_dose, float(daily_dose)))
+        self.daily_warn_fired = self.daily_dose >= 0.8
+        self.daily_block_fired = self.daily_dose >= 1.0
+        if session_dose is not None:
+            self.session_dose = min(1.0, float(session_dose))
+            self.prev_session_dose = self.session_dose
+            self.alert_50_fired = self.session_dose >= 0.5
+            self.alert_100_fired = self.session_dose >= 1.0
+            if session_start_ts is not None:
+                self.session_start_ts = float(session_start_ts)
+        return True
+
+    def switch_profile(self):
+        """
+        cfg passou a ser outra norma: sessão e dia assumem a dose já acumulada
+        nela. Alertas abaixo do novo valor são rearmados; os que o novo valor
+        já passou e ainda não tinham disparado disparam no próximo update.
+        False se o cfg não é uma norma de STANDARDS (dose atual mantida).
+        """
+        i = index_for_cfg(self.cfg, self.standards.standards)
+        if i is None:
+            return False
+        self.session_dose = self.prev_session_dose = self.standards.session[i]
+        self.daily_dose = self.standards.daily[i]
+        self.alert_50_fired = self.alert_50_fired and self.session_dose >= 0.5
+        self.alert_100_fired = self.alert_100_fired and self.session_dose >= 1.0
+        self.daily_warn_fired = self.daily_warn_fired and self.daily_dose >= 0.8
+        self.daily_block_fired = self.daily_block_fired and self.daily_dose >= 1.0
+        if self._held_L is not None:
+            self._held_allowed = allowed_time_seconds_for_level(self._held_L, self.cfg)
+            self._held_rate = 1.0 / self._held_allowed
+        self._ema_remaining_sec = None
+        return True
+
+    def reset_level_timer(self):
+        self.time_at_current_level = 0.0
+        self._last_L_for_timer = None
+        self._last_vol_key = None
+
+    def _roll_day_if_needed(self, now, events):
+        day_key = self._day_key_for(now)
+        if day_key != self.day_key:
+            self.day_key = day_key
+            self.daily_dose = 0.0
+            self.daily_warn_fired = False
+            self.daily_block_fired = False
+            self.alert_50_fired = False
+            self.alert_100_fired = False
+            self.session_dose = 0.0
+            self.standards.new_day()
+            events.append(EVENT_DAY_ROLLOVER)
+
+    # ---------- Integração exata ----------
+    def _integrate(self, dt):
+        """
+        Dose exata no trecho [_last_update, now]: o nível é constante entre
+        mudanças de volume, logo 2 ** (-diff/er) também é – a integral vira
+        dt / tempo_permitido(L), sem depender da frequência de amostragem.
+        """
+        if self._held_L is None or dt <= 0.0:
+            return
+        inc = dt * self._held_rate
+        self.prev_session_dose = self.session_dose
+        self.session_dose = min(1.0, self.session_dose + inc)
+        self.daily_dose = min(10.0, self.daily_dose + inc)
+        self.standards.integrate(dt)
+
+    def next_crossing_in(self, now=None):
+        """
+        Segundos até o próximo limiar de alerta (sessão 50%/100%, diária 80%/100%)
+        ou virada de dia, mantido o nível atual. None se pausado.
+        """
+        if self._held_L is None:
+            return None
+        now = self.clock() if now is None else float(now)
+        allowed = self._held_allowed
+        elapsed = max(0.0, now - self._last_update)
+        pending = []
+        if not self.alert_50_fired:
+            pending.append(0.5 - self.session_dose)
+        if not self.alert_100_fired:
+            pending.append(1.0 - self.session_dose)
+        if not self.daily_warn_fired:
+            pending.append(0.8 - self.daily_dose)
+        if not self.daily_block_fired:
+            pending.append(1.0 - self.daily_dose)
+        pending = [d for d in pending if d > 0.0]
+        until_midnight = self._next_midnight(now) - now
+        if not pending:
+            return until_midnight
+        return max(0.0, min(min(pending) * allowed - elapsed, until_midnight))
+
+    # ---------- Amostra ----------
+    def update(self, vol_percent, paused=False, now=None, level_db=None):
+        """
+        level_db: nível medido no sinal (measurement.LevelMeter); None usa o
+        mapeamento do slider. O cronômetro "neste volume" segue o slider.
+        """
+        now = self.clock() if now is None else float(now)
+        vol_percent = float(vol_percent)
+        last = self._last_update
+        dt = max(0.0, now - last)
+        if self.max_gap_sec is not None and dt > self.max_gap_sec:
+            dt = 0.0
+        self._last_update = now
+        events = []
+        elapsed = dt        # trecho inteiro, mesmo partido na meia-noite (cronômetro "neste volume")
+
+        # Dose diária (base 8h) no nível que vigorou até agora; o trecho
+        # anterior à meia-noite conta para o dia que está terminando
+        if dt > 0.0 and self._day_key_for(now) != self.day_key:
+            pre = max(0.0, min(dt, self._next_midnight(last) - last))
+            self._integrate(pre)
+            dt -= pre
+        self._roll_day_if_needed(now, events)
+        self._integrate(dt)
+
+        # dB corrente (tabelas compiladas; nível medido cai na fórmula)
+        L_vol, allowed_sec, rate, level_zone = self.levels.tables.at_percent(vol_percent)
+        L_eff = L_vol
+        if level_db is not None:
+            L_eff = float(level_db)
+            allowed_sec = allowed_time_seconds_for_level(L_eff, self.cfg)
+            rate = 1.0 / allowed_sec
+            level_zone = risk_zone_from_level(L_eff, self.cfg)
+
+        if paused:
+            self._held_L = None
+            self.standards.hold(None)
+            remaining_sec = (1.0 - self.session_dose) * allowed_sec if self.session_dose < 1.0 else 0.0
+        else:
+            self._held_L = L_eff
+            self._held_allowed = allowed_sec
+            self._held_rate = rate
+            self.standards.hold(L_eff)
+
+            # "tempo neste volume"
+            vol_key = int(round_pct_ui(vol_percent))
+            if self._last_L_for_timer is None:
+                self._last_L_for_timer = L_vol
+                self._last_vol_key = vol_key
+            else:
+                changed_db = abs(L_vol - self._last_L_for_timer) >= self.timer_epsilon_db
+                changed_pct = (self._last_vol_key is None) or (self._last_vol_key != vol_key)
+                if changed_db or changed_pct:
+                    self._last_L_for_timer = L_vol
+                    self._last_vol_key = vol_key
+                    self.time_at_current_level = 0.0
+
+            # Cronômetro do nível atual
+            if self.session_dose < 1.0:
+                self.time_at_current_level += elapsed
+            else:
+                self.time_at_current_level = 0.0
+
+            # EMA para suavizar “tempo restante”
+            remaining_sec = (1.0 - self.session_dose) * allowed_sec if self.session_dose < 1.0 else 0.0
+            if self._ema_remaining_sec is None:
+                self._ema_remaining_sec = remaining_sec
+            else:
+                # alpha ajustado ao dt real (equivale ao passo fixo de 0.2 s)
+                a = 1.0 - (1.0 - self.ema_alpha) ** (dt / self.ema_step_sec)
+                self._ema_remaining_sec = a * remaining_sec + (1 - a) * self._ema_remaining_sec
+
+            self._check_alerts(events)
+
+        ema = self._ema_remaining_sec if self._ema_remaining_sec is not None else remaining_sec
+        state = EngineState(
+            ts=now,
+            t_session=now - self.session_start_ts,
+            day_key=self.day_key,
+            paused=bool(paused),
+            vol_percent=vol_percent,
+            L=L_eff,
+            session_dose=self.session_dose,
+            daily_dose=self.daily_dose,
+            time_at_current_level=self.time_at_current_level,
+            allowed_sec=allowed_sec,
+            remaining_sec=remaining_sec,
+            ema_remaining_sec=ema,
+            zone=risk_zone_from_dose(self.session_dose),
+            level_zone=level_zone,
+            events=tuple(events),
+            standards=self.standards.snapshot(),
+        )
+        self._publish(state)
+        return state
+
+    def _check_alerts(self, events):
+        # ----- Alertas DIÁRIOS -----
+        daily_pct = self.daily_dose * 100.0
+        if daily_pct >= 80.0 and not self.daily_warn_fired and daily_pct < 100.0:
+            self.daily_warn_fired = True
+            events.append(EVENT_DAILY_WARN)
+        if daily_pct >= 100.0 and not self.daily_block_fired:
+            self.daily_block_fired = True
+            events.append(EVENT_DAILY_BLOCK)
+
+        # Alertas de dose (sessão = diária)
+        if not self.alert_50_fired and self.session_dose >= 0.5:
+            self.alert_50_fired = True
+            events.append(EVENT_ALERT_50)
+        if not self.alert_100_fired and self.session_dose >= 1.0:
+            self.alert_100_fired = True
+            events.append(EVENT_ALERT_100)
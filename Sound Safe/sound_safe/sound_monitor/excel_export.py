@@ -0,0 +1,340 @@
+# excel_export.py
+#
+# Exportação do relatório em modo write-only do openpyxl: as linhas saem do
+# HistoryStore direto para o XML, sem manter a planilha inteira em memória.
+# O openpyxl só é importado na primeira exportação (excel_support).
+
+import os
+from datetime import datetime
+
+from . import excel_support
+from .excel_support import load_openpyxl
+from .helpers import ZONES, MODES, round_pct_ui
+from .history import format_ts
+
+REPORT_HEADERS = ["timestamp_iso", "t_sessao_s", "modo", "volume_%", "nivel_dB", "dose_0a1", "zona", "dose_diaria"]
+REPORT_WIDTHS = [20, 14, 12, 12, 12, 12, 16, 16]
+
+DAILY_HEADERS = ["data", "tempo_total", "Leq_dB", "pico_dB", "dose_dia", "t_segura", "t_atencao", "t_perigo", "t_acima_ref"]
+DAILY_WIDTHS = [12, 14, 10, 10, 12, 12, 12, 12, 14]
+
+FORMAT_PERCENT = "0.00%"     # FORMAT_PERCENTAGE_00 do openpyxl
+
+CALIBRATION_HEADERS = ["volume_%", "nivel_dB", "tempo_permitido", "dose_por_hora", "zona_nivel"]
+CALIBRATION_WIDTHS = [12, 12, 16, 14, 14]
+
+CONSOLIDATED_DAY_HEADERS = ["usuario", "data", "arquivos", "sessoes", "tempo_total", "media_dB", "Leq_dB",
+                            "pico_dB", "pico_volume_%", "maior_dose_sessao", "dose_diaria", "t_ate_50", "t_ate_100",
+                            "L10_dB", "L50_dB", "L90_dB"]
+CONSOLIDATED_DAY_WIDTHS = [18, 12, 10, 10, 14, 10, 10, 10, 14, 18, 12, 12, 12, 10, 10, 10]
+CONSOLIDATED_USER_HEADERS = ["usuario", "dias", "sessoes", "tempo_total", "media_dB", "Leq_dB", "pico_dB",
+                             "maior_dose_diaria", "dias_acima_100%", "L10_dB", "L50_dB", "L90_dB"]
+CONSOLIDATED_USER_WIDTHS = [18, 8, 10, 14, 10, 10, 10, 18, 16, 10, 10, 10]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _styled_cell(ws, number_format=None, bold=False, center=False):
+    xl = load_openpyxl()
+    cell = xl.WriteOnlyCell(ws)
+    if number_format is not None:
+        cell.number_format = number_format
+    if bold:
+        cell.font = xl.Font(bold=True)
+    if center:
+        cell.alignment = xl.Alignment(horizontal="center")
+    return cell
+
+
+def _summary_rows(summary):
+    return [
+        ("Tempo total",          summary["total_time_days"], "[h]:mm:ss"),
+        ("Média de dB",          summary["avg_db"],          "0.00"),
+        ("Leq (energia) dB",     summary["leq_db"],          "0.00"),
+        ("Pico de dB",           summary["peak_db"],         "0.00"),
+        ("L10 dB (10% do tempo)", summary["l10_db"],         "0.00"),
+        ("L50 dB (mediana)",     summary["l50_db"],          "0.00"),
+        ("L90 dB (90% do tempo)", summary["l90_db"],         "0.00"),
+        ("Pico de volume (%)",   summary["peak_vol"],        "0"),
+        ("Maior dose (sessão)",  summary["max_dose"],        FORMAT_PERCENT),
+        ("Tempo até 50% dose",   summary["t_to_50_days"],    "[h]:mm:ss"),
+        ("Tempo até 100% dose",  summary["t_to_100_days"],   "[h]:mm:ss"),
+    ]
+
+
+def _write_bands(ws, summary):
+    """Seção "Tempo por faixa" (histograma de níveis) abaixo das métricas."""
+    total = summary["total_time_s"]
+    if not summary.get("bands") or total <= 0:
+        return
+    ws.append([])
+    c = _styled_cell(ws, bold=True); c.value = "Tempo por faixa"
+    ws.append([c])
+    for label, secs in summary["bands"]:
+        c_t = _styled_cell(ws, "[h]:mm:ss"); c_t.value = secs / 86400.0
+        c_p = _styled_cell(ws, FORMAT_PERCENT); c_p.value = secs / total
+        ws.append([label, c_t, c_p])
+
+
+def _write_standards(ws, standards):
+    """Seção "Dose por norma": a mesma exposição avaliada em cada norma (standards.py)."""
+    ws.append([])
+    c = _styled_cell(ws, bold=True); c.value = "Dose por norma"
+    ws.append([c])
+    header = []
+    for h in ("Norma", "Sessão", "Dia"):
+        c = _styled_cell(ws, bold=True); c.value = h
+        header.append(c)
+    ws.append(header)
+    for _key, name, session, daily in standards:
+        c_s = _styled_cell(ws, FORMAT_PERCENT); c_s.value = session
+        c_d = _styled_cell(ws, FORMAT_PERCENT); c_d.value = daily
+        ws.append([name, c_s, c_d])
+
+
+def _write_daily_sheet(wb, days):
+    ws = wb.create_sheet(title="Histórico diário")
+    for idx, w in enumerate(DAILY_WIDTHS, start=1):
+        ws.column_dimensions[load_openpyxl().get_column_letter(idx)].width = w
+    header = []
+    for h in DAILY_HEADERS:
+        c = _styled_cell(ws, bold=True, center=True); c.value = h
+        header.append(c)
+    ws.append(header)
+    c_date = _styled_cell(ws)
+    c_secs = _styled_cell(ws, "[h]:mm:ss")
+    c_leq = _styled_cell(ws, "0.00")
+    c_peak = _styled_cell(ws, "0.00")
+    c_dose = _styled_cell(ws, FORMAT_PERCENT)
+    c_safe = _styled_cell(ws, "[h]:mm:ss")
+    c_warn = _styled_cell(ws, "[h]:mm:ss")
+    c_danger = _styled_cell(ws, "[h]:mm:ss")
+    c_over = _styled_cell(ws, "[h]:mm:ss")
+    for d in days:
+        c_date.value = d["date"]
+        c_secs.value = d["seconds"] / 86400.0
+        c_leq.value = d["leq_db"]
+        c_peak.value = d["max_L"]
+        c_dose.value = d["dose"]
+        c_safe.value = d["t_safe"] / 86400.0
+        c_warn.value = d["t_warn"] / 86400.0
+        c_danger.value = d["t_danger"] / 86400.0
+        c_over.value = d["t_over_ref"] / 86400.0
+        ws.append([c_date, c_secs, c_leq, c_peak, c_dose, c_safe, c_warn, c_danger, c_over])
+
+
+def _write_calibration_sheet(wb, tables, step_pct=5.0):
+    ws = wb.create_sheet(title="Curva de volume")
+    for idx, w in enumerate(CALIBRATION_WIDTHS, start=1):
+        ws.column_dimensions[load_openpyxl().get_column_letter(idx)].width = w
+    name = tables.profile_name or "reta min/max dB"
+    c = _styled_cell(ws, bold=True); c.value = f"Curva: {name}"
+    ws.append([c])
+    header = []
+    for h in CALIBRATION_HEADERS:
+        c = _styled_cell(ws, bold=True, center=True); c.value = h
+        header.append(c)
+    ws.append(header)
+    c_vol = _styled_cell(ws, "0")
+    c_db = _styled_cell(ws, "0.0")
+    c_allowed = _styled_cell(ws, "[h]:mm:ss")
+    c_rate = _styled_cell(ws, FORMAT_PERCENT)
+    c_zone = _styled_cell(ws)
+    for vol, L, allowed, dose_per_hour, zone in tables.rows(step_pct):
+        c_vol.value = vol
+        c_db.value = L
+        c_allowed.value = allowed / 86400.0
+        c_rate.value = dose_per_hour
+        c_zone.value = zone
+        ws.append([c_vol, c_db, c_allowed, c_rate, c_zone])
+
+
+def write_session_report(filename, history, summary_fn, cfg, progress=None, cancel_event=None,
+                         chunk_rows=2000, daily_fn=None, levels=None, standards=None):
+    """
+    Grava o relatório (abas "Relatório" e "Resumo") em `filename`.
+    - summary_fn(): resumo (ExposureStats.snapshot) – chamado na thread de exportação;
+    - daily_fn(): opcional, linhas por dia (TimeSeriesStore.daily_rows) -> aba "Histórico diário";
+    - levels: opcional, calibration.LevelTables usadas na sessão -> aba "Curva de volume";
+    - standards: opcional, EngineState.standards -> seção "Dose por norma" no "Resumo";
+    - progress(done, total): chamado a cada bloco de linhas;
+    - cancel_event: threading.Event; se setado, aborta com ExportCancelled.
+    Escreve num arquivo temporário e só renomeia no fim (nada parcial fica para trás).
+    """
+    if not excel_support._OPENPYXL_AVAILABLE:
+        raise RuntimeError("Para exportar Excel (.xlsx): pip install openpyxl")
+    xl = load_openpyxl()
+
+    total = len(history)
+    tmp_name = f"{filename}.part"
+    wb = xl.Workbook(write_only=True)
+    try:
+        ws = wb.create_sheet(title="Relatório")
+        for idx, w in enumerate(REPORT_WIDTHS, start=1):
+            ws.column_dimensions[xl.get_column_letter(idx)].width = w
+        ws.freeze_panes = "A2"
+
+        header = []
+        for h in REPORT_HEADERS:
+            c = _styled_cell(ws, bold=True, center=True); c.value = h
+            header.append(c)
+        ws.append(header)
+
+        # Estilo por coluna definido uma vez; as células são reaproveitadas a cada linha
+        c_ts = _styled_cell(ws)
+        c_t = _styled_cell(ws, "0.0")
+        c_mode = _styled_cell(ws)
+        c_vol = _styled_cell(ws)
+        c_L = _styled_cell(ws, "0.00")
+        c_dose = _styled_cell(ws, FORMAT_PERCENT)
+        c_zone = _styled_cell(ws)
+        c_daily = _styled_cell(ws, FORMAT_PERCENT)
+        row_cells = [c_ts, c_t, c_mode, c_vol, c_L, c_dose, c_zone, c_daily]
+
+        done = 0
+        for cols in history.iter_chunks(chunk_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            for ts, t_session, mode, vol, L, dose, zone, daily in zip(*cols):
+                c_ts.value = format_ts(ts)
+                c_t.value = t_session
+                c_mode.value = MODES[mode]
+                c_vol.value = int(round_pct_ui(vol))
+                c_L.value = L
+                c_dose.value = dose
+                c_zone.value = ZONES[zone]
+                c_daily.value = daily
+                ws.append(row_cells)
+            done += len(cols[0])
+            if progress is not None:
+                progress(done, total)
+        ws.auto_filter.ref = f"A1:H{done + 1}"
+
+        ws2 = wb.create_sheet(title="Resumo")
+        ws2.column_dimensions["A"].width = 26
+        ws2.column_dimensions["B"].width = 18
+        ws2.column_dimensions["C"].width = 12
+        if not done:
+            c = _styled_cell(ws2, bold=True); c.value = "Sem dados na sessão."
+            ws2.append([c])
+        else:
+            summary = summary_fn()
+            c = _styled_cell(ws2, bold=True); c.value = "Resumo da Sessão"
+            ws2.append([c])
+            ws2.append([f"Gerado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+            ws2.append([f"Perfil diário: {cfg['ref_db']:.0f} dB / 8h ({cfg.get('exchange_rate_db', 3.0):g} dB)"])
+            ws2.append([])
+            c = _styled_cell(ws2, bold=True); c.value = "Métricas gerais"
+            ws2.append([c])
+            for label, value, fmt in _summary_rows(summary):
+                cval = _styled_cell(ws2, fmt); cval.value = value
+                ws2.append([label, cval])
+            _write_bands(ws2, summary)
+            if standards:
+                _write_standards(ws2, standards)
+
+        if daily_fn is not None:
+            days = daily_fn()
+            if days:
+                _write_daily_sheet(wb, days)
+        if levels is not None:
+            _write_calibration_sheet(wb, levels)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExportCancelled()
+        wb.save(tmp_name)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        # fecha as abas abertas (o openpyxl apaga seus temporários na saída)
+        for sheet in wb.worksheets:
+            try:
+                sheet.close()
+            except Exception:
+                pass
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+        raise
+    return done
+
+
+def _header_row(ws, headers, widths):
+    xl = load_openpyxl()
+    for idx, w in enumerate(widths, start=1):
+        ws.column_dimensions[xl.get_column_letter(idx)].width = w
+    ws.freeze_panes = "A2"
+    header = []
+    for h in headers:
+        c = _styled_cell(ws, bold=True, center=True); c.value = h
+        header.append(c)
+    ws.append(header)
+
+
+def write_consolidated_report(filename, day_rows, user_rows, errors=()):
+    """
+    Relatório em lote (report.py): abas "Por usuário e dia", "Por usuário" e,
+    se houver, "Arquivos com erro". day_rows/user_rows vêm de report.consolidate.
+    """
+    if not excel_support._OPENPYXL_AVAILABLE:
+        raise RuntimeError("Para exportar Excel (.xlsx): pip install openpyxl")
+    xl = load_openpyxl()
+    tmp_name = f"{filename}.part"
+    wb = xl.Workbook(write_only=True)
+    try:
+        ws = wb.create_sheet(title="Por usuário e dia")
+        _header_row(ws, CONSOLIDATED_DAY_HEADERS, CONSOLIDATED_DAY_WIDTHS)
+        cells = [_styled_cell(ws), _styled_cell(ws), _styled_cell(ws), _styled_cell(ws),
+                 _styled_cell(ws, "[h]:mm:ss"), _styled_cell(ws, "0.00"), _styled_cell(ws, "0.00"),
+                 _styled_cell(ws, "0.00"), _styled_cell(ws, "0"), _styled_cell(ws, FORMAT_PERCENT),
+                 _styled_cell(ws, FORMAT_PERCENT), _styled_cell(ws, "[h]:mm:ss"), _styled_cell(ws, "[h]:mm:ss"),
+                 _styled_cell(ws, "0.0"), _styled_cell(ws, "0.0"), _styled_cell(ws, "0.0")]
+        for r in day_rows:
+            s = r["stats"].snapshot()
+            values = (r["user"], r["day"], r["files"], r["sessions"], s["total_time_days"], s["avg_db"],
+                      s["leq_db"], s["peak_db"], s["peak_vol"], s["max_dose"], r["daily_dose"],
+                      s["t_to_50_days"] if s["t_to_50_s"] is not None else None,
+                      s["t_to_100_days"] if s["t_to_100_s"] is not None else None,
+                      s["l10_db"], s["l50_db"], s["l90_db"])
+            for c, v in zip(cells, values):
+                c.value = v
+            ws.append(cells)
+        ws.auto_filter.ref = f"A1:P{len(day_rows) + 1}"
+
+        ws2 = wb.create_sheet(title="Por usuário")
+        _header_row(ws2, CONSOLIDATED_USER_HEADERS, CONSOLIDATED_USER_WIDTHS)
+        cells = [_styled_cell(ws2), _styled_cell(ws2), _styled_cell(ws2), _styled_cell(ws2, "[h]:mm:ss"),
+                 _styled_cell(ws2, "0.00"), _styled_cell(ws2, "0.00"), _styled_cell(ws2, "0.00"),
+                 _styled_cell(ws2, FORMAT_PERCENT), _styled_cell(ws2),
+                 _styled_cell(ws2, "0.0"), _styled_cell(ws2, "0.0"), _styled_cell(ws2, "0.0")]
+        for r in user_rows:
+            s = r["stats"].snapshot()
+            values = (r["user"], r["days"], r["sessions"], s["total_time_days"], s["avg_db"], s["leq_db"],
+                      s["peak_db"], r["max_daily_dose"], r["days_over_100"],
+                      s["l10_db"], s["l50_db"], s["l90_db"])
+            for c, v in zip(cells, values):
+                c.value = v
+            ws2.append(cells)
+
+        if errors:
+            ws3 = wb.create_sheet(title="Arquivos com erro")
+            _header_row(ws3, ["arquivo", "erro"], [80, 60])
+            for path, err in errors:
+                ws3.append([path, err])
+
+        wb.save(tmp_name)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        for sheet in wb.worksheets:
+            try:
+                sheet.close()
+            except Exception:
+                pass
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+        raise
+    return len(day_rows)
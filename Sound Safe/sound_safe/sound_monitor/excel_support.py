@@ -1,15 +1,35 @@
 # excel_support.py
+#
+# openpyxl (e o numpy que ele puxa) custa ~250 ms de import: aqui só se
+# verifica se o pacote existe; o import de verdade fica para a primeira
+# exportação (load_openpyxl()).
 
-_OPENPYXL_AVAILABLE = False
-try:
-    from openpyxl import Workbook
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Font, Alignment, numbers
-    _OPENPYXL_AVAILABLE = True
-except Exception:
-    _OPENPYXL_AVAILABLE = False
-    Workbook = None
-    get_column_letter = None
-    Font = None
-    Alignment = None
-    numbers = None
+import importlib.util
+from types import SimpleNamespace
+
+_OPENPYXL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+_api = None
+
+
+def load_openpyxl():
+    """Importa openpyxl na primeira chamada; devolve os nomes usados na exportação."""
+    global _api, _OPENPYXL_AVAILABLE
+    if _api is None:
+        try:
+            from openpyxl import Workbook, load_workbook
+            from openpyxl.utils import get_column_letter
+            from openpyxl.styles import Font, Alignment, numbers
+            from openpyxl.cell import WriteOnlyCell
+        except Exception:
+            _OPENPYXL_AVAILABLE = False
+            raise
+        _api = SimpleNamespace(
+            Workbook=Workbook,
+            load_workbook=load_workbook,
+            get_column_letter=get_column_letter,
+            Font=Font,
+            Alignment=Alignment,
+            numbers=numbers,
+            WriteOnlyCell=WriteOnlyCell,
+        )
+    return _api
@@ -0,0 +1,60 @@
+# fleet_protocol.py
+#
+# Protocolo monitor <-> coletor: quadros [tamanho u32 big-endian][JSON UTF-8].
+# Mensagens (campo "type"):
+#   hello   {"user", "host", "version"}
+#   samples {"rows": [[ts, L, vol, session_dose, daily_dose, day_key], ...]}
+#   query   {"q": "over" | "user" | "summary", ...}  -> result {"ok", "data"}
+
+import json
+import struct
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 8765
+MAX_FRAME = 1 << 20          # 1 MiB por quadro
+_HEADER = struct.Struct(">I")
+HEADER_SIZE = _HEADER.size
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(msg):
+    body = json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(body) > MAX_FRAME:
+        raise ProtocolError(f"quadro grande demais ({len(body)} bytes)")
+    return _HEADER.pack(len(body)) + body
+
+
+def decode_length(header):
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f"quadro grande demais ({size} bytes)")
+    return size
+
+
+def decode_body(body):
+    try:
+        msg = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"JSON inválido: {e}")
+    if not isinstance(msg, dict) or "type" not in msg:
+        raise ProtocolError("mensagem sem 'type'")
+    return msg
+
+
+def read_frame_blocking(sock):
+    """Lê um quadro de um socket bloqueante (cliente de consulta)."""
+    header = _recv_exact(sock, HEADER_SIZE)
+    return decode_body(_recv_exact(sock, decode_length(header)))
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("conexão fechada")
+        buf += chunk
+    return bytes(buf)
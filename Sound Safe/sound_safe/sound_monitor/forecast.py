@@ -0,0 +1,170 @@
+# forecast.py
+#
+# Previsão de dose para uma agenda planejada ("2h a 60%, depois 30min a
+# 80%"), sem simular tick a tick: com o volume constante em cada trecho a
+# dose cresce em linha reta (dose/s da tabela), então a trajetória são os
+# pontos de quebra, cada cruzamento de limiar é uma divisão e o volume
+# máximo sustentável sai da inversa da fórmula de tempo permitido:
+#   T_perm(L) = base · 2^(-(L - ref)/er)  e  dose_restante = T / T_perm(L)
+#   =>  L_max = ref + er · log2(dose_restante · base / T)
+# Tudo é O(trechos) + uma busca binária na tabela – dá para recalcular a
+# cada movimento de slider. Mesmas tabelas, tetos e virada de dia do
+# DoseEngine: se a agenda passa da meia-noite, a dose volta a zero ali.
+
+import math
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+DEFAULT_THRESHOLDS = (0.5, 0.8, 1.0)
+SESSION_CAP = 1.0
+DAILY_CAP = 10.0
+
+# Trecho da agenda: duração (s) e volume (%); level_db (opcional) no lugar do volume
+Segment = namedtuple("Segment", ["duration_sec", "vol_percent", "level_db"], defaults=(None,))
+
+Forecast = namedtuple("Forecast", [
+    "points",           # ((t s, dose diária, dose sessão), ...) nos limites dos trechos
+    "crossings",        # {limiar: t s em que a dose diária o atinge ou None}
+    "daily_end",
+    "session_end",
+    "max_level_db",     # maior nível sustentável no resto do dia (None = dose já esgotada)
+    "max_vol_percent",  # idem em volume (tabela do dispositivo; 0 se nem o mínimo cabe)
+    "rest_sec",         # tempo que sobra do dia depois da agenda (None = sem meia-noite dada)
+])
+
+
+def seconds_until_midnight(ts):
+    d = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(0.0, (d + timedelta(days=1)).timestamp() - ts)
+
+
+def _rate(tables, seg):
+    if seg.level_db is not None:
+        return 1.0 / tables.allowed_for_level(seg.level_db)
+    return tables.dose_rate_for_percent(seg.vol_percent)
+
+
+def max_sustainable_level(cfg, dose, duration_sec, target=1.0):
+    """Maior nível (dB) que leva a dose de `dose` a `target` em exatamente duration_sec; None se não sobra dose."""
+    left = target - dose
+    if left <= 0.0:
+        return None
+    if duration_sec <= 0.0:
+        return math.inf
+    er = max(0.1, float(cfg.get("exchange_rate_db", 3.0)))
+    return float(cfg["ref_db"]) + er * math.log2(left * float(cfg["base_time_sec"]) / duration_sec)
+
+
+def max_sustainable(tables, dose, duration_sec, target=1.0):
+    """(dB, volume %) máximos sustentáveis por duration_sec (volume pela tabela do dispositivo)."""
+    L = max_sustainable_level(tables.cfg, dose, duration_sec, target)
+    if L is None:
+        return None, 0.0
+    if math.isinf(L):
+        return L, 100.0
+    return L, tables.percent_for_db(L)
+
+
+def forecast(tables, schedule, daily_dose=0.0, session_dose=0.0, rest_of_day_sec=None,
+             thresholds=DEFAULT_THRESHOLDS, target=1.0):
+    """
+    schedule: Segments em sequência a partir de agora. rest_of_day_sec: tempo
+    até a meia-noite. Se a agenda passa dela, sessão e dia voltam a zero
+    naquele instante (dois pontos com o mesmo t), os cruzamentos só contam
+    até lá e o volume máximo sustentável fica None (rest_sec <= 0: sem tempo
+    restante hoje); senão ele vale para o resto do dia depois da agenda.
+    Sem rest_of_day_sec, a agenda fica toda no mesmo dia e o volume máximo
+    vale para um trecho do mesmo tamanho da agenda.
+    """
+    midnight = math.inf if rest_of_day_sec is None else max(0.0, float(rest_of_day_sec))
+    t = 0.0
+    daily = float(daily_dose)
+    session = float(session_dose)
+    points = [(0.0, daily, session)]
+    crossings = {thr: (0.0 if daily >= thr else None) for thr in thresholds}
+
+    def _cross(t0, d0, r, dur):
+        for thr in thresholds:
+            if crossings[thr] is None and d0 + r * dur >= thr:
+                crossings[thr] = t0 + (thr - d0) / r
+
+    for seg in schedule:
+        dur = max(0.0, float(seg.duration_sec))
+        if dur <= 0.0:
+            continue
+        r = _rate(tables, seg)
+        end = t + dur
+        if t <= midnight < end:
+            # virada do dia no meio (ou no começo) do trecho
+            pre = midnight - t
+            _cross(t, daily, r, pre)
+            daily = min(DAILY_CAP, daily + r * pre)
+            session = min(SESSION_CAP, session + r * pre)
+            points.append((midnight, daily, session))
+            daily = session = 0.0
+            points.append((midnight, daily, session))
+            t, dur = midnight, end - midnight
+        elif t < midnight:
+            _cross(t, daily, r, dur)
+        daily = min(DAILY_CAP, daily + r * dur)
+        session = min(SESSION_CAP, session + r * dur)
+        t = end
+        points.append((t, daily, session))
+
+    if rest_of_day_sec is None:
+        rest_sec = None
+        L_max, vol_max = max_sustainable(tables, daily, t, target)
+    else:
+        rest_sec = midnight - t
+        if rest_sec > 0.0:
+            L_max, vol_max = max_sustainable(tables, daily, rest_sec, target)
+        else:
+            L_max = vol_max = None
+    return Forecast(tuple(points), crossings, daily, session, L_max, vol_max, rest_sec)
+
+
+def dose_at(points, t):
+    """Dose diária prevista no instante t (interpolação linear entre os pontos de forecast)."""
+    if t <= points[0][0]:
+        return points[0][1]
+    for (t0, d0, _s0), (t1, d1, _s1) in zip(points, points[1:]):
+        if t <= t1:
+            return d0 + (d1 - d0) * (t - t0) / (t1 - t0)
+    return points[-1][1]
+
+
+_SEG_RE = re.compile(
+    r"^\s*(?:(\d+(?:[.,]\d+)?)\s*h)?\s*(?:(\d+(?:[.,]\d+)?)\s*min)?\s*@\s*(\d+(?:[.,]\d+)?)\s*(%|db)?\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_schedule(text):
+    """
+    "2h@60%, 30min@80%" -> [Segment]. Volume em % (padrão) ou nível com
+    sufixo dB ("1h@85dB"). ValueError em trecho inválido.
+    """
+    out = []
+    # vírgula entre dígitos é decimal ("1,5h"); fora disso separa trechos
+    for part in re.split(r"[;\n]|,(?!\d)|(?<!\d),", text or ""):
+        if not part.strip():
+            continue
+        m = _SEG_RE.match(part)
+        if m is None or (m.group(1) is None and m.group(2) is None):
+            raise ValueError(f"trecho inválido: {part.strip()!r} (ex.: 2h@60%, 30min@80%)")
+        h = float((m.group(1) or "0").replace(",", "."))
+        mins = float((m.group(2) or "0").replace(",", "."))
+        value = float(m.group(3).replace(",", "."))
+        dur = h * 3600.0 + mins * 60.0
+        if (m.group(4) or "%").lower() == "db":
+            out.append(Segment(dur, None, value))
+        else:
+            out.append(Segment(dur, max(0.0, min(100.0, value))))
+    return out
+
+
+def forecast_from_state(tables, state, schedule, thresholds=DEFAULT_THRESHOLDS):
+    """Atalho a partir de um EngineState: dose atual e tempo até a meia-noite do relógio do motor."""
+    return forecast(tables, schedule, state.daily_dose, state.session_dose,
+                    rest_of_day_sec=seconds_until_midnight(state.ts), thresholds=thresholds)
@@ -1,10 +1,14 @@
 # gauge.py
 
+import time
 import tkinter as tk
 from .colors import DISCORD_SURFACE, DISCORD_SUCCESS, DISCORD_WARN, DISCORD_ERROR
 
 class Gauge(tk.Canvas):
-    def __init__(self, master, size=250, min_db=40, max_db=95, **kwargs):
+    _START = -210
+    _EXTENT = 240
+
+    def __init__(self, master, size=250, min_db=40, max_db=95, animate=False, **kwargs):
         super().__init__(master, width=size, height=size, bg=DISCORD_SURFACE, highlightthickness=0, **kwargs)
         self.size = size
         self.center = size // 2
@@ -13,33 +17,93 @@ class Gauge(tk.Canvas):
         self.dose = 0.0
         self.min_db = float(min_db)
         self.max_db = float(max_db)
+        # Rampa opcional do arco (um único timer `after`)
+        self.animate = bool(animate)
         self._ramp_target_pct = None
-        self._ramp_rate_per_sec = 1.0  # máx 1% por segundo (ajuste a gosto)
+        self._ramp_rate_per_sec = 50.0  # máx % da escala por segundo (ajuste a gosto)
+        self._ramp_after_id = None
+        self._ramp_last_t = None
+        self._shown_pct = 0.0
         self.ref_db = 85.0
 
+        # Itens criados uma única vez; depois só itemconfigure
+        box = (self.center - self.radius, self.center - self.radius,
+               self.center + self.radius, self.center + self.radius)
+        self.create_arc(*box, start=self._START, extent=self._EXTENT, style="arc", width=20, outline="#444")
+        self._fill_arc = self.create_arc(*box, start=self._START, extent=0, style="arc", width=20,
+                                         outline=DISCORD_SUCCESS)
+        self._value_text = self.create_text(self.center, self.center - 15, text="",
+                                            fill="white", font=("Segoe UI", 24, "bold"))
+        self._dose_text = self.create_text(self.center, self.center + 20, text="",
+                                           fill="white", font=("Segoe UI", 14, "bold"))
+        self._item_state = {}
+
     def set_value(self, value, dose):
         self.value = float(value)
         self.dose = max(0.0, min(1.0, float(dose)))
+        if self.animate:
+            self._ramp_target_pct = self._value_ratio() * 100.0
+            self._start_ramp()
+        else:
+            self._shown_pct = self._value_ratio() * 100.0
         self._draw()
 
     def set_bounds(self, min_db, max_db):
         self.min_db = float(min_db)
         self.max_db = float(max_db)
+        if not self.animate:
+            self._shown_pct = self._value_ratio() * 100.0
         self._draw()
 
     def set_profile_ref(self, ref_db):
         self.ref_db = float(ref_db)
 
+    def _value_ratio(self):
+        ratio = (self.value - self.min_db) / max(1e-9, (self.max_db - self.min_db))
+        return max(0.0, min(1.0, ratio))
+
+    # ---------- Rampa ----------
+    def _start_ramp(self):
+        if self._ramp_after_id is None:
+            self._ramp_last_t = time.monotonic()
+            self._ramp_after_id = self.after(16, self._ramp_step)
+
+    def _ramp_step(self):
+        self._ramp_after_id = None
+        target = self._ramp_target_pct
+        if target is None:
+            return
+        now = time.monotonic()
+        max_step = self._ramp_rate_per_sec * (now - self._ramp_last_t)
+        self._ramp_last_t = now
+        delta = target - self._shown_pct
+        if abs(delta) <= max_step:
+            self._shown_pct = target
+            self._ramp_target_pct = None
+        else:
+            self._shown_pct += max_step if delta > 0 else -max_step
+        self._draw()
+        if self._ramp_target_pct is not None:
+            self._ramp_after_id = self.after(16, self._ramp_step)
+
+    def destroy(self):
+        if self._ramp_after_id is not None:
+            try:
+                self.after_cancel(self._ramp_after_id)
+            except Exception:
+                pass
+            self._ramp_after_id = None
+        super().destroy()
+
+    # ---------- Desenho ----------
+    def _itemconfigure_if_changed(self, item, **options):
+        last = self._item_state.setdefault(item, {})
+        changed = {k: v for k, v in options.items() if last.get(k) != v}
+        if changed:
+            self.itemconfigure(item, **changed)
+            last.update(changed)
+
     def _draw(self):
-        self.delete("all")
-        start = -210
-        extent = 240
-
-        # fundo
-        self.create_arc(self.center - self.radius, self.center - self.radius,
-                        self.center + self.radius, self.center + self.radius,
-                        start=start, extent=extent, style="arc", width=20, outline="#444")
-        
         safe_cut = self.ref_db - 15.0
         warn_cut = self.ref_db
         if self.value < safe_cut:
@@ -49,15 +113,8 @@ class Gauge(tk.Canvas):
         else:
             color = DISCORD_ERROR
 
-        ratio = (self.value - self.min_db) / max(1e-9, (self.max_db - self.min_db))
-        ratio = max(0.0, min(1.0, ratio))
-        fill_extent = extent * ratio
-
-        self.create_arc(self.center - self.radius, self.center - self.radius,
-                        self.center + self.radius, self.center + self.radius,
-                        start=start, extent=fill_extent, style="arc", width=20, outline=color)
-
-        self.create_text(self.center, self.center - 15, text=f"{self.value:.1f} dB",
-                         fill="white", font=("Segoe UI", 24, "bold"))
-        self.create_text(self.center, self.center + 20, text=f"Dose: {self.dose*100:.0f}%",
-                         fill="white", font=("Segoe UI", 14, "bold"))
+        # extent arredondado a 0.1° (abaixo disso não muda nenhum pixel)
+        fill_extent = round(self._EXTENT * self._shown_pct / 100.0, 1)
+        self._itemconfigure_if_changed(self._fill_arc, extent=fill_extent, outline=color)
+        self._itemconfigure_if_changed(self._value_text, text=f"{self.value:.1f} dB")
+        self._itemconfigure_if_changed(self._dose_text, text=f"Dose: {self.dose*100:.0f}%")
@@ -2,6 +2,14 @@
 
 import math
 
+# Zonas de risco (o índice é o código compacto usado em histórico/lotes)
+ZONES = ("SEGURA", "ATENÇÃO", "PERIGO")
+ZONE_CODES = {name: i for i, name in enumerate(ZONES)}
+
+# Modos de operação (idem: índice = código compacto)
+MODES = ("prefixado", "dinamico")
+MODE_CODES = {name: i for i, name in enumerate(MODES)}
+
 def map_percent_to_db(vol_percent, cfg):
     min_db = cfg["min_db"]; max_db = cfg["max_db"]
     v = max(0, min(100, float(vol_percent)))
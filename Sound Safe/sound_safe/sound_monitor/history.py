@@ -0,0 +1,156 @@
+# history.py
+
+import time
+import array
+import bisect
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+from .helpers import ZONE_CODES, MODE_CODES
+
+# Ordem das colunas em cada linha devolvida por iter_rows()
+COLUMNS = ("ts", "t_session", "mode", "vol_percent", "L", "dose", "zone", "daily")
+COL_TS, COL_T_SESSION, COL_MODE, COL_VOL, COL_L, COL_DOSE, COL_ZONE, COL_DAILY = range(len(COLUMNS))
+
+# ts/t_session/L/dose/daily em float64, volume em float32, modo/zona em int8
+_TYPECODES = ("d", "d", "b", "f", "d", "d", "b", "d")
+_RECORD = struct.Struct("<ddbfddbd")
+
+
+def empty_columns():
+    """Colunas vazias, na ordem de COLUMNS (blocos de iter_chunks / extend)."""
+    return tuple(array.array(tc) for tc in _TYPECODES)
+
+
+def format_ts(ts):
+    """Formata o epoch só quando necessário (exportação / UI)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+class HistoryStore:
+    """
+    Histórico da sessão em colunas tipadas (array.array), sem um dict por linha.
+    Mantém até `capacity` linhas em memória; ao encher, a metade mais antiga
+    vai para um arquivo temporário (spill) e a leitura continua transparente.
+    """
+
+    def __init__(self, capacity=3600, spill_dir=None):
+        self.capacity = max(2, int(capacity))
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._spill = None
+        self._spilled = 0
+        self._cols = empty_columns()
+
+    def __len__(self):
+        return self._spilled + len(self._cols[0])
+
+    # ---------- Escrita ----------
+    def append(self, ts, t_session, mode, vol_percent, L, dose, zone, daily):
+        if isinstance(mode, str):
+            mode = MODE_CODES.get(mode, 0)
+        if isinstance(zone, str):
+            zone = ZONE_CODES.get(zone, 0)
+        row = (ts, t_session, mode, vol_percent, L, dose, zone, daily)
+        with self._lock:
+            for col, v in zip(self._cols, row):
+                col.append(v)
+            if len(self._cols[0]) >= self.capacity:
+                self._spill_oldest(self.capacity // 2)
+
+    def extend(self, cols):
+        """Acrescenta um bloco de colunas (mesmo formato de iter_chunks; modo/zona já em código)."""
+        with self._lock:
+            for col, src in zip(self._cols, cols):
+                col.extend(src)
+            while len(self._cols[0]) >= self.capacity:
+                self._spill_oldest(self.capacity // 2)
+
+    def _spill_oldest(self, n):
+        if self._spill is None:
+            if self.spill_dir is not None:
+                Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            self._spill = tempfile.TemporaryFile(prefix="hist_", suffix=".bin", dir=self.spill_dir)
+        buf = bytearray(_RECORD.size * n)
+        pack_into = _RECORD.pack_into
+        for i, row in enumerate(zip(*(col[:n] for col in self._cols))):
+            pack_into(buf, i * _RECORD.size, *row)
+        self._spill.seek(0, 2)
+        self._spill.write(buf)
+        for col in self._cols:
+            del col[:n]
+        self._spilled += n
+
+    def clear(self):
+        with self._lock:
+            if self._spill is not None:
+                try:
+                    self._spill.close()
+                except Exception:
+                    pass
+            self._spill = None
+            self._spilled = 0
+            self._cols = empty_columns()
+
+    close = clear
+
+    # ---------- Leitura ----------
+    def iter_chunks(self, chunk_rows=4096):
+        """
+        Gera blocos de colunas (tupla de array.array, na ordem de COLUMNS),
+        primeiro do spill e depois da memória – sem montar linhas/dicts.
+        """
+        with self._lock:
+            spilled = self._spilled
+            mem = tuple(col[:] for col in self._cols)
+        pos = 0
+        while pos < spilled:
+            n = min(chunk_rows, spilled - pos)
+            with self._lock:
+                if self._spill is None:   # clear() durante a leitura
+                    return
+                self._spill.seek(pos * _RECORD.size)
+                data = self._spill.read(n * _RECORD.size)
+            cols = empty_columns()
+            for row in _RECORD.iter_unpack(data):
+                for col, v in zip(cols, row):
+                    col.append(v)
+            yield cols
+            pos += n
+        if len(mem[0]):
+            yield mem
+
+    def iter_rows(self, chunk_rows=4096):
+        """Linhas como tuplas (ordem de COLUMNS); modo/zona são códigos."""
+        for cols in self.iter_chunks(chunk_rows):
+            yield from zip(*cols)
+
+    def covers(self, t_session_min):
+        """True se as linhas com t_session >= t_session_min estão todas em memória."""
+        with self._lock:
+            t_col = self._cols[COL_T_SESSION]
+            return not self._spilled or (len(t_col) and t_col[0] <= t_session_min)
+
+    def iter_since(self, t_session_min):
+        """Linhas com t_session >= t_session_min (busca binária na parte em memória)."""
+        with self._lock:
+            t_col = self._cols[COL_T_SESSION]
+            in_memory = not self._spilled or (len(t_col) and t_col[0] <= t_session_min)
+            if in_memory:
+                start = bisect.bisect_left(t_col, t_session_min)
+                tail = tuple(col[start:] for col in self._cols)
+        if in_memory:
+            yield from zip(*tail)
+            return
+        # janela anterior à memória: varre tudo (raro – janelas longas)
+        for row in self.iter_rows():
+            if row[COL_T_SESSION] >= t_session_min:
+                yield row
+
+    def last(self):
+        with self._lock:
+            if not len(self._cols[0]):
+                return None
+            return tuple(col[-1] for col in self._cols)
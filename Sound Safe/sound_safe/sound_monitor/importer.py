@@ -0,0 +1,198 @@
+# importer.py
+#
+# Leitura dos relatórios já exportados (relatorio_som_*.xlsx, layout de
+# write_session_report) de volta para o formato em colunas do HistoryStore.
+# A aba "Relatório" é lida em modo read_only/values_only, em blocos de
+# `chunk_rows` linhas: a memória depende do bloco (e da capacidade do
+# HistoryStore, que faz spill para disco), não do tamanho do arquivo.
+#   python -m sound_monitor.importer a.xlsx [b.xlsx ...] [-o juntos.xlsx]
+
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+
+from .helpers import MODE_CODES, ZONE_CODES
+from .history import HistoryStore, empty_columns
+from .stats import ExposureStats
+
+REPORT_SHEET = "Relatório"
+SUMMARY_SHEET = "Resumo"
+DEFAULT_CHUNK_ROWS = 4096
+_PROFILE_RE = re.compile(r"Perfil diário:\s*([\d.,]+)\s*dB")
+
+
+class ImportResult:
+    """Histórico e estatísticas recalculadas de um ou mais relatórios."""
+
+    __slots__ = ("history", "stats", "rows", "skipped", "files", "ref_db")
+
+    def __init__(self, history, stats, rows, skipped, files, ref_db):
+        self.history = history
+        self.stats = stats
+        self.rows = rows
+        self.skipped = skipped        # linhas ilegíveis (vazias, texto no lugar de número...)
+        self.files = files
+        self.ref_db = ref_db          # da aba "Resumo"; None se não encontrado
+
+
+def _parse_ts(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return time.mktime(time.strptime(str(value), "%Y-%m-%d %H:%M:%S"))
+
+
+def _open(path):
+    from .excel_support import load_openpyxl
+    return load_openpyxl().load_workbook(path, read_only=True, data_only=True)
+
+
+def _chunks(wb, chunk_rows, skipped):
+    ws = wb[REPORT_SHEET] if REPORT_SHEET in wb.sheetnames else wb.worksheets[0]
+    cols = empty_columns()
+    for row in ws.iter_rows(min_row=2, max_col=8, values_only=True):
+        if not row or row[0] is None:
+            continue
+        try:
+            ts_iso, t_session, mode, vol, L, dose, zone, daily = row
+            values = (_parse_ts(ts_iso), float(t_session), MODE_CODES.get(mode, 0), float(vol),
+                      float(L), float(dose), ZONE_CODES.get(zone, 0), float(daily or 0.0))
+        except (TypeError, ValueError):
+            if skipped is not None:
+                skipped[0] += 1
+            continue
+        for col, v in zip(cols, values):
+            col.append(v)
+        if len(cols[0]) >= chunk_rows:
+            yield cols
+            cols = empty_columns()
+    if len(cols[0]):
+        yield cols
+
+
+def _summary(wb):
+    if SUMMARY_SHEET not in wb.sheetnames:
+        return {}, None
+    values, ref_db = {}, None
+    for row in wb[SUMMARY_SHEET].iter_rows(max_col=2, values_only=True):
+        if not row or row[0] is None:
+            continue
+        label = str(row[0])
+        m = _PROFILE_RE.match(label)
+        if m:
+            ref_db = float(m.group(1).replace(",", "."))
+        elif len(row) > 1 and row[1] is not None:
+            values[label] = row[1]
+    return values, ref_db
+
+
+def iter_report_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, skipped=None):
+    """
+    Blocos de colunas (tupla de array.array na ordem de history.COLUMNS) da
+    aba "Relatório". Modo/zona voltam aos códigos; linhas ilegíveis são
+    puladas e contadas em skipped[0] (lista de um elemento), se dada.
+    """
+    wb = _open(path)
+    try:
+        yield from _chunks(wb, chunk_rows, skipped)
+    finally:
+        wb.close()
+
+
+def read_summary(path):
+    """Pares rótulo -> valor da aba "Resumo" (como gravados) e o ref_db do perfil."""
+    wb = _open(path)
+    try:
+        return _summary(wb)
+    finally:
+        wb.close()
+
+
+def import_report(path, history=None, chunk_rows=DEFAULT_CHUNK_ROWS, spill_dir=None):
+    """
+    Um relatório -> ImportResult. history: HistoryStore onde acrescentar
+    (padrão: um novo com capacidade de dois blocos, o resto vai para o spill).
+    As estatísticas são recalculadas das linhas, não copiadas do "Resumo".
+    """
+    if history is None:
+        history = HistoryStore(capacity=2 * chunk_rows, spill_dir=spill_dir)
+    stats = ExposureStats()
+    skipped = [0]
+    rows = 0
+    # o arquivo é aberto uma vez só: sem <dimension> (planilhas write_only),
+    # o openpyxl varre a aba inteira a cada load_workbook
+    wb = _open(path)
+    try:
+        for cols in _chunks(wb, chunk_rows, skipped):
+            history.extend(cols)
+            for t_session, vol, L, dose in zip(cols[1], cols[3], cols[4], cols[5]):
+                stats.add(t_session, L, vol, dose)
+            rows += len(cols[0])
+        _values, ref_db = _summary(wb)
+    finally:
+        wb.close()
+    return ImportResult(history, stats, rows, skipped[0], [str(path)], ref_db)
+
+
+def first_ts(path):
+    """ts da primeira linha legível da aba "Relatório" (inf se não há nenhuma)."""
+    wb = _open(path)
+    try:
+        for cols in _chunks(wb, 1, None):
+            return cols[0][0]
+        return float("inf")
+    finally:
+        wb.close()
+
+
+def merge_reports(paths, chunk_rows=DEFAULT_CHUNK_ROWS, spill_dir=None):
+    """
+    Vários relatórios num só histórico, em ordem cronológica (pela primeira
+    linha de cada um). Cada arquivo é uma sessão: as estatísticas são
+    juntadas com ExposureStats.merge, como sessões consecutivas. Depois de
+    ordenar, os arquivos são lidos um de cada vez direto para o histórico
+    final: a memória (e os arquivos abertos) não crescem com o número de
+    relatórios.
+    """
+    order = sorted((first_ts(p), str(p)) for p in paths)
+    history = HistoryStore(capacity=2 * chunk_rows, spill_dir=spill_dir)
+    stats = ExposureStats()
+    rows = skipped = 0
+    ref_db = None
+    for _first_ts, path in order:
+        res = import_report(path, history=history, chunk_rows=chunk_rows)
+        stats = stats.merge(res.stats)
+        rows += res.rows
+        skipped += res.skipped
+        if ref_db is None:
+            ref_db = res.ref_db
+    return ImportResult(history, stats, rows, skipped, [p for _ts, p in order], ref_db)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m sound_monitor.importer",
+                                 description="Lê relatorio_som_*.xlsx, recalcula o resumo e opcionalmente junta/reexporta.")
+    ap.add_argument("files", nargs="+", help="relatórios .xlsx exportados pelo app")
+    ap.add_argument("-o", "--output", default=None, help="grava um relatório único com todas as linhas")
+    ap.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    res = merge_reports(args.files, args.chunk_rows)
+    s = res.stats.snapshot()
+    print(f"{len(res.files)} arquivo(s), {res.rows} linhas ({res.skipped} ignoradas) "
+          f"em {time.perf_counter() - t0:.1f} s")
+    print(f"  tempo {s['total_time_s'] / 3600:.2f} h | média {s['avg_db']:.2f} dB | Leq {s['leq_db']:.2f} dB | "
+          f"pico {s['peak_db']:.2f} dB | maior dose {s['max_dose'] * 100:.1f}%")
+    if args.output:
+        from .excel_export import write_session_report
+        cfg = {"ref_db": res.ref_db if res.ref_db is not None else 85.0}
+        write_session_report(args.output, res.history, res.stats.snapshot, cfg, chunk_rows=args.chunk_rows)
+        print(f"  -> {args.output}")
+    res.history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
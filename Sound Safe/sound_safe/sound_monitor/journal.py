@@ -0,0 +1,191 @@
+# journal.py
+#
+# Diário de exposição: registros binários de tamanho fixo, só acrescentados,
+# um arquivo (segmento) por dia em ~/.tcc_sound_monitor/journal. O fsync é
+# feito em grupo (a cada N s ou M registros) e na hora em eventos críticos.
+# Na partida só o último registro válido do segmento de hoje é lido, então a
+# recuperação não depende de quantos dias/semanas já foram gravados.
+
+import os
+import struct
+import threading
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+from .helpers import ZONE_CODES, MODE_CODES
+
+# ts, t_session, session_start_ts, modo, volume, L, dose sessão, zona, dose diária + CRC32
+_BODY = struct.Struct("<dddbfddbd")
+_RECORD = struct.Struct("<dddbfddbdI")
+RECORD_SIZE = _RECORD.size
+
+JournalRecord = namedtuple("JournalRecord", [
+    "ts", "t_session", "session_start_ts", "mode", "vol_percent",
+    "L", "session_dose", "zone", "daily_dose",
+])
+
+
+def default_journal_dir():
+    return Path.home() / ".tcc_sound_monitor" / "journal"
+
+
+def _pack(values):
+    body = _BODY.pack(*values)
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _unpack(buf, offset=0):
+    """Registro em `offset` ou None se o CRC não confere (escrita interrompida)."""
+    values = _RECORD.unpack_from(buf, offset)
+    body = bytes(buf[offset:offset + _BODY.size])
+    if zlib.crc32(body) != values[-1]:
+        return None
+    return JournalRecord(*values[:-1])
+
+
+def iter_segment(path, session_start_ts=None):
+    """Registros íntegros de um arquivo de segmento qualquer (ex.: cópias para relatório)."""
+    data = Path(path).read_bytes()
+    data = memoryview(data)[:len(data) - len(data) % RECORD_SIZE]
+    crc32 = zlib.crc32
+    body_size = _BODY.size
+    for i, values in enumerate(_RECORD.iter_unpack(data)):
+        if session_start_ts is not None and values[2] != session_start_ts:
+            continue
+        off = i * RECORD_SIZE
+        if crc32(data[off:off + body_size]) != values[-1]:
+            continue
+        yield JournalRecord(*values[:-1])
+
+
+class ExposureJournal:
+    """
+    append() é chamado pela thread do monitor (~1x/s); os bytes vão para o
+    buffer do arquivo e o fsync só acontece quando commit_interval_sec ou
+    max_batch estouram (group commit) ou com sync=True.
+    """
+
+    def __init__(self, directory=None, commit_interval_sec=5.0, max_batch=30):
+        self.directory = Path(directory) if directory is not None else default_journal_dir()
+        self.commit_interval_sec = float(commit_interval_sec)
+        self.max_batch = int(max_batch)
+        self._lock = threading.Lock()
+        self._fh = None
+        self._day_key = None
+        self._pending = 0
+        self._last_commit_ts = None
+        self._closed = False
+
+    def segment_path(self, day_key):
+        return self.directory / f"journal-{day_key}.bin"
+
+    # ---------- Escrita ----------
+    def _open_segment(self, day_key):
+        self._close_segment()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.segment_path(day_key)
+        self._repair_tail(path)
+        self._fh = open(path, "ab")
+        self._day_key = day_key
+
+    def _close_segment(self):
+        if self._fh is not None:
+            try:
+                self._commit()
+            finally:
+                self._fh.close()
+                self._fh = None
+                self._day_key = None
+
+    def _commit(self):
+        if self._fh is None or not self._pending:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._pending = 0
+
+    def append(self, day_key, ts, t_session, session_start_ts, mode, vol_percent,
+               L, session_dose, zone, daily_dose, sync=False):
+        if isinstance(mode, str):
+            mode = MODE_CODES.get(mode, 0)
+        if isinstance(zone, str):
+            zone = ZONE_CODES.get(zone, 0)
+        rec = _pack((ts, t_session, session_start_ts, mode, vol_percent,
+                     L, session_dose, zone, daily_dose))
+        with self._lock:
+            if self._closed:
+                return          # tick atrasado depois do close(): não reabre o segmento
+            if day_key != self._day_key:
+                self._open_segment(day_key)
+            self._fh.write(rec)
+            self._pending += 1
+            if self._last_commit_ts is None:
+                self._last_commit_ts = ts
+            if (sync or self._pending >= self.max_batch
+                    or ts - self._last_commit_ts >= self.commit_interval_sec):
+                self._commit()
+                self._last_commit_ts = ts
+
+    def flush(self):
+        """Força o fsync do que está pendente (eventos críticos / saída)."""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._close_segment()
+
+    # ---------- Leitura / recuperação ----------
+    @staticmethod
+    def _repair_tail(path):
+        """Corta um registro final incompleto (queda no meio de uma escrita)."""
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        extra = size % RECORD_SIZE
+        if extra:
+            with open(path, "r+b") as fh:
+                fh.truncate(size - extra)
+
+    def last_record(self, day_key):
+        """
+        Último registro íntegro do dia (lê só o fim do segmento; volta
+        registro a registro se o final estiver corrompido).
+        """
+        path = self.segment_path(day_key)
+        try:
+            fh = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with fh:
+            size = os.fstat(fh.fileno()).st_size
+            pos = size - (size % RECORD_SIZE) - RECORD_SIZE
+            while pos >= 0:
+                fh.seek(pos)
+                rec = _unpack(fh.read(RECORD_SIZE))
+                if rec is not None:
+                    return rec
+                pos -= RECORD_SIZE
+        return None
+
+    def iter_records(self, day_key, session_start_ts=None):
+        """Registros íntegros do dia (opcionalmente só de uma sessão), em ordem."""
+        try:
+            yield from iter_segment(self.segment_path(day_key), session_start_ts)
+        except FileNotFoundError:
+            return
+
+    def prune(self, keep_days=60):
+        """Apaga segmentos mais antigos que os `keep_days` mais recentes."""
+        try:
+            segments = sorted(self.directory.glob("journal-*.bin"))
+        except OSError:
+            return
+        for p in segments[:-keep_days] if keep_days > 0 else segments:
+            try:
+                p.unlink()
+            except OSError:
+                pass
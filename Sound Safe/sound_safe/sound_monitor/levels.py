@@ -0,0 +1,172 @@
+# levels.py
+#
+# Níveis estatísticos (L10/L50/L90) e tempo por faixa de dB sem guardar as
+# amostras: histograma de classes fixas (bin_db) ponderado por tempo. A
+# memória é fixa (uma contagem em segundos por classe), somar dois
+# histogramas (sessões, dias, usuários) é somar as contagens e qualquer
+# percentil sai de uma varredura O(classes), com interpolação linear
+# dentro da classe. Alimentado por ExposureStats.add (cada amostra vale
+# até a próxima). O menor e o maior nível vistos também são guardados: os
+# níveis reais costumam ser valores exatos da tabela (no começo da classe)
+# e, sem esse limite, a interpolação empurraria os percentis para cima –
+# um nível constante de 85 dB daria L10 = 85,45 dB, acima do pico.
+#   LN = nível excedido em N% do tempo (L10 ~ picos, L90 ~ fundo).
+
+import array
+import math
+import threading
+
+DEFAULT_LO_DB = 20.0
+DEFAULT_HI_DB = 140.0
+DEFAULT_BIN_DB = 0.5
+# limites (dB) das faixas do "Tempo por faixa" no relatório
+DEFAULT_BANDS = (70.0, 80.0, 85.0, 90.0, 100.0)
+STAT_LEVELS = (10, 50, 90)
+
+
+class LevelHistogram:
+    """
+    Segundos passados em cada classe [lo + i*bin_db, lo + (i+1)*bin_db).
+    Níveis fora de [lo, hi) contam na primeira/última classe.
+    """
+
+    def __init__(self, lo=DEFAULT_LO_DB, hi=DEFAULT_HI_DB, bin_db=DEFAULT_BIN_DB):
+        self.lo = float(lo)
+        self.bin_db = float(bin_db)
+        self.bins = max(1, int(math.ceil((float(hi) - self.lo) / self.bin_db)))
+        self.hi = self.lo + self.bins * self.bin_db
+        self._lock = threading.Lock()
+        self._secs = array.array("d", bytes(8 * self.bins))
+        self.total_s = 0.0
+        self.min_db = math.inf       # menor/maior nível visto (limites dos percentis)
+        self.max_db = -math.inf
+
+    def _index(self, L):
+        i = int((L - self.lo) / self.bin_db)
+        return 0 if i < 0 else (self.bins - 1 if i >= self.bins else i)
+
+    def add(self, L, seconds):
+        if seconds <= 0.0 or L != L:
+            return
+        with self._lock:
+            self._secs[self._index(L)] += seconds
+            self.total_s += seconds
+            if L < self.min_db: self.min_db = L
+            if L > self.max_db: self.max_db = L
+
+    def reset(self):
+        with self._lock:
+            self._secs = array.array("d", bytes(8 * self.bins))
+            self.total_s = 0.0
+            self.min_db = math.inf
+            self.max_db = -math.inf
+
+    def _compatible(self, other):
+        return (self.lo, self.bin_db, self.bins) == (other.lo, other.bin_db, other.bins)
+
+    def merge(self, other):
+        """Novo histograma = self + other (mesmas classes)."""
+        if not self._compatible(other):
+            raise ValueError("histogramas com classes diferentes")
+        out = LevelHistogram(self.lo, self.hi, self.bin_db)
+        with self._lock:
+            a = self._secs[:]
+            total = self.total_s
+            lo_seen, hi_seen = self.min_db, self.max_db
+        with other._lock:
+            b = other._secs[:]
+            total += other.total_s
+            lo_seen, hi_seen = min(lo_seen, other.min_db), max(hi_seen, other.max_db)
+        for i, v in enumerate(b):
+            if v:
+                a[i] += v
+        out._secs = a
+        out.total_s = total
+        out.min_db, out.max_db = lo_seen, hi_seen
+        return out
+
+    # ---------- Consultas O(classes) ----------
+    def time_below(self, L):
+        """Segundos com nível < L (interpolado dentro da classe)."""
+        with self._lock:
+            secs = self._secs[:]
+            total, lo_seen, hi_seen = self.total_s, self.min_db, self.max_db
+        if L <= lo_seen:
+            return 0.0
+        if L > hi_seen:
+            return total
+        pos = (L - self.lo) / self.bin_db
+        if pos <= 0.0:
+            return 0.0
+        full = min(int(pos), self.bins)
+        below = math.fsum(secs[:full])
+        if full < self.bins:
+            below += secs[full] * (pos - full)
+        return below
+
+    def level_at(self, fraction):
+        """Nível abaixo do qual fica `fraction` (0..1) do tempo; None sem dados."""
+        with self._lock:
+            secs = self._secs[:]
+            total = self.total_s
+            lo_seen, hi_seen = self.min_db, self.max_db
+        if total <= 0.0:
+            return None
+        L = self._interpolate(secs, total, fraction)
+        # a interpolação supõe o tempo espalhado pela classe toda; nunca passa do que foi visto
+        return min(max(L, lo_seen), hi_seen)
+
+    def _interpolate(self, secs, total, fraction):
+        target = min(max(fraction, 0.0), 1.0) * total
+        acc = 0.0
+        last = None
+        for i, v in enumerate(secs):
+            if not v:
+                continue
+            if acc + v >= target:
+                return self.lo + (i + (target - acc) / v) * self.bin_db
+            acc += v
+            last = i
+        return self.lo + (last + 1) * self.bin_db
+
+    def exceeded(self, n):
+        """LN: nível excedido em N% do tempo (ex.: exceeded(10) = L10)."""
+        return self.level_at(1.0 - n / 100.0)
+
+    def bands(self, edges=DEFAULT_BANDS):
+        """[(rótulo, segundos)] para as faixas <e0, e0–e1, ..., ≥en."""
+        edges = sorted(edges)
+        cuts = [self.time_below(e) for e in edges]
+        out = [(f"< {edges[0]:.0f} dB", cuts[0])]
+        for (e0, c0), (e1, c1) in zip(zip(edges, cuts), zip(edges[1:], cuts[1:])):
+            out.append((f"{e0:.0f}–{e1:.0f} dB", max(0.0, c1 - c0)))
+        out.append((f"≥ {edges[-1]:.0f} dB", max(0.0, self.total_s - cuts[-1])))
+        return out
+
+    # ---------- Serialização (compacta: só o trecho com dados) ----------
+    def to_dict(self):
+        with self._lock:
+            secs = self._secs
+            used = [i for i, v in enumerate(secs) if v]
+            first = used[0] if used else 0
+            last = used[-1] + 1 if used else 0
+            d = {"lo": self.lo, "bin_db": self.bin_db, "bins": self.bins,
+                 "first": first, "secs": list(secs[first:last])}
+            if used:
+                d["min_db"] = self.min_db
+                d["max_db"] = self.max_db
+            return d
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls(data["lo"], data["lo"] + data["bins"] * data["bin_db"], data["bin_db"])
+        first = int(data.get("first", 0))
+        for i, v in enumerate(data.get("secs", ())):
+            h._secs[first + i] = v
+        h.total_s = math.fsum(h._secs)
+        if h.total_s > 0.0:
+            # dicts antigos (sem min/max): limites das classes usadas
+            used = [i for i, v in enumerate(h._secs) if v]
+            h.min_db = float(data.get("min_db", h.lo + used[0] * h.bin_db))
+            h.max_db = float(data.get("max_db", h.lo + (used[-1] + 1) * h.bin_db))
+        return h
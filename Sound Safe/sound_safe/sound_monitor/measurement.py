@@ -0,0 +1,293 @@
+# measurement.py
+#
+# Nível medido no sinal de saída (opcional, precisa de NumPy): o PCM de
+# reprodução/loopback chega em blocos, vira mono num buffer pré-alocado,
+# passa pela ponderação A no domínio da frequência (rfft + Parseval) e
+# acumula energia. O monitor lê o Leq desde a leitura anterior e o usa no
+# lugar de map_percent_to_db:
+#   L = map_percent_to_db(volume) + (Leq_A[dBFS] - ref_dbfs)
+# ou seja, o mapeamento do slider vale para um programa de referência
+# (ref_dbfs); silêncio pesa pouco e uma faixa alta pesa mais.
+# Fontes: WavFileSource (replay de arquivos, testável no Linux) e
+# LoopbackSource (pacote `soundcard`, importado só se usado).
+
+import math
+import threading
+import time
+import wave
+
+from .numpy_support import _NUMPY_AVAILABLE, np
+from .helpers import map_percent_to_db
+
+DEFAULT_BLOCK_SEC = 0.1
+DEFAULT_REF_DBFS = -20.0       # nível A típico de música masterizada (seno cheio = 0 dB)
+_SILENCE_MS = 1e-20
+
+
+def _require_numpy():
+    if not _NUMPY_AVAILABLE:
+        raise RuntimeError("Para medir o nível do sinal: pip install numpy")
+
+
+def a_weighting_gain(freqs):
+    """Ganho linear da curva A (IEC 61672) em cada frequência; 1.0 em 1 kHz."""
+    f2 = np.asarray(freqs, dtype=np.float64) ** 2
+    num = (12194.0 ** 2) * f2 * f2
+    den = ((f2 + 20.6 ** 2) * np.sqrt((f2 + 107.7 ** 2) * (f2 + 737.9 ** 2)) * (f2 + 12194.0 ** 2))
+    ra = num / den
+    k = 1000.0 ** 2
+    ra_1k = (12194.0 ** 2) * k * k / ((k + 20.6 ** 2) * math.sqrt((k + 107.7 ** 2) * (k + 737.9 ** 2)) * (k + 12194.0 ** 2))
+    return ra / ra_1k
+
+
+class AWeightedMeter:
+    """
+    Leq ponderado A em dBFS (seno em fundo de escala = 0 dB). process()
+    aceita blocos (frames, canais) de qualquer tamanho – int16/int32/float –
+    e só processa blocos cheios de `block_frames`; nenhuma alocação por bloco.
+    """
+
+    def __init__(self, samplerate, channels, block_sec=DEFAULT_BLOCK_SEC, window_sec=1.0):
+        _require_numpy()
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        n = self.block_frames = max(256, int(round(self.samplerate * block_sec)))
+        self._stage = np.zeros(n, dtype=np.float64)
+        self._fill = 0
+        self._spectrum = np.empty(n // 2 + 1, dtype=np.complex128)
+        self._power = np.empty(n // 2 + 1, dtype=np.float64)
+        # Hann: sem ela o vazamento dos graves (ganho A baixo) para bins de
+        # ganho alto superestima o nível; a energia é corrigida por mean(hann²)
+        self._taper = np.hanning(n)
+        # |X_k|^2 -> média quadrática ponderada (Parseval; bins internos contam 2x)
+        w = a_weighting_gain(np.fft.rfftfreq(n, 1.0 / self.samplerate)) ** 2
+        w[1:(n + 1) // 2] *= 2.0
+        # x2: referência no seno de fundo de escala (média quadrática 1/2)
+        self._weights = w * (2.0 / (n * n * float(np.mean(self._taper ** 2))))
+        try:
+            np.fft.rfft(self._stage, out=self._spectrum)
+            self._rfft_out = True
+        except TypeError:       # NumPy < 2.0
+            self._rfft_out = False
+
+        self._window = np.zeros(max(1, int(round(window_sec / block_sec))), dtype=np.float64)
+        self._window_pos = 0
+        self._window_count = 0
+        self._lock = threading.Lock()
+        self._pending_energy = 0.0
+        self._pending_blocks = 0
+        self.blocks = 0
+        self.last_block_at = None
+
+    def _scale_for(self, dtype):
+        if dtype.kind == "f":
+            return 1.0 / self.channels
+        if dtype.kind in "iu":
+            bits = dtype.itemsize * 8
+            return 1.0 / (self.channels * float(1 << (bits - 1)))
+        raise ValueError(f"formato de amostra não suportado: {dtype}")
+
+    def process(self, block):
+        """block: ndarray (frames, canais) ou 1-D intercalado; pode ser visão de um buffer."""
+        frames = block.reshape(-1, self.channels)
+        # escala pelo formato original (uint8 = 8 bits: fundo de escala 128, não o do int16)
+        scale = self._scale_for(frames.dtype)
+        if frames.dtype.kind == "u":          # PCM 8 bits sem sinal
+            frames = frames.astype(np.int16) - 128
+        n_total = frames.shape[0]
+        pos = 0
+        while pos < n_total:
+            take = min(self.block_frames - self._fill, n_total - pos)
+            dst = self._stage[self._fill:self._fill + take]
+            np.sum(frames[pos:pos + take], axis=1, dtype=np.float64, out=dst)
+            dst *= scale
+            self._fill += take
+            pos += take
+            if self._fill == self.block_frames:
+                self._process_stage()
+                self._fill = 0
+
+    def _process_stage(self):
+        self._stage *= self._taper
+        if self._rfft_out:
+            np.fft.rfft(self._stage, out=self._spectrum)
+            spec = self._spectrum
+        else:
+            spec = np.fft.rfft(self._stage)
+        ms = self._weighted_ms(spec)
+        w = self._window
+        w[self._window_pos] = ms
+        self._window_pos = (self._window_pos + 1) % w.size
+        self._window_count = min(self._window_count + 1, w.size)
+        with self._lock:
+            self._pending_energy += ms
+            self._pending_blocks += 1
+        self.blocks += 1
+        self.last_block_at = time.monotonic()
+
+    def _weighted_ms(self, spec):
+        # sum(w * (re^2 + im^2)) sem temporários: .real/.imag são visões
+        p = self._power
+        np.multiply(spec.real, spec.real, out=p)
+        re = float(np.dot(p, self._weights))
+        np.multiply(spec.imag, spec.imag, out=p)
+        return re + float(np.dot(p, self._weights))
+
+    @staticmethod
+    def _to_db(ms):
+        return 10.0 * math.log10(max(ms, _SILENCE_MS))
+
+    def short_term_db(self):
+        """Leq A da janela deslizante (window_sec) em dBFS; None sem dados."""
+        if not self._window_count:
+            return None
+        return self._to_db(float(self._window[:self._window_count].mean()))
+
+    def consume_leq(self):
+        """Leq A (dBFS) dos blocos desde a chamada anterior; None se não chegou bloco."""
+        with self._lock:
+            energy, count = self._pending_energy, self._pending_blocks
+            self._pending_energy, self._pending_blocks = 0.0, 0
+        if not count:
+            return None
+        return self._to_db(energy / count)
+
+
+class WavFileSource:
+    """Blocos de um WAV PCM (8/16/32 bits). realtime=True respeita o relógio; loop=True repete."""
+
+    def __init__(self, path, block_sec=DEFAULT_BLOCK_SEC, realtime=False, loop=False):
+        self.path = str(path)
+        self.block_sec = float(block_sec)
+        self.realtime = realtime
+        self.loop = loop
+        with wave.open(self.path, "rb") as wf:
+            self.samplerate = wf.getframerate()
+            self.channels = wf.getnchannels()
+            width = wf.getsampwidth()
+        dtypes = {1: np.uint8, 2: np.int16, 4: np.int32}
+        if width not in dtypes:
+            raise ValueError(f"WAV de {width * 8} bits não suportado")
+        self._dtype = np.dtype(dtypes[width]).newbyteorder("<")
+
+    def blocks(self, stop_event=None):
+        frames = max(1, int(round(self.samplerate * self.block_sec)))
+        t_next = time.monotonic()
+        while True:
+            with wave.open(self.path, "rb") as wf:
+                while stop_event is None or not stop_event.is_set():
+                    raw = wf.readframes(frames)
+                    if not raw:
+                        break
+                    # visão sobre os bytes lidos (sem cópia)
+                    yield np.frombuffer(raw, dtype=self._dtype).reshape(-1, self.channels)
+                    if self.realtime:
+                        t_next += len(raw) / (self._dtype.itemsize * self.channels * self.samplerate)
+                        delay = t_next - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+            if not self.loop or (stop_event is not None and stop_event.is_set()):
+                return
+
+    def close(self):
+        pass
+
+
+class LoopbackSource:
+    """Loopback do dispositivo de saída padrão via `soundcard` (WASAPI / PulseAudio)."""
+
+    def __init__(self, samplerate=48000, channels=2, block_sec=DEFAULT_BLOCK_SEC):
+        import soundcard  # type: ignore  # opcional: pip install soundcard
+        speaker = soundcard.default_speaker()
+        self._mic = soundcard.get_microphone(str(speaker.name), include_loopback=True)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.block_sec = float(block_sec)
+
+    def blocks(self, stop_event=None):
+        frames = max(1, int(round(self.samplerate * self.block_sec)))
+        with self._mic.recorder(samplerate=self.samplerate, channels=self.channels, blocksize=frames) as rec:
+            while stop_event is None or not stop_event.is_set():
+                yield rec.record(numframes=frames)
+
+    def close(self):
+        pass
+
+
+class LevelMeter:
+    """
+    Thread de captura: fonte -> AWeightedMeter. O monitor chama level_db()
+    a cada tick; None (fonte parada/sem dados) = usar o mapeamento do slider.
+    """
+
+    def __init__(self, source, ref_dbfs=DEFAULT_REF_DBFS, stale_sec=2.0):
+        self.source = source
+        self.ref_dbfs = float(ref_dbfs)
+        self.stale_sec = float(stale_sec)
+        self.meter = AWeightedMeter(source.samplerate, source.channels, block_sec=source.block_sec)
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_dbfs = None
+        self.error = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            for block in self.source.blocks(self._stop):
+                self.meter.process(block)
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            self.error = e
+            print("Erro na medição do sinal:", e)
+        finally:
+            self.source.close()
+
+    def level_db(self, vol_percent, cfg, levels=None):
+        """
+        dB estimado no ouvido (escala do perfil) ou None se a medição não está
+        ativa. levels: calibration.LevelModel – curva do dispositivo no lugar da reta.
+        """
+        last = self.meter.last_block_at
+        if last is None or (time.monotonic() - last) > self.stale_sec:
+            self._last_dbfs = None
+            return None
+        dbfs = self.meter.consume_leq()
+        if dbfs is None:
+            dbfs = self._last_dbfs          # tick mais rápido que o bloco
+            if dbfs is None:
+                return None
+        self._last_dbfs = dbfs
+        if levels is not None:
+            tables = levels.tables
+            base, floor_db = tables.db_for_percent(vol_percent), tables.min_db
+        else:
+            base, floor_db = map_percent_to_db(vol_percent, cfg), float(cfg["min_db"])
+        L = base + (dbfs - self.ref_dbfs)
+        return max(floor_db, L)
+
+
+def create_level_meter(spec, ref_dbfs=DEFAULT_REF_DBFS):
+    """
+    spec: "loopback" ou "wav:<arquivo>" (TCC_MEASUREMENT / settings);
+    None/"" ou "off" = sem medição.
+    """
+    spec = (spec or "").strip()
+    if not spec or spec.lower() == "off":
+        return None
+    if spec.lower() == "loopback":
+        source = LoopbackSource()
+    elif spec.lower().startswith("wav:"):
+        source = WavFileSource(spec[4:], realtime=True, loop=True)
+    else:
+        raise ValueError(f"fonte de medição desconhecida: {spec}")
+    return LevelMeter(source, ref_dbfs=ref_dbfs)
@@ -0,0 +1,298 @@
+# notifications.py
+#
+# Central de avisos sem janela modal: alertas de dose (50/80/100%, bloqueio
+# diário, novo dia) e avisos de exportação viram "toasts" empilhados no
+# canto da janela, que somem sozinhos, e ficam num histórico consultável.
+#   NotificationCenter – sem Tk; post() pode vir de qualquer thread, nunca
+#                        bloqueia. Repetição da mesma chave dentro de
+#                        dedupe_sec só incrementa o contador; um balde de
+#                        fichas limita rajadas (erros e avisos urgentes –
+#                        os de dose – sempre aparecem).
+#   ToastStack         – widget Tk; poll() é chamado pelo _ui_pump.
+#   OsNotifier         – opcional (plyer / notify-send / osascript), numa
+#                        thread própria com fila curta; cheia = descarta.
+
+import importlib.util
+import platform
+import shutil
+import subprocess
+import threading
+import time
+import tkinter as tk
+from collections import deque
+from datetime import datetime
+from queue import Queue, Full
+
+from .colors import (
+    DISCORD_BG,
+    DISCORD_SURFACE_ALT,
+    DISCORD_ACCENT,
+    DISCORD_WARN,
+    DISCORD_ERROR,
+    DISCORD_TEXT,
+)
+
+LEVEL_INFO = "info"
+LEVEL_WARN = "warn"
+LEVEL_ERROR = "error"
+
+_LEVEL_COLORS = {LEVEL_INFO: DISCORD_ACCENT, LEVEL_WARN: DISCORD_WARN, LEVEL_ERROR: DISCORD_ERROR}
+_LEVEL_LABELS = {LEVEL_INFO: "info", LEVEL_WARN: "atenção", LEVEL_ERROR: "erro"}
+# tempo na tela (ms) por nível
+_TOAST_TTL_MS = {LEVEL_INFO: 5000, LEVEL_WARN: 10000, LEVEL_ERROR: 20000}
+
+
+class Notification:
+    __slots__ = ("key", "level", "title", "message", "ts", "count", "shown")
+
+    def __init__(self, key, level, title, message, ts):
+        self.key = key
+        self.level = level
+        self.title = title
+        self.message = message
+        self.ts = ts              # epoch da última ocorrência
+        self.count = 1
+        self.shown = False        # virou toast (False = contido pelo limite)
+
+    def format_line(self):
+        when = datetime.fromtimestamp(self.ts).strftime("%d/%m %H:%M:%S")
+        rep = f"  (x{self.count})" if self.count > 1 else ""
+        return f"{when}  [{_LEVEL_LABELS.get(self.level, self.level)}]  {self.title}: {self.message}{rep}"
+
+
+class NotificationCenter:
+    def __init__(self, dedupe_sec=300.0, burst=3, refill_sec=5.0, history_size=200,
+                 clock=time.monotonic, wall=time.time):
+        self.dedupe_sec = float(dedupe_sec)
+        self.burst = int(burst)
+        self.refill_sec = float(refill_sec)
+        self._clock = clock
+        self._wall = wall
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=int(history_size))
+        self._last_by_key = {}            # chave -> (instante monotônico, Notification)
+        self._outbox = deque()            # a mostrar (drenado pela UI)
+        self._tokens = float(self.burst)
+        self._tokens_at = clock()
+        self._sinks = []
+        self.unread = 0
+        self.suppressed = 0
+
+    def add_sink(self, sink):
+        """sink(notification) para os avisos exibidos, fora do lock; precisa ser não bloqueante."""
+        self._sinks.append(sink)
+
+    def post(self, title, message, level=LEVEL_INFO, key=None, urgent=False):
+        """
+        Registra o aviso; True se vai virar toast. Seguro em qualquer thread.
+        urgent=True (alertas de dose) não passa pelo balde de fichas.
+        """
+        key = key or title
+        with self._lock:
+            now = self._clock()
+            prev = self._last_by_key.get(key)
+            if prev is not None and (now - prev[0]) < self.dedupe_sec:
+                n = prev[1]
+                n.count += 1
+                n.ts = self._wall()
+                return False
+            n = Notification(key, level, title, message, self._wall())
+            self._last_by_key[key] = (now, n)
+            self._history.append(n)
+            self.unread += 1
+            if urgent or level == LEVEL_ERROR or self._take_token(now):
+                n.shown = True
+                self._outbox.append(n)
+            else:
+                self.suppressed += 1
+        if n.shown:
+            for sink in self._sinks:
+                try:
+                    sink(n)
+                except Exception as e:
+                    print("Erro ao repassar notificação:", e)
+        return n.shown
+
+    def _take_token(self, now):
+        if self.refill_sec > 0:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._tokens_at) / self.refill_sec)
+        self._tokens_at = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    def drain(self):
+        """Avisos pendentes de exibição (thread da UI)."""
+        out = []
+        with self._lock:
+            while self._outbox:
+                out.append(self._outbox.popleft())
+        return out
+
+    def history(self):
+        """Mais recentes primeiro."""
+        with self._lock:
+            return list(reversed(self._history))
+
+    def mark_read(self):
+        self.unread = 0
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+            self._last_by_key.clear()
+            self._outbox.clear()
+            self.unread = 0
+
+
+# ---------- Notificação do sistema operacional (opcional) ----------
+def detect_os_backend():
+    """'plyer', 'notify-send', 'osascript' ou None."""
+    if importlib.util.find_spec("plyer") is not None:
+        return "plyer"
+    system = platform.system()
+    if system == "Linux" and shutil.which("notify-send"):
+        return "notify-send"
+    if system == "Darwin" and shutil.which("osascript"):
+        return "osascript"
+    return None
+
+
+class OsNotifier:
+    """Entrega na área de notificação do SO numa thread própria (sink da central)."""
+
+    def __init__(self, backend=None, app_name="Monitor de Exposição Sonora", max_pending=8):
+        self.backend = backend or detect_os_backend()
+        self.app_name = app_name
+        self._queue = Queue(maxsize=int(max_pending))
+        self._thread = None
+        self.dropped = 0
+
+    @property
+    def available(self):
+        return self.backend is not None
+
+    def start(self):
+        if not self.available or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread = None
+            try:
+                self._queue.put_nowait(None)
+            except Full:
+                pass
+
+    def __call__(self, n):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(n)
+        except Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            n = self._queue.get()
+            if n is None:
+                return
+            try:
+                self._deliver(n)
+            except Exception as e:
+                print("Falha na notificação do sistema:", e)
+
+    def _deliver(self, n):
+        if self.backend == "plyer":
+            from plyer import notification  # type: ignore  # opcional: pip install plyer
+            notification.notify(title=n.title, message=n.message, app_name=self.app_name, timeout=8)
+        elif self.backend == "notify-send":
+            urgency = {LEVEL_ERROR: "critical", LEVEL_WARN: "normal"}.get(n.level, "low")
+            subprocess.run(["notify-send", "-a", self.app_name, "-u", urgency, n.title, n.message],
+                           timeout=5, check=False)
+        elif self.backend == "osascript":
+            script = f"display notification {_applescript_str(n.message)} with title {_applescript_str(n.title)}"
+            subprocess.run(["osascript", "-e", script], timeout=5, check=False)
+
+
+def _applescript_str(s):
+    return '"' + str(s).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# ---------- Toasts na janela ----------
+class ToastStack(tk.Frame):
+    """
+    Pilha de toasts no canto inferior direito de `master` (place, acima dos
+    painéis). Sem toasts o frame sai da tela e não cobre nada.
+    """
+
+    def __init__(self, master, center, max_visible=4, width=300, on_change=None, **kwargs):
+        super().__init__(master, bg=DISCORD_BG, **kwargs)
+        self.center = center
+        self.max_visible = int(max_visible)
+        self.width = int(width)
+        self.on_change = on_change
+        self._toasts = []             # [(frame, after_id)] do mais antigo ao mais novo
+        self._placed = False
+        self._unread_seen = None
+
+    def poll(self):
+        """Chamado a cada frame do _ui_pump; só desenha o que chegou."""
+        for n in self.center.drain():
+            self._show(n)
+        if self.on_change is not None and self.center.unread != self._unread_seen:
+            self._unread_seen = self.center.unread
+            self.on_change(self._unread_seen)
+
+    def _show(self, n):
+        color = _LEVEL_COLORS.get(n.level, DISCORD_ACCENT)
+        toast = tk.Frame(self, bg=DISCORD_SURFACE_ALT, highlightthickness=1, highlightbackground=color)
+        tk.Frame(toast, bg=color, width=5).pack(side="left", fill="y")
+        body = tk.Frame(toast, bg=DISCORD_SURFACE_ALT)
+        body.pack(side="left", fill="both", expand=True, padx=8, pady=6)
+        head = tk.Frame(body, bg=DISCORD_SURFACE_ALT)
+        head.pack(fill="x")
+        tk.Label(head, text=n.title, bg=DISCORD_SURFACE_ALT, fg=color, anchor="w",
+                 font=("Segoe UI", 11, "bold")).pack(side="left", fill="x", expand=True)
+        close = tk.Label(head, text="×", bg=DISCORD_SURFACE_ALT, fg="#aaa", cursor="hand2",
+                         font=("Segoe UI", 12, "bold"))
+        close.pack(side="right")
+        tk.Label(body, text=n.message, bg=DISCORD_SURFACE_ALT, fg=DISCORD_TEXT, anchor="w",
+                 justify="left", wraplength=self.width - 40, font=("Segoe UI", 10)).pack(fill="x")
+
+        entry = [toast, None]
+        entry[1] = self.after(_TOAST_TTL_MS.get(n.level, 5000), lambda: self._dismiss(entry))
+        close.bind("<Button-1>", lambda e: self._dismiss(entry))
+        self._toasts.append(entry)
+        toast.pack(side="bottom", fill="x", pady=(6, 0))
+        while len(self._toasts) > self.max_visible:
+            self._dismiss(self._toasts[0])
+        self._relayout()
+
+    def _dismiss(self, entry):
+        if entry not in self._toasts:
+            return
+        self._toasts.remove(entry)
+        try:
+            self.after_cancel(entry[1])
+        except Exception:
+            pass
+        entry[0].destroy()
+        self._relayout()
+
+    def _relayout(self):
+        if self._toasts and not self._placed:
+            self.place(relx=1.0, rely=1.0, x=-18, y=-18, anchor="se", width=self.width)
+            self._placed = True
+        elif not self._toasts and self._placed:
+            self.place_forget()
+            self._placed = False
+        if self._placed:
+            self.lift()
+
+    def clear(self):
+        for entry in list(self._toasts):
+            self._dismiss(entry)
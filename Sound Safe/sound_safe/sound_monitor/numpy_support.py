@@ -0,0 +1,9 @@
+# numpy_support.py
+
+_NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except Exception:
+    _NUMPY_AVAILABLE = False
+    np = None
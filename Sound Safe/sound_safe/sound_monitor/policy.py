@@ -0,0 +1,183 @@
+# policy.py
+#
+# Regras dos modos (Prefixado / Dinâmico) sem UI: recebem o EngineState e o
+# volume atual e devolvem uma decisão (novo volume, status, pedido de trava).
+# O app aplica a decisão nos widgets; o bench roda as mesmas regras com
+# relógio e backend de volume falsos.
+
+import math
+from collections import namedtuple
+
+from .colors import DISCORD_WARN
+from .helpers import db_to_percent
+
+STATUS_NORMAL = ("Status: normal", "#bbb")
+
+# volume: novo % para slider e SO (ou None); status: (texto, cor) ou None;
+# lock: (alvo %, motivo, honor_min) ou None
+PolicyDecision = namedtuple("PolicyDecision", ["volume", "status", "lock"])
+
+_NO_DECISION = PolicyDecision(None, None, None)
+
+
+def safe_zone_target_pct(cfg, levels=None):
+    # Zona segura = início do verde = ref_db - 15 dB
+    Lmax = float(cfg["ref_db"]) - 15.0
+    if levels is not None:
+        tables = levels.tables
+        if tables.profile is not None:      # curva medida: inverte pela tabela
+            return tables.percent_for_db(Lmax)
+    return db_to_percent(Lmax, cfg)
+
+
+class ModePolicy:
+    def __init__(self, cfg, quantum=1.0, levels=None):
+        self.cfg = cfg
+        self.quantum = float(quantum)   # % (combina com o mixer do SO)
+        self.levels = levels            # calibration.LevelModel (None = reta min/max dB)
+        self.dynamic_strategy = "reserva"  # 'reserva' | 'zona_segura'
+
+        # Dinâmico (anti-oscilação)
+        self.dynamic_reserve_min_sec = 600.0     # 10 min
+        self.dynamic_reserve_max_sec = 1200.0    # 20 min
+        self.dynamic_reserve_fraction = 0.10
+        self.dynamic_step_small = 0.25
+        self.dynamic_step_medium = 0.5
+        self.dynamic_step_large = 1.0
+        self.dynamic_hysteresis_sec = 90.0
+        self.dynamic_adjust_interval = 0.6
+
+        # ----- Soft-lock dinâmico (teto móvel) -----
+        self.dynamic_softlock_enabled = True     # trava aumentos enquanto o Dinâmico reduz
+        self.dynamic_release_delay = 20.0        # seg acima do 'upper' para liberar teto
+        self.reset()
+
+    def quantize(self, pct):
+        q = self.quantum or 1.0
+        return max(0.0, min(100.0, round(float(pct) / q) * q))
+
+    def _step_down(self, vol_pct, step):
+        """
+        Volume após descer `step`, arredondado para baixo no degrau do mixer:
+        passos menores que o degrau (0.25 com degrau 1%) arredondariam de volta
+        para o volume atual e o Dinâmico nunca desceria.
+        """
+        q = self.quantum or 1.0
+        return max(0.0, math.floor((float(vol_pct) - step) / q + 1e-9) * q)
+
+    def reset(self):
+        self.dynamic_limiting_active = False
+        self.dynamic_decay_active = False
+        self.last_dynamic_adjust_ts = 0.0
+        self.dynamic_ceiling_pct = None          # teto atual (None = liberado)
+        self._dynamic_upper_ok_since = None      # timestamp quando passou do upper
+
+    def next_step_in(self, now):
+        """Segundos até o próximo passo do Dinâmico (None se não está limitando)."""
+        if not self.dynamic_limiting_active:
+            return None
+        return self.last_dynamic_adjust_ts + self.dynamic_adjust_interval - now
+
+    def _lower_ceiling(self, pct):
+        if self.dynamic_softlock_enabled:
+            self.dynamic_ceiling_pct = pct if self.dynamic_ceiling_pct is None else min(self.dynamic_ceiling_pct, pct)
+
+    def _release_ceiling_if_stable(self, ok, now):
+        # Liberação do teto só após estabilidade por dynamic_release_delay
+        if not self.dynamic_softlock_enabled:
+            return
+        if ok:
+            if self._dynamic_upper_ok_since is None:
+                self._dynamic_upper_ok_since = now
+            elif (now - self._dynamic_upper_ok_since) >= self.dynamic_release_delay:
+                self.dynamic_ceiling_pct = None
+        else:
+            self._dynamic_upper_ok_since = None
+
+    def step(self, st, vol_pct, mode):
+        """Uma amostra (volume não travado). Devolve PolicyDecision."""
+        if mode == "prefixado":
+            return self._step_prefixado(st, vol_pct)
+        if mode == "dinamico" and st.session_dose < 1.0:
+            if self.dynamic_strategy == "reserva":
+                return self._step_reserva(st, vol_pct)
+            return self._step_zona_segura(st, vol_pct)
+        return _NO_DECISION
+
+    def _step_prefixado(self, st, vol_pct):
+        # Quando o tempo permitido no nível atual zera, corta p/ zona segura
+        if st.session_dose >= 1.0:
+            return PolicyDecision(None, STATUS_NORMAL, None)
+        if st.ema_remaining_sec <= 0.0:
+            target = safe_zone_target_pct(self.cfg, self.levels)
+            return PolicyDecision(min(vol_pct, target),
+                                  ("Status: corte p/ zona segura (perfil)", DISCORD_WARN),
+                                  (target, "corte automático (perfil)", False))
+        return _NO_DECISION
+
+    def _step_reserva(self, st, vol_pct):
+        now = st.ts
+        ema_remaining = st.ema_remaining_sec
+        reserve_target = max(
+            self.dynamic_reserve_min_sec,
+            min(self.dynamic_reserve_max_sec, self.dynamic_reserve_fraction * st.allowed_sec)
+        )
+        lower = reserve_target - self.dynamic_hysteresis_sec
+        upper = reserve_target + self.dynamic_hysteresis_sec
+
+        if not self.dynamic_limiting_active and ema_remaining < lower:
+            self.dynamic_limiting_active = True
+            # ao entrar no limitando, captura teto inicial
+            if self.dynamic_softlock_enabled:
+                self._lower_ceiling(self.quantize(vol_pct))
+                self._dynamic_upper_ok_since = None
+        elif self.dynamic_limiting_active and ema_remaining > upper:
+            self.dynamic_limiting_active = False
+
+        if self.dynamic_limiting_active:
+            new_vol = None
+            if (now - self.last_dynamic_adjust_ts) >= self.dynamic_adjust_interval:
+                deficit = reserve_target - ema_remaining
+                if deficit < 60: step = self.dynamic_step_small
+                elif deficit < 300: step = self.dynamic_step_medium
+                else: step = self.dynamic_step_large
+                target = self._step_down(vol_pct, step)
+                if target < vol_pct - 0.099:
+                    self.dynamic_decay_active = True
+                    new_vol = target
+                    # atualiza teto (monótono)
+                    self._lower_ceiling(target)
+                self.last_dynamic_adjust_ts = now
+            return PolicyDecision(new_vol, ("Status: auto-limitando", DISCORD_WARN), None)
+
+        self.dynamic_decay_active = False
+        self._release_ceiling_if_stable(ema_remaining > upper, now)
+        return PolicyDecision(None, STATUS_NORMAL, None)
+
+    def _step_zona_segura(self, st, vol_pct):
+        now = st.ts
+        L_eff = st.L
+        if st.level_zone != "SEGURA":
+            if not self.dynamic_limiting_active:
+                self.dynamic_limiting_active = True
+                # pegamos um teto inicial
+                if self.dynamic_softlock_enabled:
+                    self._lower_ceiling(self.quantize(vol_pct))
+                    self._dynamic_upper_ok_since = None
+            new_vol = None
+            if (now - self.last_dynamic_adjust_ts) >= self.dynamic_adjust_interval:
+                if L_eff < 90: step = self.dynamic_step_small
+                else: step = self.dynamic_step_medium if L_eff < 95 else self.dynamic_step_large
+                target = max(self.cfg["min_enforced_volume"], self._step_down(vol_pct, step))
+                if abs(target - vol_pct) >= 0.1:
+                    new_vol = target
+                    self._lower_ceiling(target)
+                self.last_dynamic_adjust_ts = now
+            return PolicyDecision(new_vol, ("Status: auto-limitando (até zona segura)", DISCORD_WARN), None)
+
+        # estamos na zona segura
+        self.dynamic_limiting_active = False
+        self.dynamic_decay_active = False
+        # Libera teto após estabilidade em verde por X s
+        self._release_ceiling_if_stable(True, now)
+        return PolicyDecision(None, STATUS_NORMAL, None)
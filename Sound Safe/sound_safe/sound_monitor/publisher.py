@@ -0,0 +1,141 @@
+# publisher.py
+#
+# Lado do monitor: envia amostras para o coletor sem nunca bloquear o tick.
+# publish() só acrescenta num deque limitado (coletor fora do ar = as mais
+# antigas são descartadas); uma thread própria conecta, manda lotes e, em
+# caso de erro (na conexão ou no envio), reconecta com back-off exponencial.
+# stop() espera um pouco a thread mandar o que ainda está na fila.
+
+import getpass
+import os
+import socket
+import threading
+from collections import deque
+
+from .fleet_protocol import DEFAULT_PORT, PROTOCOL_VERSION, encode_frame
+
+
+def collector_from_env():
+    """TCC_COLLECTOR=host[:porta] -> (host, porta) ou None."""
+    raw = os.environ.get("TCC_COLLECTOR", "").strip()
+    if not raw:
+        return None
+    host, _, port = raw.partition(":")
+    return host, int(port) if port else DEFAULT_PORT
+
+
+class DosePublisher:
+    def __init__(self, host, port=DEFAULT_PORT, user=None, max_pending=3600,
+                 batch_interval=1.0, max_batch=500, send_timeout=5.0,
+                 min_backoff=1.0, max_backoff=60.0, stop_timeout=2.0):
+        self.host = host
+        self.port = int(port)
+        self.user = user or getpass.getuser()
+        self.batch_interval = float(batch_interval)
+        self.max_batch = int(max_batch)
+        self.send_timeout = float(send_timeout)
+        self.min_backoff = float(min_backoff)
+        self.max_backoff = float(max_backoff)
+        self.stop_timeout = float(stop_timeout)
+        self._pending = deque(maxlen=int(max_pending))
+        self._stop = threading.Event()
+        self._thread = None
+        self._sock = None
+        self.sent = 0
+        self.dropped = 0
+        self.connected = False
+
+    def publish(self, ts, L, vol_percent, session_dose, daily_dose, day_key):
+        """O(1), nunca bloqueia (chamado na thread do monitor)."""
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append((ts, L, vol_percent, session_dose, daily_dose, day_key))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Encerra a thread; espera até stop_timeout pela última tentativa de envio."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(self.stop_timeout)
+
+    # ---------- Thread de envio ----------
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.send_timeout)
+        sock.settimeout(self.send_timeout)
+        sock.sendall(encode_frame({
+            "type": "hello", "user": self.user,
+            "host": socket.gethostname(), "version": PROTOCOL_VERSION,
+        }))
+        return sock
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self.connected = False
+
+    def _requeue(self, batch):
+        """Devolve um lote que falhou à frente da fila, sem passar de maxlen."""
+        free = self._pending.maxlen - len(self._pending)
+        if free < len(batch):
+            # o lote é mais antigo que a fila: descarta o começo dele, como o deque faria
+            self.dropped += len(batch) - free
+            batch = batch[len(batch) - free:] if free > 0 else []
+        self._pending.extendleft(reversed(batch))
+
+    def _send_pending(self, final=False):
+        """Manda a fila em lotes; final=True (ao fechar) ignora o pedido de parada."""
+        while self._pending and (final or not self._stop.is_set()):
+            batch = []
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._pending.popleft())
+            except IndexError:
+                pass
+            try:
+                self._sock.sendall(encode_frame({"type": "samples", "rows": batch}))
+            except OSError:
+                self._requeue(batch)
+                raise
+            self.sent += len(batch)
+
+    def _run(self):
+        backoff = self.min_backoff
+        try:
+            while not self._stop.is_set():
+                if self._sock is None:
+                    try:
+                        self._sock = self._connect()
+                        self.connected = True
+                    except OSError:
+                        self._stop.wait(backoff)
+                        backoff = min(self.max_backoff, backoff * 2.0)
+                        continue
+                try:
+                    self._send_pending()
+                except OSError:
+                    # coletor que aceita e derruba a conexão: mesmo back-off da conexão
+                    self._close()
+                    self._stop.wait(backoff)
+                    backoff = min(self.max_backoff, backoff * 2.0)
+                    continue
+                backoff = self.min_backoff
+                self._stop.wait(self.batch_interval)
+            # tentativa final de esvaziar ao fechar o app
+            if self._sock is not None:
+                try:
+                    self._send_pending(final=True)
+                except OSError:
+                    pass
+        finally:
+            self._close()
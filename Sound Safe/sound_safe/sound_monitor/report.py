@@ -0,0 +1,213 @@
+# report.py
+#
+# Relatório consolidado em lote, sem a janela:
+#   python -m sound_monitor.report <pasta> [-o consolidado.xlsx] [--jobs N]
+# Varre a pasta atrás de diários de exposição (journal-AAAA-MM-DD.bin) e de
+# relatórios exportados (relatorio_som_*.xlsx). Cada arquivo é resumido num
+# processo do pool (ExposureStats por sessão e por dia, o mesmo resumo do
+# botão do app) e só os resumos voltam ao processo principal, que os junta
+# por usuário/dia em ordem cronológica. O usuário é a primeira pasta abaixo
+# da raiz (<pasta>/<usuário>/.../arquivo); arquivos soltos na raiz ficam
+# sem usuário.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from .journal import iter_segment
+from .stats import ExposureStats
+
+JOURNAL_GLOB = "journal-*.bin"
+XLSX_GLOB = "relatorio_som_*.xlsx"
+NO_USER = "(sem usuário)"
+
+
+def discover(root, user_level=1):
+    """[(caminho, usuário)] ordenado; usuário = componente `user_level` do caminho relativo."""
+    root = Path(root)
+    out = []
+    for pattern in (JOURNAL_GLOB, XLSX_GLOB):
+        for p in root.rglob(pattern):
+            rel = p.relative_to(root).parts
+            user = rel[user_level - 1] if user_level > 0 and len(rel) > user_level else NO_USER
+            out.append((str(p), user))
+    out.sort()
+    return out
+
+
+# ---------- Resumo de um arquivo (roda nos processos do pool) ----------
+class _DayPart:
+    """Acumulador de uma sessão num dia: estatísticas + maior dose diária vista."""
+
+    __slots__ = ("stats", "start_ts", "daily_dose")
+
+    def __init__(self, start_ts):
+        self.stats = ExposureStats()
+        self.start_ts = start_ts
+        self.daily_dose = 0.0
+
+    def add(self, t_session, L, vol, dose, daily):
+        self.stats.add(t_session, L, vol, dose)
+        if daily > self.daily_dose:
+            self.daily_dose = daily
+
+
+def _day_of(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def _journal_rows(path):
+    """(ts, chave da sessão, t_sessão, L, volume, dose, dose diária) de um segmento."""
+    for r in iter_segment(path):
+        yield r.ts, r.session_start_ts, r.t_session, r.L, r.vol_percent, r.session_dose, r.daily_dose
+
+
+def _xlsx_rows(path):
+    """Mesmas tuplas a partir da aba "Relatório" de um relatorio_som_*.xlsx (importer, em blocos)."""
+    from .importer import iter_report_chunks
+    for cols in iter_report_chunks(path):
+        for ts, t_session, _mode, vol, L, dose, _zone, daily in zip(*cols):
+            yield ts, path, t_session, L, vol, dose, daily
+
+
+def summarize_file(task):
+    """
+    task = (caminho, usuário) -> {"file", "user", "parts": [...], "error"}.
+    Uma parte por (sessão, dia): uma sessão que passa da meia-noite vira duas.
+    """
+    path, user = task
+    rows = _xlsx_rows(path) if path.lower().endswith(".xlsx") else _journal_rows(path)
+    parts = {}
+    try:
+        for ts, session, t_session, L, vol, dose, daily in rows:
+            key = (session, _day_of(ts))
+            part = parts.get(key)
+            if part is None:
+                part = parts[key] = _DayPart(ts)
+            part.add(t_session, L, vol, dose, daily)
+    except Exception as e:
+        return {"file": path, "user": user, "parts": [], "error": f"{type(e).__name__}: {e}"}
+    return {
+        "file": path,
+        "user": user,
+        "parts": [
+            {"day": day, "start_ts": p.start_ts, "daily_dose": p.daily_dose, "stats": p.stats.to_dict()}
+            for (_session, day), p in parts.items()
+        ],
+        "error": None,
+    }
+
+
+# ---------- Consolidação (processo principal) ----------
+def consolidate(results):
+    """
+    Junta as partes por (usuário, dia) em ordem de início (o resultado não
+    depende da ordem em que o pool devolveu os arquivos).
+    -> (linhas por usuário/dia, linhas por usuário, erros)
+    """
+    grouped = {}
+    errors = []
+    for res in results:
+        if res["error"] is not None:
+            errors.append((res["file"], res["error"]))
+            continue
+        for part in res["parts"]:
+            grouped.setdefault((res["user"], part["day"]), []).append((part["start_ts"], res["file"], part))
+
+    day_rows = []
+    per_user = {}
+    for (user, day) in sorted(grouped):
+        items = sorted(grouped[(user, day)], key=lambda it: (it[0], it[1]))
+        stats = ExposureStats()
+        for _start, _file, part in items:
+            stats = stats.merge(ExposureStats.from_dict(part["stats"]))
+        row = {
+            "user": user,
+            "day": day,
+            "files": len({f for _s, f, _p in items}),
+            "sessions": len(items),
+            "daily_dose": max(p["daily_dose"] for _s, _f, p in items),
+            "stats": stats,
+        }
+        day_rows.append(row)
+        per_user.setdefault(user, []).append(row)
+
+    user_rows = []
+    for user in sorted(per_user):
+        rows = per_user[user]
+        stats = ExposureStats()
+        for r in rows:
+            stats = stats.merge(r["stats"])
+        user_rows.append({
+            "user": user,
+            "days": len(rows),
+            "sessions": sum(r["sessions"] for r in rows),
+            "max_daily_dose": max(r["daily_dose"] for r in rows),
+            "days_over_100": sum(1 for r in rows if r["daily_dose"] >= 1.0),
+            "stats": stats,
+        })
+    return day_rows, user_rows, errors
+
+
+def run(tasks, jobs=None, progress=None):
+    """Resumo de todos os arquivos; jobs=1 roda no próprio processo."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(tasks) <= 1:
+        results = []
+        for i, t in enumerate(tasks, start=1):
+            results.append(summarize_file(t))
+            if progress is not None:
+                progress(i, len(tasks))
+        return results
+    # lotes de arquivos por mensagem: milhares de arquivos pequenos não viram milhares de idas e voltas
+    chunk = max(1, min(64, len(tasks) // (jobs * 8)))
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for i, res in enumerate(pool.map(summarize_file, tasks, chunksize=chunk), start=1):
+            results.append(res)
+            if progress is not None:
+                progress(i, len(tasks))
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m sound_monitor.report",
+                                 description="Relatório consolidado por usuário/dia a partir de diários e relatórios.")
+    ap.add_argument("root", help="pasta com journal-*.bin e/ou relatorio_som_*.xlsx (subpastas = usuários)")
+    ap.add_argument("-o", "--output", default=None, help="padrão: consolidado_AAAAMMDD_HHMMSS.xlsx")
+    ap.add_argument("--jobs", type=int, default=None, help="processos (padrão: núcleos da máquina)")
+    ap.add_argument("--user-level", type=int, default=1,
+                    help="nível da pasta que identifica o usuário (0 = não separar)")
+    args = ap.parse_args(argv)
+
+    from .excel_export import write_consolidated_report
+    tasks = discover(args.root, args.user_level)
+    if not tasks:
+        print("Nenhum journal-*.bin ou relatorio_som_*.xlsx encontrado.")
+        return 1
+    output = args.output or f"consolidado_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+    t0 = time.perf_counter()
+    step = max(1, len(tasks) // 20)
+
+    def _progress(done, total):
+        if done % step == 0 or done == total:
+            print(f"\r{done}/{total} arquivos", end="", file=sys.stderr, flush=True)
+
+    results = run(tasks, args.jobs, _progress)
+    print(file=sys.stderr)
+    day_rows, user_rows, errors = consolidate(results)
+    write_consolidated_report(output, day_rows, user_rows, errors)
+    print(f"{len(tasks)} arquivos, {len(user_rows)} usuários, {len(day_rows)} dias "
+          f"em {time.perf_counter() - t0:.1f} s -> {output}")
+    for path, err in errors:
+        print(f"  erro em {path}: {err}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
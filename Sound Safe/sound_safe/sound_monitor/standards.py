@@ -0,0 +1,119 @@
+# standards.py
+#
+# Dose em várias normas ao mesmo tempo. Além do perfil ativo (cfg, com a
+# curva do dispositivo), o motor acumula sessão e dia em cada norma de
+# STANDARDS. Como o nível é constante entre mudanças de volume, as taxas
+# (dose/s) de todas as normas são calculadas uma vez por nível e cada tick
+# é um único passo sobre o vetor: dose_k += dt * taxa_k. Trocar de perfil
+# para uma norma da lista só copia o valor já acumulado – nada se perde.
+
+from collections import namedtuple
+
+Standard = namedtuple("Standard", ["key", "name", "ref_db", "exchange_rate_db", "base_time_sec"])
+
+STANDARDS = (
+    Standard("niosh", "NIOSH", 85.0, 3.0, 8 * 3600.0),
+    Standard("oms", "OMS", 80.0, 3.0, 8 * 3600.0),
+    Standard("osha", "OSHA", 90.0, 5.0, 8 * 3600.0),
+)
+
+SESSION_CAP = 1.0     # mesmos tetos do DoseEngine
+DAILY_CAP = 10.0
+
+
+def index_for_cfg(cfg, standards=STANDARDS, tol_db=0.05):
+    """Índice da norma com o mesmo ref/troca/base do cfg; None = perfil personalizado."""
+    ref = float(cfg["ref_db"])
+    er = float(cfg.get("exchange_rate_db", 3.0))
+    base = float(cfg.get("base_time_sec", 8 * 3600.0))
+    for i, s in enumerate(standards):
+        if abs(s.ref_db - ref) < tol_db and abs(s.exchange_rate_db - er) < tol_db and abs(s.base_time_sec - base) < 1.0:
+            return i
+    return None
+
+
+class StandardDoses:
+    """
+    Doses (sessão e dia) em cada norma. hold(L) fixa o nível vigente (None =
+    pausado); integrate(dt) soma o trecho em todas as normas. As taxas usam
+    a mesma fórmula de helpers.allowed_time_seconds_for_level (mínimo 1 s).
+    """
+
+    def __init__(self, standards=STANDARDS):
+        self.standards = tuple(standards)
+        n = len(self.standards)
+        self._refs = tuple(s.ref_db for s in self.standards)
+        self._ers = tuple(max(0.1, s.exchange_rate_db) for s in self.standards)
+        self._bases = tuple(s.base_time_sec for s in self.standards)
+        self._keys = tuple(s.key for s in self.standards)
+        self._names = tuple(s.name for s in self.standards)
+        self.session = [0.0] * n
+        self.daily = [0.0] * n
+        self._held_L = None
+        self._rates = None
+
+    def rates_for(self, L):
+        """dose/s de cada norma no nível L."""
+        return tuple(1.0 / max(1.0, base * (2 ** (-(L - ref) / er)))
+                     for ref, er, base in zip(self._refs, self._ers, self._bases))
+
+    def hold(self, L):
+        if L is None:
+            self._held_L = None
+            self._rates = None
+        elif L != self._held_L:
+            self._held_L = L
+            self._rates = self.rates_for(L)
+
+    def integrate(self, dt):
+        rates = self._rates
+        if rates is None or dt <= 0.0:
+            return
+        session, daily = self.session, self.daily
+        for i, r in enumerate(rates):
+            inc = dt * r
+            s = session[i] + inc
+            d = daily[i] + inc
+            session[i] = s if s < SESSION_CAP else SESSION_CAP
+            daily[i] = d if d < DAILY_CAP else DAILY_CAP
+
+    def reset_session(self):
+        self.session = [0.0] * len(self.standards)
+
+    def new_day(self):
+        self.session = [0.0] * len(self.standards)
+        self.daily = [0.0] * len(self.standards)
+
+    def restore(self, session=None, daily=None):
+        if session is not None:
+            self.session = [min(SESSION_CAP, float(v)) for v in session]
+        if daily is not None:
+            self.daily = [min(DAILY_CAP, float(v)) for v in daily]
+
+    def replay(self, samples, session_start_ts=None):
+        """
+        Reconstrói as doses a partir do diário de hoje: samples = (ts,
+        session_start_ts, L, dose diária do perfil ativo) em ordem. Um trecho
+        entre dois registros só conta se a dose do perfil ativo subiu nele
+        (pausa, app fechado e suspensão não contam).
+        """
+        self.new_day()
+        prev = None
+        for ts, session_ts, L, daily in samples:
+            if prev is not None and daily > prev[3]:
+                dt = ts - prev[0]
+                for i, r in enumerate(self.rates_for(prev[2])):
+                    inc = dt * r
+                    self.daily[i] = min(DAILY_CAP, self.daily[i] + inc)
+                    if session_start_ts is not None and prev[1] == session_start_ts:
+                        self.session[i] = min(SESSION_CAP, self.session[i] + inc)
+            prev = (ts, session_ts, L, daily)
+
+    def snapshot(self):
+        """((chave, nome, dose sessão, dose diária), ...) na ordem de STANDARDS."""
+        return tuple(zip(self._keys, self._names, self.session, self.daily))
+
+
+def format_standards(doses):
+    """Linha curta para a UI: "NIOSH 42% · OMS 133% · OSHA 9%" (dose diária)."""
+    return " · ".join(f"{name} {daily * 100.0:.0f}%" for _key, name, _session, daily in doses)
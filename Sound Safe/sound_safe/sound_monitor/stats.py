@@ -0,0 +1,134 @@
+# stats.py
+
+import math
+import threading
+
+from .levels import LevelHistogram, STAT_LEVELS
+
+
+class ExposureStats:
+    """
+    Estatísticas da sessão mantidas de forma incremental (O(1) por amostra).
+    Cada amostra vale até a próxima (ponderação por tempo, como no relatório).
+    - avg_db: média aritmética ponderada por tempo;
+    - leq_db: nível equivalente por energia, 10*log10(média de 10^(L/10));
+    - l10/l50/l90_db e tempo por faixa: histograma de níveis (levels.py).
+    Instâncias podem ser somadas (sessões/dias) com merge().
+    """
+
+    _FIELDS = ("points", "total_time_s", "weighted_sum_L", "energy_sum",
+               "peak_db", "peak_vol", "max_dose", "t_to_50", "t_to_100")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.points = 0
+            self.total_time_s = 0.0
+            self.weighted_sum_L = 0.0
+            self.energy_sum = 0.0          # Σ 10^(L/10) · dt
+            self.peak_db = float("-inf")
+            self.peak_vol = float("-inf")
+            self.max_dose = 0.0
+            self.t_to_50 = None
+            self.t_to_100 = None
+            self._prev_t = None
+            self._prev_L = None
+            self.levels = LevelHistogram()
+
+    def add(self, t_session, L, vol_percent, dose):
+        with self._lock:
+            if self._prev_t is not None:
+                dt = max(0.0, t_session - self._prev_t)
+                self.total_time_s += dt
+                self.weighted_sum_L += self._prev_L * dt
+                self.energy_sum += 10.0 ** (self._prev_L / 10.0) * dt
+                self.levels.add(self._prev_L, dt)
+            self._prev_t = t_session
+            self._prev_L = L
+            self.points += 1
+            if L > self.peak_db: self.peak_db = L
+            if vol_percent > self.peak_vol: self.peak_vol = vol_percent
+            if dose > self.max_dose: self.max_dose = dose
+            if self.t_to_50 is None and dose >= 0.5: self.t_to_50 = t_session
+            if self.t_to_100 is None and dose >= 1.0: self.t_to_100 = t_session
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: iterável de (t_session, L, vol_percent, dose)."""
+        st = cls()
+        for t_session, L, vol, dose in rows:
+            st.add(t_session, L, vol, dose)
+        return st
+
+    def merge(self, other):
+        """
+        Nova instância = self seguida de other (sessões/dias consecutivos).
+        Tempos de cruzamento de other são deslocados pelo tempo total de self.
+        """
+        out = ExposureStats()
+        with self._lock:
+            a = {k: getattr(self, k) for k in self._FIELDS}
+            a_levels = self.levels
+        with other._lock:
+            b = {k: getattr(other, k) for k in self._FIELDS}
+            b_levels = other.levels
+        out.levels = a_levels.merge(b_levels)
+        out.points = a["points"] + b["points"]
+        out.total_time_s = a["total_time_s"] + b["total_time_s"]
+        out.weighted_sum_L = a["weighted_sum_L"] + b["weighted_sum_L"]
+        out.energy_sum = a["energy_sum"] + b["energy_sum"]
+        out.peak_db = max(a["peak_db"], b["peak_db"])
+        out.peak_vol = max(a["peak_vol"], b["peak_vol"])
+        out.max_dose = max(a["max_dose"], b["max_dose"])
+        for k in ("t_to_50", "t_to_100"):
+            if a[k] is not None:
+                setattr(out, k, a[k])
+            elif b[k] is not None:
+                setattr(out, k, a["total_time_s"] + b[k])
+        return out
+
+    def to_dict(self):
+        with self._lock:
+            d = {k: getattr(self, k) for k in self._FIELDS}
+            d["levels"] = self.levels.to_dict()
+            return d
+
+    @classmethod
+    def from_dict(cls, data):
+        st = cls()
+        for k in cls._FIELDS:
+            if k in data:
+                setattr(st, k, data[k])
+        if data.get("levels"):
+            st.levels = LevelHistogram.from_dict(data["levels"])
+        return st
+
+    def snapshot(self):
+        """Resumo em O(1) (percentis/faixas em O(classes)) – mesmas chaves usadas pelo relatório."""
+        with self._lock:
+            T = self.total_time_s
+            avg_db = (self.weighted_sum_L / T) if T > 0 else 0.0
+            leq_db = 10.0 * math.log10(self.energy_sum / T) if T > 0 and self.energy_sum > 0 else 0.0
+            levels = self.levels
+            snap = {
+                "points": self.points,
+                "total_time_s": T,
+                "total_time_days": T / 86400.0,
+                "avg_db": avg_db,
+                "leq_db": leq_db,
+                "peak_db": self.peak_db if self.peak_db != float("-inf") else 0.0,
+                "peak_vol": self.peak_vol if self.peak_vol != float("-inf") else 0.0,
+                "max_dose": self.max_dose,
+                "t_to_50_s": self.t_to_50,
+                "t_to_100_s": self.t_to_100,
+                "t_to_50_days": (self.t_to_50 / 86400.0) if self.t_to_50 is not None else 0.0,
+                "t_to_100_days": (self.t_to_100 / 86400.0) if self.t_to_100 is not None else 0.0,
+            }
+        # percentis e faixas: O(classes), fora do lock das estatísticas (o histograma tem o seu)
+        for n in STAT_LEVELS:
+            snap[f"l{n}_db"] = levels.exceeded(n) or 0.0
+        snap["bands"] = levels.bands()
+        return snap
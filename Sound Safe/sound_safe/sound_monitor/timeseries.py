@@ -0,0 +1,288 @@
+# timeseries.py
+#
+# Série temporal de longo prazo em SQLite (stdlib): amostras brutas de 1 s
+# por uma janela de retenção + agregados de 1 min, 1 h e 1 dia (hora local).
+# Cada agregado guarda somas (segundos, energia, dose, tempo por zona, tempo
+# acima do ref_db), então consultas semanais/mensais leem poucas linhas.
+
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .helpers import ZONE_CODES, MODE_CODES
+
+RES_MINUTE = 60
+RES_HOUR = 3600
+RES_DAY = 86400
+RESOLUTIONS = (RES_MINUTE, RES_HOUR, RES_DAY)
+
+# Colunas somáveis de cada agregado (max_L é tratado à parte)
+_SUM_FIELDS = ("seconds", "energy", "sum_L", "dose", "t_safe", "t_warn", "t_danger", "t_over_ref")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (
+    ts REAL PRIMARY KEY,
+    t_session REAL, mode INTEGER, vol REAL, L REAL,
+    dose REAL, zone INTEGER, daily REAL
+);
+CREATE TABLE IF NOT EXISTS rollup (
+    res INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    start_ts REAL NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    energy REAL NOT NULL DEFAULT 0,
+    sum_L REAL NOT NULL DEFAULT 0,
+    max_L REAL,
+    dose REAL NOT NULL DEFAULT 0,
+    t_safe REAL NOT NULL DEFAULT 0,
+    t_warn REAL NOT NULL DEFAULT 0,
+    t_danger REAL NOT NULL DEFAULT 0,
+    t_over_ref REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (res, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT = (
+    "INSERT INTO rollup (res, bucket, start_ts, " + ", ".join(_SUM_FIELDS) + ", max_L) "
+    "VALUES (?, ?, ?, " + ", ".join("?" for _ in _SUM_FIELDS) + ", ?) "
+    "ON CONFLICT(res, bucket) DO UPDATE SET "
+    + ", ".join(f"{f} = {f} + excluded.{f}" for f in _SUM_FIELDS)
+    + ", max_L = max(coalesce(max_L, excluded.max_L), excluded.max_L)"
+)
+
+
+def default_db_path():
+    return Path.home() / ".tcc_sound_monitor" / "timeseries.sqlite3"
+
+
+def _local_offset(ts):
+    return time.localtime(ts).tm_gmtoff
+
+
+def bucket_of(ts, res):
+    """Índice do agregado (alinhado à hora local: dias começam à meia-noite)."""
+    return int((ts + _local_offset(ts)) // res)
+
+
+def _bucket_start(bucket, res, hint_ts):
+    return bucket * res - _local_offset(hint_ts)
+
+
+def _leq(energy, seconds):
+    return 10.0 * math.log10(energy / seconds) if seconds > 0 and energy > 0 else 0.0
+
+
+class TimeSeriesStore:
+    """
+    add() recebe a mesma amostra do histórico (~1x/s, thread do monitor).
+    Cada amostra vale até a próxima (como em ExposureStats); intervalos
+    maiores que max_dt_sec (pausa/suspensão) não somam tempo. As escritas são
+    agrupadas em memória e gravadas numa transação a cada flush_interval_sec.
+    """
+
+    def __init__(self, path=None, cfg=None, raw_retention_days=7, minute_retention_days=90,
+                 flush_interval_sec=10.0, max_dt_sec=5.0):
+        self.path = Path(path) if path is not None else default_db_path()
+        self.cfg = cfg
+        self.raw_retention_days = raw_retention_days
+        self.minute_retention_days = minute_retention_days
+        self.flush_interval_sec = float(flush_interval_sec)
+        self.max_dt_sec = float(max_dt_sec)
+        self._lock = threading.Lock()
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._raw_buf = []
+        self._roll_buf = {}
+        self._prev = None
+        self._last_flush_ts = None
+        self._last_prune_ts = 0.0
+
+    # ---------- Escrita ----------
+    def add(self, ts, t_session, mode, vol_percent, L, dose, zone, daily):
+        if isinstance(mode, str):
+            mode = MODE_CODES.get(mode, 0)
+        if isinstance(zone, str):
+            zone = ZONE_CODES.get(zone, 0)
+        with self._lock:
+            self._raw_buf.append((ts, t_session, mode, vol_percent, L, dose, zone, daily))
+            prev = self._prev
+            self._prev = (ts, L, zone, daily)
+            if prev is not None:
+                p_ts, p_L, p_zone, p_daily = prev
+                dt = ts - p_ts
+                if dt < 0:
+                    dt = 0.0
+                elif dt > self.max_dt_sec:
+                    dt = 0.0
+                # dose diária é cumulativa; na virada de dia recomeça do zero
+                dose_inc = daily - p_daily if daily >= p_daily else daily
+                ref_db = float(self.cfg["ref_db"]) if self.cfg is not None else float("inf")
+                self._accumulate(p_ts, dt, p_L, p_zone, dose_inc, ref_db)
+            if self._last_flush_ts is None:
+                self._last_flush_ts = ts
+            if ts - self._last_flush_ts >= self.flush_interval_sec:
+                self._flush_locked()
+                self._last_flush_ts = ts
+                if ts - self._last_prune_ts >= 3600.0:
+                    self._last_prune_ts = ts
+                    self._prune_locked(ts)
+
+    def _accumulate(self, ts, dt, L, zone, dose_inc, ref_db):
+        energy = 10.0 ** (L / 10.0) * dt
+        zone_t = [0.0, 0.0, 0.0]
+        zone_t[zone] = dt
+        over = dt if L > ref_db else 0.0
+        for res in RESOLUTIONS:
+            key = (res, bucket_of(ts, res))
+            acc = self._roll_buf.get(key)
+            if acc is None:
+                acc = self._roll_buf[key] = [ts, 0.0, 0.0, 0.0, None, 0.0, 0.0, 0.0, 0.0, 0.0]
+            acc[1] += dt
+            acc[2] += energy
+            acc[3] += L * dt
+            acc[4] = L if acc[4] is None else max(acc[4], L)
+            acc[5] += dose_inc
+            acc[6] += zone_t[0]
+            acc[7] += zone_t[1]
+            acc[8] += zone_t[2]
+            acc[9] += over
+
+    def _flush_locked(self):
+        if not self._raw_buf and not self._roll_buf:
+            return
+        rolls = []
+        for (res, bucket), a in self._roll_buf.items():
+            start = _bucket_start(bucket, res, a[0])
+            # seconds, energy, sum_L, dose, t_safe, t_warn, t_danger, t_over_ref, max_L
+            rolls.append((res, bucket, start, a[1], a[2], a[3], a[5], a[6], a[7], a[8], a[9], a[4]))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO raw VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._raw_buf)
+            self._db.executemany(_UPSERT, rolls)
+        self._raw_buf = []
+        self._roll_buf = {}
+
+    def _prune_locked(self, now):
+        with self._db:
+            if self.raw_retention_days is not None:
+                self._db.execute("DELETE FROM raw WHERE ts < ?", (now - self.raw_retention_days * 86400.0,))
+            if self.minute_retention_days is not None:
+                self._db.execute("DELETE FROM rollup WHERE res = ? AND start_ts < ?",
+                                 (RES_MINUTE, now - self.minute_retention_days * 86400.0))
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def break_series(self):
+        """A próxima amostra não soma tempo desde a anterior (reset de sessão / pausa longa)."""
+        with self._lock:
+            self._prev = None
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_locked()
+            finally:
+                self._db.close()
+
+    # ---------- Consultas ----------
+    def iter_raw(self, ts_min, ts_max=None):
+        """Amostras brutas em ordem (mesma ordem de colunas do HistoryStore)."""
+        with self._lock:
+            self._flush_locked()
+            if ts_max is None:
+                rows = self._db.execute("SELECT * FROM raw WHERE ts >= ? ORDER BY ts", (ts_min,)).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM raw WHERE ts >= ? AND ts <= ? ORDER BY ts",
+                                        (ts_min, ts_max)).fetchall()
+        return iter(rows)
+
+    def _sum_range(self, res, b0, b1):
+        """Soma os agregados de resolução `res` com b0 <= bucket < b1."""
+        if b1 <= b0:
+            return None
+        cols = ", ".join(f"total({f})" for f in _SUM_FIELDS)
+        return self._db.execute(
+            f"SELECT {cols}, max(max_L) FROM rollup WHERE res = ? AND bucket >= ? AND bucket < ?",
+            (res, b0, b1)).fetchone()
+
+    def summary(self, start_ts, end_ts):
+        """
+        Agregado de [start_ts, end_ts) com resolução de 1 min: pontas em
+        minutos, depois horas e o miolo em dias (poucas linhas lidas).
+        """
+        with self._lock:
+            self._flush_locked()
+            m0 = bucket_of(start_ts, RES_MINUTE)
+            m1 = bucket_of(end_ts, RES_MINUTE)
+            h0 = -(-m0 // 60); h1 = m1 // 60
+            parts = []
+            if h0 >= h1:
+                parts.append((RES_MINUTE, m0, m1))
+            else:
+                d0 = -(-h0 // 24); d1 = h1 // 24
+                parts.append((RES_MINUTE, m0, h0 * 60))
+                if d0 >= d1:
+                    parts.append((RES_HOUR, h0, h1))
+                else:
+                    parts.append((RES_HOUR, h0, d0 * 24))
+                    parts.append((RES_DAY, d0, d1))
+                    parts.append((RES_HOUR, d1 * 24, h1))
+                parts.append((RES_MINUTE, h1 * 60, m1))
+            totals = [0.0] * len(_SUM_FIELDS)
+            max_L = None
+            for res, b0, b1 in parts:
+                row = self._sum_range(res, b0, b1)
+                if row is None:
+                    continue
+                for i in range(len(_SUM_FIELDS)):
+                    totals[i] += row[i]
+                if row[-1] is not None:
+                    max_L = row[-1] if max_L is None else max(max_L, row[-1])
+        out = dict(zip(_SUM_FIELDS, totals))
+        seconds = out["seconds"]
+        out["max_L"] = max_L
+        out["avg_db"] = out["sum_L"] / seconds if seconds > 0 else 0.0
+        out["leq_db"] = _leq(out["energy"], seconds)
+        return out
+
+    def daily_rows(self, days=7, now=None):
+        """Um dict por dia (hora local) dos últimos `days` dias, mais antigo primeiro."""
+        now = time.time() if now is None else float(now)
+        today = bucket_of(now, RES_DAY)
+        with self._lock:
+            self._flush_locked()
+            rows = self._db.execute(
+                "SELECT bucket, start_ts, " + ", ".join(_SUM_FIELDS) + ", max_L FROM rollup "
+                "WHERE res = ? AND bucket > ? AND bucket <= ? ORDER BY bucket",
+                (RES_DAY, today - days, today)).fetchall()
+        out = []
+        for row in rows:
+            d = dict(zip(_SUM_FIELDS, row[2:-1]))
+            d["date"] = datetime.fromtimestamp(row[1] + 1.0).strftime("%Y-%m-%d")
+            d["max_L"] = row[-1]
+            d["leq_db"] = _leq(d["energy"], d["seconds"])
+            out.append(d)
+        return out
+
+    def weekly_dose(self, now=None):
+        """Dose somada dos últimos 7 dias (1.0 = um dia no limite) e média diária."""
+        days = self.daily_rows(7, now)
+        total = sum(d["dose"] for d in days)
+        return {"total_dose": total, "mean_daily_dose": total / 7.0, "days": days}
+
+    def time_over_ref(self, start_ts, end_ts):
+        return self.summary(start_ts, end_ts)["t_over_ref"]
+
+    def last_days_start(self, days, now=None):
+        """Epoch da meia-noite local de `days` dias atrás (para summary())."""
+        now = time.time() if now is None else float(now)
+        d = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (d - timedelta(days=days - 1)).timestamp()
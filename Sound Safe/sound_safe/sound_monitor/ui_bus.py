@@ -0,0 +1,65 @@
+# ui_bus.py
+#
+# Canal monitor -> UI por "último valor vence": o monitor publica snapshots
+# imutáveis por chave e a UI aplica só o mais recente, uma vez por frame.
+
+import threading
+from collections import namedtuple
+
+# Snapshot dos widgets alimentados pelo motor (um por amostra)
+UiState = namedtuple("UiState", [
+    "L", "session_dose",
+    "zone", "zone_color",
+    "time_text", "remaining_text",
+    "period_text", "period_fg",
+    "standards_text",
+], defaults=(None,))
+
+_MISSING = object()
+
+
+class StateChannel:
+    """Slot por chave; publish() sobrescreve, drain() entrega e esvazia."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def publish(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+
+    def drain(self):
+        with self._lock:
+            if not self._pending:
+                return None
+            pending = self._pending
+            self._pending = {}
+            return pending
+
+
+class WidgetCache:
+    """Evita chamadas Tcl redundantes: só reconfigura o que mudou."""
+
+    def __init__(self):
+        self._last = {}
+
+    def configure(self, widget, **options):
+        wid = id(widget)
+        changed = {k: v for k, v in options.items() if self._last.get((wid, k), _MISSING) != v}
+        if changed:
+            widget.configure(**changed)
+            for k, v in changed.items():
+                self._last[(wid, k)] = v
+        return bool(changed)
+
+    def call(self, key, args, fn):
+        """Chama fn(*args) só se args mudou desde a última chamada com essa chave."""
+        if self._last.get(key, _MISSING) != args:
+            fn(*args)
+            self._last[key] = args
+            return True
+        return False
+
+    def invalidate(self):
+        self._last.clear()
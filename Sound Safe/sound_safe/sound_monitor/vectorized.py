@@ -0,0 +1,91 @@
+# vectorized.py
+#
+# Versões em lote (NumPy) das funções de helpers.py. Mesmas operações de
+# ponto flutuante, na mesma ordem, para bater bit a bit com as escalares.
+
+from .numpy_support import _NUMPY_AVAILABLE, np
+from .helpers import ZONES
+
+
+def _require_numpy():
+    if not _NUMPY_AVAILABLE:
+        raise RuntimeError("Para cálculos em lote: pip install numpy")
+
+
+def map_percent_to_db_array(vol_percent, cfg):
+    _require_numpy()
+    min_db = cfg["min_db"]; max_db = cfg["max_db"]
+    v = np.clip(np.asarray(vol_percent, dtype=np.float64), 0.0, 100.0)
+    return min_db + (max_db - min_db) * (v / 100.0)
+
+
+def _pow2_exact(x):
+    """
+    2 ** x idêntico ao do Python (pow da libm). np.power usa outra implementação
+    (SIMD) que diverge no último bit; como o histórico tem poucos níveis
+    distintos (volume quantizado), calcula só nos valores únicos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    uniq, inverse = np.unique(x, return_inverse=True)
+    vals = np.fromiter((2 ** u for u in uniq.tolist()), dtype=np.float64, count=uniq.size)
+    return vals[inverse].reshape(x.shape)
+
+
+def allowed_time_seconds_for_level_array(L, cfg):
+    _require_numpy()
+    base_8h = float(cfg["base_time_sec"])
+    ref = float(cfg["ref_db"])
+    er = max(0.1, float(cfg.get("exchange_rate_db", 3.0)))
+    diff = np.asarray(L, dtype=np.float64) - ref
+    allowed = base_8h * _pow2_exact(-diff / er)
+    return np.maximum(allowed, 1.0)
+
+
+def dose_increment_per_second_array(L, cfg):
+    return 1.0 / allowed_time_seconds_for_level_array(L, cfg)
+
+
+def cumulative_dose(L, dt, cfg, start=0.0, cap=1.0):
+    """
+    Dose acumulada amostra a amostra (cumsum de dose/s * dt), equivalente ao
+    laço escalar `dose = min(cap, dose + inc)`. cap=None desliga o teto.
+    """
+    inc = np.asarray(dt, dtype=np.float64) * dose_increment_per_second_array(L, cfg)
+    # o valor inicial entra no próprio cumsum para manter a ordem das somas
+    acc = np.cumsum(np.concatenate((np.array([float(start)]), np.ravel(inc))))[1:]
+    if cap is not None:
+        np.minimum(acc, cap, out=acc)
+    return acc
+
+
+def dt_from_timestamps(t, first_dt=0.0):
+    """dt por amostra a partir de tempos absolutos (a 1ª recebe first_dt)."""
+    _require_numpy()
+    t = np.asarray(t, dtype=np.float64)
+    dt = np.empty_like(t)
+    if t.size:
+        dt[0] = first_dt
+        np.subtract(t[1:], t[:-1], out=dt[1:])
+        np.maximum(dt, 0.0, out=dt)
+    return dt
+
+
+def risk_zone_codes_from_dose(dose):
+    """Códigos de zona (índices de helpers.ZONES) a partir da dose 0..1."""
+    _require_numpy()
+    pct = np.asarray(dose, dtype=np.float64) * 100.0
+    return (pct >= 50.0).astype(np.int8) + (pct >= 100.0).astype(np.int8)
+
+
+def risk_zone_codes_from_level(L, cfg):
+    _require_numpy()
+    safe_cut = float(cfg["ref_db"]) - 15.0
+    warn_cut = float(cfg["ref_db"])
+    L = np.asarray(L, dtype=np.float64)
+    return (L >= safe_cut).astype(np.int8) + (L >= warn_cut).astype(np.int8)
+
+
+def zone_names(codes):
+    """Converte códigos de zona de volta para os nomes de helpers.ZONES."""
+    _require_numpy()
+    return np.asarray(ZONES, dtype=object)[np.asarray(codes, dtype=np.intp)]
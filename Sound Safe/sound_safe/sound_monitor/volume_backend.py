@@ -0,0 +1,401 @@
+# volume_backend.py
+#
+# Backends de volume do sistema com notificação de mudança. Quem consome
+# (trava, teto do Dinâmico, sync do slider) só reage a eventos:
+# - PycawBackend: callback do Windows (IAudioEndpointVolumeCallback);
+#   se o registro falhar, cai para polling adaptativo;
+# - PollingBackend: lê periodicamente, rápido logo após uma mudança e
+#   espaçando (back-off) enquanto o volume fica parado;
+# - MixerBackend: Linux via pactl (PulseAudio/PipeWire) ou amixer (ALSA);
+# - MemoryBackend: volume em memória, para testes sem áudio.
+# Só o backend escolhido importa suas dependências (comtypes/pycaw etc.).
+
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+from queue import Queue, Empty
+
+from .audio_support import (
+    _PYCAW_AVAILABLE,
+    load_pycaw,
+    com_initialize,
+    com_uninitialize,
+)
+
+
+class VolumeBackend:
+    """
+    Interface: get_percent(), set_percent(pct), start()/stop() e
+    add_listener(cb) – cb(pct) é chamado (na thread do backend) quando o
+    volume do sistema muda, inclusive por outros programas.
+    """
+
+    name = "nenhum"
+    available = False
+    supports_events = False
+
+    def __init__(self):
+        self._listeners = []
+        self.urgent = False
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify(self, pct):
+        for cb in list(self._listeners):
+            try:
+                cb(pct)
+            except Exception as e:
+                print("Erro no listener de volume:", e)
+
+    def set_urgent(self, urgent):
+        """Dica de latência (ex.: volume travado). Só afeta backends por polling."""
+        self.urgent = bool(urgent)
+
+    def instrument(self, diag):
+        """Cronometra as chamadas ao SO (diagnostics.Diagnostics)."""
+        diag.instrument(self, "get_percent", "backend.get")
+        diag.instrument(self, "set_percent", "backend.set")
+
+    def get_percent(self):
+        raise RuntimeError("Sem backend de áudio")
+
+    def set_percent(self, pct):
+        raise RuntimeError("Sem backend de áudio")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class NullBackend(VolumeBackend):
+    """Sem controle de volume (plataforma/dependências ausentes)."""
+
+
+class MemoryBackend(VolumeBackend):
+    """Volume em memória; external_change() simula outro programa mexendo no volume."""
+
+    name = "memória"
+    available = True
+    supports_events = True
+
+    def __init__(self, initial_pct=30.0):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pct = float(initial_pct)
+        self.get_calls = 0
+        self.set_calls = 0
+
+    def get_percent(self):
+        with self._lock:
+            self.get_calls += 1
+            return self._pct
+
+    def set_percent(self, pct):
+        self._store(pct)
+        with self._lock:
+            self.set_calls += 1
+
+    def external_change(self, pct):
+        self._store(pct)
+
+    def _store(self, pct):
+        pct = max(0.0, min(100.0, float(pct)))
+        with self._lock:
+            changed = abs(pct - self._pct) > 1e-6
+            self._pct = pct
+        if changed:
+            self._notify(pct)
+
+
+class PollingBackend(VolumeBackend):
+    """
+    Polling com back-off: min_interval logo após uma mudança, multiplicado
+    por `backoff` a cada leitura igual até max_interval. Com urgent=True
+    (volume travado) o intervalo não passa de urgent_interval.
+    """
+
+    name = "polling"
+    available = True
+
+    def __init__(self, getter, setter, min_interval=0.05, max_interval=1.0,
+                 backoff=1.5, urgent_interval=0.05, epsilon=0.05, com=False):
+        super().__init__()
+        self._get = getter
+        self._set = setter
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.backoff = float(backoff)
+        self.urgent_interval = float(urgent_interval)
+        self.epsilon = float(epsilon)
+        self._com = com
+        self._last = None
+        self._stop = threading.Event()
+        self._kick = threading.Event()
+        self._thread = None
+
+    def get_percent(self):
+        return self._get()
+
+    def set_percent(self, pct):
+        pct = max(0.0, min(100.0, float(pct)))
+        self._set(pct)
+        # a nossa própria escrita não gera evento
+        self._last = pct
+
+    def set_urgent(self, urgent):
+        super().set_urgent(urgent)
+        if urgent:
+            self._kick.set()
+
+    def instrument(self, diag):
+        super().instrument(diag)
+        # leituras do endpoint, inclusive as da thread de polling
+        diag.instrument(self, "_get", "backend.poll_get")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._kick.set()
+
+    def _poll_loop(self):
+        if self._com:
+            com_initialize()
+        try:
+            interval = self.min_interval
+            while not self._stop.is_set():
+                self._kick.wait(interval)
+                self._kick.clear()
+                if self._stop.is_set():
+                    break
+                try:
+                    pct = float(self._get())
+                except Exception:
+                    interval = self.max_interval
+                    continue
+                last = self._last
+                if last is None or abs(pct - last) > self.epsilon:
+                    self._last = pct
+                    interval = self.min_interval
+                    if last is not None:
+                        self._notify(pct)
+                else:
+                    interval = min(self.max_interval, interval * self.backoff)
+                if self.urgent:
+                    interval = min(interval, self.urgent_interval)
+        finally:
+            if self._com:
+                com_uninitialize()
+
+
+class PycawBackend(PollingBackend):
+    """
+    Volume mestre do Windows via PyCAW. start() registra um
+    IAudioEndpointVolumeCallback; as notificações vão para uma thread
+    própria (não se deve bloquear nem chamar a API dentro do OnNotify).
+    """
+
+    name = "pycaw"
+
+    def __init__(self):
+        from ctypes import POINTER, cast
+        AudioUtilities, IAudioEndpointVolume, CLSCTX_ALL = load_pycaw()
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self._endpoint = cast(interface, POINTER(IAudioEndpointVolume))
+        super().__init__(self._read_endpoint, self._write_endpoint, com=True)
+        self._callback = None
+        self._events = Queue()
+        self._dispatch_thread = None
+
+    def _read_endpoint(self):
+        return float(self._endpoint.GetMasterVolumeLevelScalar()) * 100.0
+
+    def _write_endpoint(self, pct):
+        self._endpoint.SetMasterVolumeLevelScalar(pct / 100.0, None)
+
+    def start(self):
+        if self._callback is not None or (self._thread is not None and self._thread.is_alive()):
+            return
+        try:
+            self._register_callback()
+        except Exception as e:
+            print("Callback de volume indisponível, usando polling:", e)
+            self._callback = None
+            super().start()
+            return
+        self.supports_events = True
+        self._stop.clear()
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatch_thread.start()
+
+    def _register_callback(self):
+        from comtypes import COMObject  # type: ignore
+        from pycaw.api.endpointvolume import IAudioEndpointVolumeCallback  # type: ignore
+
+        events = self._events
+
+        class _Callback(COMObject):
+            _com_interfaces_ = [IAudioEndpointVolumeCallback]
+
+            def OnNotify(self, pNotify):
+                events.put(float(pNotify.contents.fMasterVolume) * 100.0)
+                return 0
+
+        self._callback = _Callback()
+        self._endpoint.RegisterControlChangeNotify(self._callback)
+
+    def _dispatch_loop(self):
+        com_initialize()
+        try:
+            while not self._stop.is_set():
+                try:
+                    pct = self._events.get(timeout=1.0)
+                except Empty:
+                    continue
+                if pct is None:
+                    break
+                # rajadas (arrastar o mixer) -> só o valor mais recente
+                try:
+                    while True:
+                        nxt = self._events.get_nowait()
+                        if nxt is None:
+                            return
+                        pct = nxt
+                except Empty:
+                    pass
+                self._notify(pct)
+        finally:
+            com_uninitialize()
+
+    def stop(self):
+        if self._callback is not None:
+            try:
+                self._endpoint.UnregisterControlChangeNotify(self._callback)
+            except Exception:
+                pass
+            self._callback = None
+            self._events.put(None)
+        super().stop()
+
+
+class MixerBackend(PollingBackend):
+    """
+    Volume mestre no Linux pela linha de comando: pactl (PulseAudio/PipeWire)
+    ou amixer (ALSA). Com pactl, um `pactl subscribe` acorda a leitura assim
+    que o sink muda e o polling vira só rede de segurança.
+    """
+
+    _PERCENT = re.compile(r"(\d+(?:\.\d+)?)%")
+
+    def __init__(self, tool):
+        super().__init__(self._read_mixer, self._write_mixer, min_interval=0.2, max_interval=2.0)
+        self.tool = tool
+        self.name = tool
+        self._subscriber = None
+
+    @classmethod
+    def detect(cls):
+        """Primeira ferramenta que responde (pactl, depois amixer) ou None."""
+        for tool in ("pactl", "amixer"):
+            if shutil.which(tool) is None:
+                continue
+            backend = cls(tool)
+            try:
+                backend.get_percent()
+            except Exception:
+                continue
+            return backend
+        return None
+
+    def _run(self, *args):
+        return subprocess.run(args, capture_output=True, text=True, timeout=2.0, check=True).stdout
+
+    def _read_mixer(self):
+        if self.tool == "pactl":
+            text = self._run("pactl", "get-sink-volume", "@DEFAULT_SINK@")
+        else:
+            text = self._run("amixer", "get", "Master")
+        values = [float(v) for v in self._PERCENT.findall(text)]
+        if not values:
+            raise RuntimeError(f"saída inesperada de {self.tool}")
+        return min(100.0, sum(values) / len(values))
+
+    def _write_mixer(self, pct):
+        if self.tool == "pactl":
+            self._run("pactl", "set-sink-volume", "@DEFAULT_SINK@", f"{pct:.0f}%")
+        else:
+            self._run("amixer", "-q", "set", "Master", f"{pct:.0f}%")
+
+    def start(self):
+        super().start()
+        if self.tool == "pactl" and self._subscriber is None:
+            try:
+                self._subscriber = subprocess.Popen(
+                    ("pactl", "subscribe"), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            except OSError:
+                return
+            self.supports_events = True
+            self.max_interval = 5.0
+            threading.Thread(target=self._subscribe_loop, args=(self._subscriber,), daemon=True).start()
+
+    def _subscribe_loop(self, proc):
+        for line in proc.stdout:
+            if self._stop.is_set():
+                break
+            if "'change'" in line and " sink " in line:
+                self._kick.set()
+
+    def stop(self):
+        proc, self._subscriber = self._subscriber, None
+        if proc is not None:
+            try:
+                proc.terminate()
+            except OSError:
+                pass
+        super().stop()
+
+
+def create_backend():
+    """
+    Escolhe o backend sem importar os demais. TCC_VOLUME_BACKEND força
+    um deles (memory, none, pycaw, mixer); sem isso: Windows com pycaw ->
+    PycawBackend, Linux com pactl/amixer -> MixerBackend, senão NullBackend.
+    """
+    forced = os.environ.get("TCC_VOLUME_BACKEND", "").strip().lower()
+    if forced == "memory":
+        return MemoryBackend()
+    if forced == "none":
+        return NullBackend()
+    system = platform.system()
+    if forced in ("", "pycaw") and system == "Windows" and _PYCAW_AVAILABLE:
+        try:
+            return PycawBackend()
+        except Exception as e:
+            print("Falha ao iniciar PyCAW:", e)
+    if forced in ("", "mixer") and system == "Linux":
+        try:
+            backend = MixerBackend.detect()
+        except Exception as e:
+            print("Falha ao iniciar mixer:", e)
+            backend = None
+        if backend is not None:
+            return backend
+    return NullBackend()
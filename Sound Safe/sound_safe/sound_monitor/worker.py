@@ -0,0 +1,628 @@
+# worker.py
+#
+# Modo opcional (TCC_WORKER=1 / settings "worker_process"): motor de dose,
+# regras dos modos e trava do volume num processo próprio, fora do GIL do
+# Tk – modal de configurações, exportação ou redesenho do gráfico não
+# atrasam mais o tick nem a reimposição da trava.
+#   - estado: bloco de memória compartilhada de layout fixo (struct),
+#     protegido por seqlock. O processo do motor é o único escritor
+#     (contador ímpar = escrevendo); a UI lê sem trava e sem serializar,
+#     repetindo a leitura se o contador mudou no meio;
+#   - comandos: tuplas pela Pipe (volume, modo, pausa, trava, cfg...);
+#     cada comando tratado incrementa cmd_seq no bloco (confirmação);
+#   - alertas: contadores por evento no bloco; a UI compara com a leitura
+#     anterior (events_between) e avisa.
+# Diário, histórico, série temporal e exportação continuam no processo da UI.
+
+import math
+import multiprocessing
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from multiprocessing import shared_memory
+
+from .audio_support import com_initialize, com_uninitialize
+from .calibration import LevelModel
+from .colors import DISCORD_ERROR
+from .engine import (
+    DoseEngine,
+    EngineState,
+    EVENT_DAY_ROLLOVER,
+    EVENT_ALERT_50,
+    EVENT_ALERT_100,
+    EVENT_DAILY_WARN,
+    EVENT_DAILY_BLOCK,
+)
+from .policy import ModePolicy, STATUS_NORMAL
+from .standards import STANDARDS
+
+# ---------- Layout do bloco compartilhado ----------
+_ZONES = ("", "SEGURA", "ATENÇÃO", "PERIGO")
+_EVENTS = (EVENT_DAY_ROLLOVER, EVENT_ALERT_50, EVENT_ALERT_100, EVENT_DAILY_WARN, EVENT_DAILY_BLOCK)
+
+_FIELDS = (
+    ("ts", "d"),
+    ("t_session", "d"),
+    ("session_start_ts", "d"),
+    ("vol_percent", "d"),
+    ("L", "d"),
+    ("session_dose", "d"),
+    ("daily_dose", "d"),
+    ("time_at_current_level", "d"),
+    ("allowed_sec", "d"),
+    ("remaining_sec", "d"),
+    ("ema_remaining_sec", "d"),
+    ("lock_target_pct", "d"),      # NaN = sem trava
+    ("ceiling_pct", "d"),          # NaN = teto do Dinâmico liberado
+    ("tick_lag_max_sec", "d"),     # pior atraso de despertar do loop do motor
+    *((f"std_session_{s.key}", "d") for s in STANDARDS),   # dose em cada norma (standards.py)
+    *((f"std_daily_{s.key}", "d") for s in STANDARDS),
+    ("ticks", "Q"),                # 0 = processo ainda não publicou
+    ("cmd_seq", "Q"),              # comandos já tratados
+    ("enforcements", "Q"),         # reimposições de trava/teto no volume do SO
+    ("day_ordinal", "I"),
+    ("ev_day_rollover", "I"),
+    ("ev_alert_50", "I"),
+    ("ev_alert_100", "I"),
+    ("ev_daily_warn", "I"),
+    ("ev_daily_block", "I"),
+    ("status_seq", "I"),
+    ("zone", "B"),
+    ("level_zone", "B"),
+    ("paused", "B"),
+    ("locked", "B"),
+    ("decay_active", "B"),
+    ("backend_available", "B"),
+    ("status_text", "96s"),
+    ("status_color", "8s"),
+    ("lock_reason", "48s"),
+)
+
+WorkerState = namedtuple("WorkerState", [name for name, _ in _FIELDS])
+
+_SEQ = struct.Struct("<Q")
+_PAYLOAD = struct.Struct("<" + "".join(fmt for _, fmt in _FIELDS))
+SHM_SIZE = _SEQ.size + _PAYLOAD.size
+
+_I_ZONE = WorkerState._fields.index("zone")
+_I_LEVEL_ZONE = WorkerState._fields.index("level_zone")
+_I_TEXT = tuple(WorkerState._fields.index(n) for n in ("status_text", "status_color", "lock_reason"))
+_I_STD_SESSION = WorkerState._fields.index(f"std_session_{STANDARDS[0].key}")
+_I_STD_DAILY = WorkerState._fields.index(f"std_daily_{STANDARDS[0].key}")
+
+CMD_VOLUME = "volume"
+CMD_MODE = "mode"
+CMD_PAUSE = "pause"
+CMD_RESET = "reset"
+CMD_LOCK = "lock"
+CMD_UNLOCK = "unlock"
+CMD_LEVEL = "level"
+CMD_CONFIG = "config"
+CMD_STOP = "stop"
+
+
+def _zone_code(zone):
+    try:
+        return _ZONES.index(zone)
+    except ValueError:
+        return 0
+
+
+def _profile_of(cfg):
+    return cfg.get("ref_db"), cfg.get("exchange_rate_db"), cfg.get("base_time_sec")
+
+
+def _text(s, size):
+    return str(s).encode("utf-8")[:size]
+
+
+def _opt(x):
+    return math.nan if x is None else float(x)
+
+
+def events_between(prev, cur):
+    """Eventos do motor ocorridos entre duas leituras (contadores que subiram)."""
+    if prev is None:
+        return ()
+    return tuple(ev for ev in _EVENTS
+                 if getattr(cur, "ev_" + ev) != getattr(prev, "ev_" + ev))
+
+
+def day_key_of(state):
+    return date.fromordinal(state.day_ordinal).strftime("%Y-%m-%d") if state.day_ordinal else ""
+
+
+class StateBlock:
+    """
+    Seqlock sobre um buffer (SharedMemory.buf). write(): só no processo do
+    motor e sob a trava dele; read(): qualquer processo, sem trava.
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+
+    def write(self, values):
+        buf = self._buf
+        seq = _SEQ.unpack_from(buf, 0)[0]
+        _SEQ.pack_into(buf, 0, seq + 1)
+        _PAYLOAD.pack_into(buf, _SEQ.size, *values)
+        _SEQ.pack_into(buf, 0, seq + 2)
+
+    def read_raw(self, spins=10000):
+        """Tupla crua consistente ou None (escritor parado no meio de uma escrita)."""
+        buf = self._buf
+        for i in range(spins):
+            s1 = _SEQ.unpack_from(buf, 0)[0]
+            if not s1 & 1:
+                raw = _PAYLOAD.unpack_from(buf, _SEQ.size)
+                if _SEQ.unpack_from(buf, 0)[0] == s1:
+                    return raw
+            if i & 63 == 63:
+                time.sleep(0)
+        return None
+
+    def read(self):
+        raw = self.read_raw()
+        if raw is None:
+            return None
+        vals = list(raw)
+        vals[_I_ZONE] = _ZONES[vals[_I_ZONE]] if vals[_I_ZONE] < len(_ZONES) else ""
+        vals[_I_LEVEL_ZONE] = _ZONES[vals[_I_LEVEL_ZONE]] if vals[_I_LEVEL_ZONE] < len(_ZONES) else ""
+        for i in _I_TEXT:
+            vals[i] = vals[i].rstrip(b"\0").decode("utf-8", "replace")
+        return WorkerState._make(vals)
+
+    def release(self):
+        self._buf = None
+
+
+def engine_state_of(state, events=()):
+    """WorkerState -> EngineState (mesmo formato que o motor em processo publica)."""
+    return EngineState(
+        ts=state.ts,
+        t_session=state.t_session,
+        day_key=day_key_of(state),
+        paused=bool(state.paused),
+        vol_percent=state.vol_percent,
+        L=state.L,
+        session_dose=state.session_dose,
+        daily_dose=state.daily_dose,
+        time_at_current_level=state.time_at_current_level,
+        allowed_sec=state.allowed_sec,
+        remaining_sec=state.remaining_sec,
+        ema_remaining_sec=state.ema_remaining_sec,
+        zone=state.zone,
+        level_zone=state.level_zone,
+        events=tuple(events),
+        standards=tuple(
+            (std.key, std.name, state[_I_STD_SESSION + i], state[_I_STD_DAILY + i])
+            for i, std in enumerate(STANDARDS)
+        ),
+    )
+
+
+# ---------- Processo do motor ----------
+class _EngineWorker:
+    """Motor + regras + trava, com o backend de volume do SO deste processo."""
+
+    def __init__(self, block, cfg, prefs, initial=None, backend=None):
+        self.block = block
+        self.cfg = dict(cfg)
+        self.quantum = float(prefs.get("quantum", 1.0))
+        self.levels = LevelModel(self.cfg, quantum=self.quantum)
+        self.engine = DoseEngine(self.cfg, levels=self.levels)
+        self.engine.max_gap_sec = 300.0
+        self.policy = ModePolicy(self.cfg, quantum=self.quantum, levels=self.levels)
+        self.idle_tick_sec = float(prefs.get("idle_tick_sec", 1.0))
+        self.level_stale_sec = 2.0
+
+        self.mode = prefs.get("mode", "prefixado")
+        self.paused = bool(prefs.get("paused", False))
+        self.vol = self._quantize(prefs.get("volume", self.cfg["default_volume"]))
+        self.locked = False
+        self.lock_target_pct = None
+        self.lock_reason = ""
+        self.status = STATUS_NORMAL
+        # tick x comandos x listener do backend (reentrante: o MemoryBackend
+        # notifica na mesma thread que escreveu)
+        self._lock_state = threading.RLock()
+        self._level_db = None
+        self._level_at = 0.0
+        self._event_counts = dict.fromkeys(_EVENTS, 0)
+        self._status_seq = 0
+        self._ticks = 0
+        self._cmd_seq = 0
+        self._enforcements = 0
+        self._tick_lag_max = 0.0
+        self._last_state = None
+        self.running = True
+
+        if backend is None:
+            from .volume_backend import create_backend
+            backend = create_backend()
+        self.volume = backend
+        self._apply_prefs(prefs)
+        if initial:
+            if self.engine.restore(initial["day_key"], initial["daily_dose"], initial.get("session_dose"),
+                                   initial.get("session_start_ts")) and initial.get("standards"):
+                self.engine.standards.restore(*initial["standards"])
+        if prefs.get("lock"):
+            target, reason = prefs["lock"]
+            self._lock(target, reason, honor_min=False)
+        if backend.available:
+            backend.set_urgent(self.locked)
+            backend.add_listener(self._on_system_volume_change)
+            try:
+                self._set_system_volume(self.vol)
+            except Exception:
+                pass
+            backend.start()
+
+    def _apply_prefs(self, prefs):
+        self.hard_lock_enabled = bool(prefs.get("hard_lock_enabled", True))
+        self.lock_on_autoadjust = bool(prefs.get("lock_on_autoadjust", True))
+        strategy = prefs.get("dynamic_strategy", self.policy.dynamic_strategy)
+        if strategy in ("reserva", "zona_segura"):
+            self.policy.dynamic_strategy = strategy
+        self.policy.dynamic_softlock_enabled = bool(prefs.get("dynamic_softlock_enabled",
+                                                              self.policy.dynamic_softlock_enabled))
+
+    def _quantize(self, pct):
+        q = self.quantum or 1.0
+        return max(0.0, min(100.0, round(float(pct) / q) * q))
+
+    def _set_system_volume(self, pct):
+        if self.volume.available:
+            self.volume.set_percent(max(0.0, min(100.0, float(pct))))
+
+    # ----- trava -----
+    def _lock(self, target, reason="", honor_min=True):
+        target = float(target)
+        if honor_min:
+            target = max(float(self.cfg["min_enforced_volume"]), target)
+        self.locked = True
+        self.lock_target_pct = target
+        self.lock_reason = reason
+        self.vol = self._quantize(target)
+        self.status = (f"Status: bloqueado ({reason})", DISCORD_ERROR)
+        self._status_seq += 1
+        try:
+            self._set_system_volume(self.vol)
+        except Exception:
+            pass
+        self.volume.set_urgent(True)
+
+    def _unlock(self):
+        self.locked = False
+        self.lock_target_pct = None
+        self.lock_reason = ""
+        self.volume.set_urgent(False)
+        self.status = STATUS_NORMAL
+        self._status_seq += 1
+
+    def _on_system_volume_change(self, pct):
+        """Mesmas regras de app._on_system_volume_change, sem passar pelo GIL da UI."""
+        with self._lock_state:
+            sys_pct = self._quantize(pct)
+            if self.locked and self.lock_target_pct is not None:
+                if abs(pct - self.lock_target_pct) > 0.5:
+                    try:
+                        self._set_system_volume(self.lock_target_pct)
+                        self._enforcements += 1
+                    except Exception:
+                        pass
+                self._publish()
+                return
+            ceiling = self.policy.dynamic_ceiling_pct
+            if self.policy.dynamic_softlock_enabled and ceiling is not None and sys_pct > ceiling + 0.5:
+                try:
+                    self._set_system_volume(ceiling)
+                    self._enforcements += 1
+                except Exception:
+                    pass
+                self.vol = ceiling
+            elif self.policy.dynamic_decay_active and sys_pct > self.vol + 0.01:
+                pass
+            elif abs(sys_pct - self.vol) > 1.0:
+                self.vol = sys_pct
+            self._publish()
+
+    # ----- comandos -----
+    def handle(self, cmd):
+        name, args = cmd[0], cmd[1:]
+        if name == CMD_VOLUME:
+            self._cmd_volume(float(args[0]))
+        elif name == CMD_MODE:
+            self.mode = args[0]
+            self.engine.reset_level_timer()
+            self.policy.reset()
+            if self.mode == "prefixado" and self.locked:
+                self._unlock()
+        elif name == CMD_PAUSE:
+            self.paused = bool(args[0])
+        elif name == CMD_RESET:
+            self.engine.reset_session()
+            self.policy.reset()
+            if self.locked:
+                self._unlock()
+            self.status = STATUS_NORMAL
+            self._status_seq += 1
+        elif name == CMD_LOCK:
+            self._lock(*args)
+        elif name == CMD_UNLOCK:
+            if self.locked:
+                self._unlock()
+        elif name == CMD_LEVEL:
+            self._level_db = args[0]
+            self._level_at = time.monotonic()
+        elif name == CMD_CONFIG:
+            cfg, prefs = args
+            profile = _profile_of(self.cfg)
+            self.cfg.clear()
+            self.cfg.update(cfg)             # engine/policy/levels veem o mesmo dict
+            self.levels.invalidate()
+            if _profile_of(self.cfg) != profile:
+                self.engine.switch_profile()
+            self._apply_prefs(prefs)
+        elif name == CMD_STOP:
+            self.running = False
+        self._cmd_seq += 1
+
+    def _cmd_volume(self, pct):
+        pct = self._quantize(pct)
+        if self.locked:
+            pct = self._quantize(self.lock_target_pct)
+        elif self.policy.dynamic_decay_active and pct > self.vol + 0.01:
+            pct = self.vol
+        else:
+            ceiling = self.policy.dynamic_ceiling_pct
+            if self.policy.dynamic_softlock_enabled and ceiling is not None and pct > ceiling + 0.01:
+                pct = ceiling
+        self.vol = pct
+        try:
+            self._set_system_volume(pct)
+        except Exception:
+            pass
+
+    # ----- tick -----
+    def tick(self):
+        if self.locked and abs(self.vol - float(self.lock_target_pct or 0)) > 0.1:
+            self.vol = self._quantize(self.lock_target_pct)
+        level = None
+        if self._level_db is not None and (time.monotonic() - self._level_at) <= self.level_stale_sec:
+            level = self._level_db
+        st = self.engine.update(self.vol, paused=self.paused, level_db=level)
+        self._ticks += 1
+        if not st.paused:
+            for ev in st.events:
+                self._event_counts[ev] += 1
+                if ev in (EVENT_DAILY_BLOCK, EVENT_ALERT_100) and self.hard_lock_enabled and not self.locked:
+                    self._lock(self.cfg["min_enforced_volume"], "limite diário")
+            if st.session_dose >= 1.0 and not self.locked and self.hard_lock_enabled:
+                self._lock(self.cfg["min_enforced_volume"], "limite diário")
+            if not self.locked:
+                d = self.policy.step(st, self.vol, self.mode)
+                if d.volume is not None:
+                    self.vol = self._quantize(d.volume)
+                    try:
+                        self._set_system_volume(self.vol)
+                    except Exception:
+                        pass
+                if d.status is not None and d.status != self.status:
+                    self.status = d.status
+                    self._status_seq += 1
+                if d.lock is not None and self.lock_on_autoadjust:
+                    target, reason, honor_min = d.lock
+                    self._lock(target, reason, honor_min)
+        self._last_state = st
+        self._publish()
+
+    def next_timeout(self):
+        now = time.time()
+        timeout = self.idle_tick_sec
+        if not self.paused:
+            crossing = self.engine.next_crossing_in(now)
+            if crossing is not None:
+                timeout = min(timeout, crossing + 0.001)
+            step_in = self.policy.next_step_in(now)
+            if step_in is not None:
+                timeout = min(timeout, step_in)
+        return max(0.01, timeout)
+
+    def _publish(self):
+        st = self._last_state
+        if st is None:
+            return
+        day = date.fromisoformat(st.day_key).toordinal()
+        ev = self._event_counts
+        self.block.write((
+            st.ts, st.t_session, self.engine.session_start_ts, self.vol, st.L,
+            st.session_dose, st.daily_dose, st.time_at_current_level,
+            _opt(st.allowed_sec), _opt(st.remaining_sec), _opt(st.ema_remaining_sec),
+            _opt(self.lock_target_pct), _opt(self.policy.dynamic_ceiling_pct), self._tick_lag_max,
+            *self.engine.standards.session, *self.engine.standards.daily,
+            self._ticks, self._cmd_seq, self._enforcements,
+            day,
+            ev[EVENT_DAY_ROLLOVER], ev[EVENT_ALERT_50], ev[EVENT_ALERT_100],
+            ev[EVENT_DAILY_WARN], ev[EVENT_DAILY_BLOCK],
+            self._status_seq,
+            _zone_code(st.zone), _zone_code(st.level_zone),
+            int(st.paused), int(self.locked), int(self.policy.dynamic_decay_active),
+            int(self.volume.available),
+            _text(self.status[0], 96), _text(self.status[1], 8), _text(self.lock_reason, 48),
+        ))
+
+    def run(self, conn):
+        with self._lock_state:
+            self.tick()
+        while self.running:
+            timeout = self.next_timeout()
+            deadline = time.monotonic() + timeout
+            if conn.poll(timeout):
+                with self._lock_state:
+                    try:
+                        while self.running and conn.poll(0):
+                            self.handle(conn.recv())
+                    except (EOFError, OSError):
+                        self.running = False    # UI morreu: encerra junto
+                        break
+                    self.tick()
+            else:
+                lag = time.monotonic() - deadline
+                with self._lock_state:
+                    if lag > self._tick_lag_max:
+                        self._tick_lag_max = lag
+                    self.tick()
+
+    def close(self):
+        try:
+            self.volume.stop()
+        except Exception:
+            pass
+
+
+def _worker_main(shm_name, conn, cfg, prefs, initial):
+    # filho do spawn usa o resource_tracker da UI: quem cria (a UI) é quem remove
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = StateBlock(shm.buf)
+    com_inited = com_initialize()
+    worker = None
+    try:
+        worker = _EngineWorker(block, cfg, prefs, initial)
+        worker.run(conn)
+    except Exception as e:
+        print("Erro no processo do motor:", e)
+    finally:
+        if worker is not None:
+            worker.close()
+        block.release()
+        del block
+        shm.close()
+        if com_inited:
+            com_uninitialize()
+
+
+# ---------- Lado da UI ----------
+class WorkerProcess:
+    """
+    Dono do processo do motor (contexto spawn: o filho não herda Tk nem
+    threads). send() só escreve uma tupla curta na Pipe; read() lê o bloco.
+    """
+
+    def __init__(self, cfg, prefs, initial=None):
+        self.cfg = dict(cfg)
+        self.prefs = dict(prefs)
+        self.initial = initial
+        self._shm = None
+        self._block = None
+        self._conn = None
+        self._proc = None
+        self._send_lock = threading.Lock()
+        self.sent = 0
+
+    def start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._shm = shared_memory.SharedMemory(create=True, size=SHM_SIZE)
+        self._shm.buf[:SHM_SIZE] = bytes(SHM_SIZE)
+        self._block = StateBlock(self._shm.buf)
+        self._conn, child = ctx.Pipe()
+        self._proc = ctx.Process(target=_worker_main, name="tcc-dose-engine", daemon=True,
+                                 args=(self._shm.name, child, self.cfg, self.prefs, self.initial))
+        self._proc.start()
+        child.close()
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.is_alive()
+
+    def send(self, cmd, *args):
+        """Comando para o motor; False se o processo não está mais lá."""
+        if self._conn is None:
+            return False
+        with self._send_lock:
+            try:
+                self._conn.send((cmd,) + args)
+            except (OSError, ValueError):
+                return False
+            self.sent += 1
+        return True
+
+    # atalhos usados pelo app
+    def set_volume(self, pct):
+        return self.send(CMD_VOLUME, float(pct))
+
+    def set_mode(self, mode):
+        return self.send(CMD_MODE, mode)
+
+    def set_paused(self, paused):
+        return self.send(CMD_PAUSE, bool(paused))
+
+    def reset_session(self):
+        return self.send(CMD_RESET)
+
+    def lock(self, target_pct, reason="", honor_min=True):
+        return self.send(CMD_LOCK, float(target_pct), reason, bool(honor_min))
+
+    def unlock(self):
+        return self.send(CMD_UNLOCK)
+
+    def set_level(self, level_db):
+        return self.send(CMD_LEVEL, level_db)
+
+    def configure(self, cfg, prefs):
+        return self.send(CMD_CONFIG, dict(cfg), dict(prefs))
+
+    def read(self):
+        """WorkerState mais recente ou None (processo ainda subindo)."""
+        block = self._block
+        if block is None:
+            return None
+        st = block.read()
+        if st is None or not st.ticks:
+            return None
+        return st
+
+    def wait_ready(self, timeout=10.0):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if self.read() is not None:
+                return True
+            if not self.alive:
+                return False
+            time.sleep(0.01)
+        return False
+
+    def wait_ack(self, timeout=1.0):
+        """Espera o motor tratar tudo o que foi enviado (testes / bench)."""
+        end = time.monotonic() + timeout
+        target = self.sent
+        while time.monotonic() < end:
+            st = self.read()
+            if st is not None and st.cmd_seq >= target:
+                return st
+            time.sleep(0)
+        return None
+
+    def stop(self, timeout=2.0):
+        if self._proc is not None:
+            self.send(CMD_STOP)
+            self._proc.join(timeout)
+            if self._proc.is_alive():
+                self._proc.terminate()
+                self._proc.join(1.0)
+            self._proc = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._block is not None:
+            self._block.release()
+            self._block = None
+        if self._shm is not None:
+            self._shm.close()
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None